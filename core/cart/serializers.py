@@ -61,10 +61,10 @@ class CartItemSerializer(serializers.ModelSerializer):
         ]
 
     def get_price(self, obj):
-        return obj.variant.final_price()
+        return obj.price
 
     def get_subtotal(self, obj):
-        return obj.variant.final_price() * obj.quantity
+        return obj.subtotal
 
     def get_image(self, obj):
         img = obj.variant.product.images.filter(is_main=True).first()
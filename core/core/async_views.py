@@ -0,0 +1,49 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.views import APIView
+
+
+# ==========================================
+# Async APIView
+# ==========================================
+#
+# DRF's APIView only dispatches sync handlers. This one awaits ``async def``
+# handlers, so under ASGI a view waiting on an outbound call (the payment
+# gateway) yields the event loop instead of holding a worker thread.
+# Authentication, permissions and throttling still run as DRF runs them,
+# in one sync_to_async step since they hit the database.
+
+
+class AsyncAPIView(APIView):
+
+    # Django requires all handlers to be ``async def``; handlers wrapped by
+    # method_decorator look sync, so the view is declared async explicitly
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            method = request.method.lower()
+
+            if method not in self.http_method_names or not hasattr(self, method):
+                raise exceptions.MethodNotAllowed(request.method)
+
+            response = getattr(self, method)(request, *args, **kwargs)
+
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
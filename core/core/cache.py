@@ -0,0 +1,76 @@
+import base64
+import pickle
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache as BaseDatabaseCache
+from django.db import connections, router, transaction
+
+
+# ==========================================
+# Database cache
+# ==========================================
+#
+# The shared cache of the web workers and the task worker: version tokens,
+# rebuild locks, the home payload and the gateway metrics.
+
+
+class DatabaseCache(BaseDatabaseCache):
+
+    """
+    Django's database cache with atomic ``add`` and ``incr``.
+
+    The stock backend reads a row and then writes it, so two workers
+    adding the same expired key both get it and two increments can both
+    write ``n + 1``. Here the row is locked first with a no-op UPDATE,
+    which waits for any other writer (a row lock on PostgreSQL, the
+    database write lock on SQLite).
+    """
+
+    @contextmanager
+    def locked(self, key):
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE %s SET %s = %s WHERE %s = %%s"
+                % (
+                    quote_name(self._table),
+                    quote_name("expires"),
+                    quote_name("expires"),
+                    quote_name("cache_key"),
+                ),
+                [key],
+            )
+
+            yield connection, cursor
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        with self.locked(key):
+            return self._base_set("add", key, value, timeout)
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_and_validate_key(key, version=version)
+
+        with self.locked(made_key) as (connection, cursor):
+            value = self.get(key, version=version)
+
+            if value is None:
+                raise ValueError("Key '%s' not found" % key)
+
+            value += delta
+
+            # فقط مقدار؛ زمان انقضای کلید دست نمی‌خورد
+            quote_name = connection.ops.quote_name
+
+            cursor.execute(
+                "UPDATE %s SET %s = %%s WHERE %s = %%s"
+                % (quote_name(self._table), quote_name("value"), quote_name("cache_key")),
+                [base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode("latin1"), made_key],
+            )
+
+        return value
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+# ==========================================
+# Conditional GET
+# ==========================================
+#
+# A view declares the version tokens its payload depends on (the ones the
+# response cache in shop.cache keys on), so a matching ``If-None-Match`` is
+# answered with 304 from cache reads alone, before any query or serializer
+# runs. A token says nothing about when it changed, so no ``Last-Modified``
+# is sent: a date taken from ``updated_date`` columns misses deletes, m2m
+# changes and rows without that column.
+
+
+def fingerprint(request, versions):
+    """
+    The ETag of ``request`` for the given version tokens; memoized on the
+    request.
+    """
+
+    cached = getattr(request, "_conditional_fingerprint", None)
+
+    if cached is not None:
+        return cached
+
+    raw = repr((
+        request.get_full_path(),
+        getattr(request, "accepted_media_type", None),
+        list(versions),
+    ))
+
+    request._conditional_fingerprint = '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+    return request._conditional_fingerprint
+
+
+def conditional_get(get_versions, name=""):
+    """
+    Decorate a view handler (or a class, with ``name``) with an ``ETag``
+    validator. ``get_versions(request, *args, **kwargs)`` returns the
+    version tokens passed to :func:`fingerprint`.
+    """
+
+    def etag(request, *args, **kwargs):
+
+        return fingerprint(
+            request,
+            get_versions(request, *args, **kwargs)
+        )
+
+    return method_decorator(
+        condition(etag_func=etag),
+        name=name
+    )
@@ -60,6 +60,11 @@ INSTALLED_APPS = [
     'payment',
     'website',
     'review',
+    'search',
+    'renditions',
+    'tasks',
+    'idempotency',
+    'outbox',
 ]
 
 MIDDLEWARE = [
@@ -191,11 +196,130 @@ SIMPLE_JWT = {
 CORS_ALLOW_ALL_ORIGINS = True
 
 
+# Absolute urls built outside a request (the precomputed home payload)
+
+SITE_URL = "https://ar7shia.pythonanywhere.com"
+
+
+# Search
+
+SEARCH_BACKEND = "search.backends.DatabaseBM25Backend"
+
+
 # Zarinpal Config
 
 ZARINPAL_MERCHANT_ID = "4ced0a1e-4ad8-4309-9668-3ea3ae8e8897"
 
 ZARINPAL_CALLBACK_URL = "https://ar7shia.pythonanywhere.com/payment/verify/"
 
+# https://payment.zarinpal.com in production
+ZARINPAL_BASE_URL = "https://sandbox.zarinpal.com"
+
+# seconds; a slow gateway holds a worker for at most connect + read
+ZARINPAL_CONNECT_TIMEOUT = 3
+ZARINPAL_READ_TIMEOUT = 10
+
+# keep-alive connections per process
+ZARINPAL_POOL_SIZE = 10
+
+# connections per event loop of the async views
+ZARINPAL_ASYNC_POOL_SIZE = 100
+
+# extra attempts of verify on timeouts / 5xx (verify is safe to repeat)
+ZARINPAL_VERIFY_RETRIES = 2
+
+ZARINPAL_CIRCUIT_BREAKER = {
+    "failure_rate": 0.5,
+    "min_calls": 5,
+    "window": 30,
+    "reset_timeout": 30,
+}
+
 PAYMENT_SUCCESS_URL = "http://localhost:3000/payment/success"
-PAYMENT_FAILED_URL = "http://localhost:3000/payment/failed"
\ No newline at end of file
+PAYMENT_FAILED_URL = "http://localhost:3000/payment/failed"
+
+# route /payment/ to the async views; turn on when served by an ASGI server
+# (e.g. gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker)
+PAYMENT_ASYNC_VIEWS = False
+
+# seconds a pending order holds its stock (order.reservations)
+STOCK_RESERVATION_TTL = 20 * 60
+
+# reconcile_payments: verify payments pending this long (seconds), at most
+# every INTERVAL seconds and LIMIT payments per task run
+PAYMENT_RECONCILE_AFTER = 30 * 60
+
+PAYMENT_RECONCILE_INTERVAL = 10 * 60
+
+PAYMENT_RECONCILE_LIMIT = 1000
+
+
+# Image renditions (renditions app)
+
+RENDITION_WIDTHS = (320, 640, 1024, 1600)
+
+RENDITION_FORMATS = ("webp", "jpeg")
+
+RENDITION_QUALITY = 80
+
+
+# Shared cache
+# The web workers and the task worker (run_worker) are separate processes:
+# version tokens, rebuild locks, the home payload and the gateway metrics
+# must live in one cache they all see, with atomic add / incr.
+# core.cache.DatabaseCache keeps them in the database (its table is created
+# by the tasks app's migrations); django.core.cache.backends.redis.RedisCache
+# works as well. Tests run on the same backend (the test database's table).
+
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.DatabaseCache",
+        "LOCATION": "cache_table",
+        "OPTIONS": {
+            "MAX_ENTRIES": 100000,
+        },
+    }
+}
+
+
+# Background tasks (tasks app)
+# TASKS_EAGER runs tasks in-process after commit instead of queueing them
+
+TASKS_EAGER = False
+
+TASKS_KEEP_DAYS = 7
+
+
+# Idempotency-Key header (idempotency app), in seconds
+# TTL: how long a stored response is replayed (older rows are purged hourly)
+# LOCK_TIMEOUT: after this a still running original is considered dead
+# WAIT: how long a duplicate waits for the original before a 409
+
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+IDEMPOTENCY_WAIT = 10
+
+
+# Transactional outbox (outbox app), in seconds
+# DRAIN_DELAY: events published within this window are applied in one batch
+# BACKOFF: first retry delay of a failed event, doubled per attempt
+
+OUTBOX_DRAIN_DELAY = 1
+
+OUTBOX_BACKOFF = 30
+
+OUTBOX_KEEP_DAYS = 7
+
+
+# Catalog response cache
+# LRUResponseCache: per-process, one node
+# SharedResponseCache: a Django cache alias shared by every worker
+
+SHOP_RESPONSE_CACHE = {
+    "BACKEND": "shop.cache.LRUResponseCache",
+    "OPTIONS": {
+        "max_entries": 2048,
+    },
+}
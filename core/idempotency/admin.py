@@ -0,0 +1,34 @@
+from django.contrib import admin
+
+from .models import IdempotencyKey
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "user",
+        "key",
+        "response_status",
+        "created_date",
+        "completed_date",
+    )
+
+    list_filter = (
+        "response_status",
+    )
+
+    search_fields = (
+        "key",
+        "user__phone_number",
+    )
+
+    readonly_fields = (
+        "user",
+        "key",
+        "request_hash",
+        "response_status",
+        "response_body",
+        "created_date",
+        "completed_date",
+    )
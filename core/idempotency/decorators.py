@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from tasks.base import enqueue
+
+from .models import IdempotencyKey
+
+
+# ==========================================
+# Idempotency-Key
+# ==========================================
+#
+# The first request with a key claims a row before the view runs; a retry
+# with the same key gets the stored response back, and a retry that
+# arrives while the original is still running waits for it instead of
+# running the view (and its row locks / gateway calls) a second time.
+
+HEADER = "Idempotency-Key"
+
+PURGE_TASK = "idempotency.purge_keys"
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def request_hash(request):
+    digest = hashlib.sha256()
+
+    for part in (request.method, request.get_full_path()):
+        digest.update(part.encode())
+        digest.update(b"\0")
+
+    digest.update(request.body)
+
+    return digest.hexdigest()
+
+
+def replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def schedule_purge():
+    # حداکثر ساعتی یک بار؛ ردیف‌های منقضی را task worker حذف می‌کند
+    if cache.add("idempotency:purged", True, timeout=60 * 60):
+        enqueue(PURGE_TASK, unique_key=PURGE_TASK)
+
+
+def claim(user, key, digest):
+    """
+    Returns ``(record, claimed)``: our new row, or the existing one of an
+    earlier request with the same key.
+    """
+    now = timezone.now()
+
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user=user, key=key, request_hash=digest)
+        except IntegrityError:
+            pass
+        else:
+            schedule_purge()
+            return record, True
+
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+
+        if record is None:
+            # اجرای قبلی شکست خورد و ردیفش همین حالا حذف شد
+            continue
+
+        expired = record.created_date < now - timedelta(seconds=setting("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+        # درخواست اصلی رها شده (فرآیندش از کار افتاده)؛ ردیف دوباره گرفته می‌شود
+        abandoned = not record.completed and record.created_date < now - timedelta(
+            seconds=setting("IDEMPOTENCY_LOCK_TIMEOUT", 60)
+        )
+
+        if expired or abandoned:
+            IdempotencyKey.objects.filter(pk=record.pk, created_date=record.created_date).delete()
+            continue
+
+        return record, False
+
+
+def delays():
+    deadline = time.monotonic() + setting("IDEMPOTENCY_WAIT", 10)
+    delay = 0.05
+
+    while time.monotonic() < deadline:
+        yield delay
+        delay = min(delay * 2, 0.5)
+
+
+def poll(record):
+    current = IdempotencyKey.objects.filter(pk=record.pk).first()
+
+    if current is None or current.completed:
+        return current, True
+
+    return record, False
+
+
+def wait(record):
+    """
+    Poll the original request's row until it completes. Returns the
+    completed row, None if the original failed (its row is gone), or the
+    still running row on timeout.
+    """
+    for delay in delays():
+        time.sleep(delay)
+
+        record, done = poll(record)
+
+        if done:
+            break
+
+    return record
+
+
+async def await_record(record):
+    """
+    ``wait`` for async handlers: sleeps on the event loop between polls.
+    """
+    for delay in delays():
+        await asyncio.sleep(delay)
+
+        record, done = await sync_to_async(poll)(record)
+
+        if done:
+            break
+
+    return record
+
+
+def mismatch():
+    return Response(
+        {"error": "این کلید قبلا برای درخواست دیگری استفاده شده است"},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+def still_running():
+    response = Response(
+        {"error": "درخواست اصلی هنوز در حال انجام است"},
+        status=status.HTTP_409_CONFLICT
+    )
+    response["Retry-After"] = "1"
+    return response
+
+
+def store(record, response):
+    """
+    Keep the handler's response for replays; a 5xx frees the key.
+    """
+    if response.status_code >= 500 or not hasattr(response, "data"):
+        record.delete()
+        return response
+
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        response_status=response.status_code,
+        response_body=response.data,
+        completed_date=timezone.now(),
+    )
+
+    return response
+
+
+def idempotent(name=""):
+    """
+    Decorate an authenticated view handler (or a class, with ``name``) so
+    that requests sent with an ``Idempotency-Key`` header run once per
+    (user, key). 2xx and 4xx responses returned by the handler are stored
+    and replayed; a 5xx or a raised exception frees the key for a retry.
+    Async handlers are supported too.
+    """
+
+    def decorator(handler):
+
+        @wraps(handler)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+
+            if not key or not request.user.is_authenticated:
+                return handler(request, *args, **kwargs)
+
+            digest = request_hash(request)
+
+            while True:
+                record, claimed = claim(request.user, key[:255], digest)
+
+                if claimed:
+                    break
+
+                if record.request_hash != digest:
+                    return mismatch()
+
+                if not record.completed:
+                    record = wait(record)
+
+                    # درخواست اصلی شکست خورد؛ این درخواست جای آن اجرا می‌شود
+                    if record is None:
+                        continue
+
+                if not record.completed:
+                    return still_running()
+
+                return replay(record)
+
+            try:
+                response = handler(request, *args, **kwargs)
+            except BaseException:
+                record.delete()
+                raise
+
+            return store(record, response)
+
+        @wraps(handler)
+        async def async_wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+
+            if not key or not request.user.is_authenticated:
+                return await handler(request, *args, **kwargs)
+
+            digest = request_hash(request)
+
+            while True:
+                record, claimed = await sync_to_async(claim)(request.user, key[:255], digest)
+
+                if claimed:
+                    break
+
+                if record.request_hash != digest:
+                    return mismatch()
+
+                if not record.completed:
+                    record = await await_record(record)
+
+                    if record is None:
+                        continue
+
+                if not record.completed:
+                    return still_running()
+
+                return replay(record)
+
+            try:
+                response = await handler(request, *args, **kwargs)
+            except BaseException:
+                await sync_to_async(record.delete)()
+                raise
+
+            return await sync_to_async(store)(record, response)
+
+        if asyncio.iscoroutinefunction(handler):
+            return async_wrapper
+
+        return wrapper
+
+    return method_decorator(decorator, name=name)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from idempotency.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+
+    help = "Delete Idempotency-Key rows older than IDEMPOTENCY_KEY_TTL (the task worker also does this hourly)"
+
+    def handle(self, *args, **options):
+
+        deleted, _ = IdempotencyKey.objects.purge()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} idempotency keys")
+        )
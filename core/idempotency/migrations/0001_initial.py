@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:23
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='کلید')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='هش درخواست')),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='کد پاسخ')),
+                ('response_body', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='بدنه پاسخ')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('completed_date', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ پایان')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'کلید یکتایی درخواست',
+                'verbose_name_plural': 'کلیدهای یکتایی درخواست',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_idempotency_key'),
+        ),
+    ]
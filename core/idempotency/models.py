@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from accounts.models import User
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+
+    def purge(self):
+        ttl = getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60)
+
+        # بعد از TTL پاسخ دیگر replay نمی‌شود و ردیف فقط جا می‌گیرد
+        return self.filter(
+            created_date__lt=timezone.now() - timedelta(seconds=ttl)
+        ).delete()
+
+
+class IdempotencyKey(models.Model):
+    """
+    The first response to a request sent with an ``Idempotency-Key`` header.
+    ``response_status`` is empty while the original request is running.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", verbose_name="کاربر")
+    key = models.CharField(max_length=255, verbose_name="کلید")
+
+    # sha256 متد، مسیر و بدنه درخواست؛ یک کلید برای درخواست دیگری پذیرفته نمی‌شود
+    request_hash = models.CharField(max_length=64, verbose_name="هش درخواست")
+
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="کد پاسخ")
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="بدنه پاسخ")
+
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد")
+    completed_date = models.DateTimeField(null=True, blank=True, verbose_name="تاریخ پایان")
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "کلید یکتایی درخواست"
+        verbose_name_plural = "کلیدهای یکتایی درخواست"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"],
+                name="unique_idempotency_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+    @property
+    def completed(self):
+        return self.response_status is not None
@@ -0,0 +1,8 @@
+from tasks.base import task
+
+from .models import IdempotencyKey
+
+
+@task(max_attempts=1)
+def purge_keys():
+    IdempotencyKey.objects.purge()
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from order.models import OrderModel
+from order.tests import OrderFixtureMixin
+from shop.models import ProductVariant
+from tasks.models import Task
+
+from . import decorators
+from .models import IdempotencyKey
+
+
+class IdempotentOrderCreateTests(OrderFixtureMixin, TestCase):
+
+    client_class = APIClient
+
+    def test_retry_replays_the_first_response(self):
+        products = self.create_products(1)
+
+        self.client.credentials(HTTP_IDEMPOTENCY_KEY="retry-1")
+
+        first = self.order(self.items(products, quantity=2))
+        second = self.order(self.items(products, quantity=2))
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data["id"], first.data["id"])
+
+        self.assertEqual(OrderModel.objects.count(), 1)
+        self.assertEqual(ProductVariant.objects.get().stock, 3)
+
+    def test_key_reused_for_another_request(self):
+        products = self.create_products(1)
+
+        self.client.credentials(HTTP_IDEMPOTENCY_KEY="retry-2")
+
+        self.order(self.items(products, quantity=1))
+        response = self.order(self.items(products, quantity=2))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(OrderModel.objects.count(), 1)
+
+    def test_failed_request_frees_the_key(self):
+        products = self.create_products(1)
+
+        self.client.credentials(HTTP_IDEMPOTENCY_KEY="retry-3")
+
+        self.assertEqual(self.order(self.items(products, quantity=9)).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        ProductVariant.objects.update(stock=10)
+
+        self.assertEqual(self.order(self.items(products, quantity=9)).status_code, 201)
+
+    def in_flight(self):
+        # درخواست اصلی هنوز پاسخی ثبت نکرده
+        stored = IdempotencyKey.objects.values("response_status", "response_body", "completed_date").get()
+
+        IdempotencyKey.objects.update(response_status=None, response_body=None, completed_date=None)
+
+        return stored
+
+    @override_settings(IDEMPOTENCY_WAIT=0.1)
+    def test_duplicate_of_a_running_request_gets_a_conflict(self):
+        products = self.create_products(1)
+
+        self.client.credentials(HTTP_IDEMPOTENCY_KEY="retry-4")
+
+        self.order(self.items(products, quantity=2))
+        self.in_flight()
+
+        response = self.order(self.items(products, quantity=2))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(OrderModel.objects.count(), 1)
+
+    def test_duplicate_replays_when_the_original_finishes_meanwhile(self):
+        products = self.create_products(1)
+
+        self.client.credentials(HTTP_IDEMPOTENCY_KEY="retry-5")
+
+        first = self.order(self.items(products, quantity=2))
+        stored = self.in_flight()
+
+        poll = decorators.poll
+
+        def finish_then_poll(record):
+            IdempotencyKey.objects.filter(pk=record.pk).update(**stored)
+            return poll(record)
+
+        with mock.patch("idempotency.decorators.poll", side_effect=finish_then_poll):
+            second = self.order(self.items(products, quantity=2))
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(OrderModel.objects.count(), 1)
+
+
+class IdempotencyKeyPurgeTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_user(phone_number="09120000001", password="password")
+
+    def test_purge_deletes_keys_older_than_the_ttl(self):
+        old, fresh = [
+            IdempotencyKey.objects.create(user=self.user, key=key, request_hash="x")
+            for key in ("old", "fresh")
+        ]
+
+        IdempotencyKey.objects.filter(pk=old.pk).update(created_date=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+
+        self.assertIn("Deleted 1 ", out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.all()), [fresh])
+
+    def test_claims_queue_one_purge(self):
+        for key in ("first", "second"):
+            decorators.claim(self.user, key, "x")
+
+        self.assertEqual(Task.objects.filter(name=decorators.PURGE_TASK).count(), 1)
@@ -3,10 +3,18 @@ from .models import (
     OrderModel,
     OrderItemsModel,
     CouponModel,
-    UserAddressModel
+    UserAddressModel,
+    StockReservation
 )
 
 
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    extra = 0
+    readonly_fields = ["variant", "quantity", "status", "expires_at", "created_date", "updated_date"]
+    can_delete = False
+
+
 class OrderItemsInline(admin.TabularInline):
     model = OrderItemsModel
     extra = 0
@@ -32,7 +40,7 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ["status", "shipping_method", "created_date", "updated_date"]
     search_fields = ["user__phone_number", "user__full_name", "coupon__code", "id"]
     readonly_fields = ["created_date", "updated_date"]
-    inlines = [OrderItemsInline]
+    inlines = [OrderItemsInline, StockReservationInline]
 
 
 
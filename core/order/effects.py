@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+from django.dispatch import Signal
+
+from outbox.base import handler
+
+from . import reservations
+from .models import CouponModel, OrderModel
+
+
+PAID = "order.paid"
+
+# بعد از اعمال اثرات پرداخت (موجودی و کد تخفیف) با شناسه سفارش‌های هر دسته
+# ارسال می‌شود؛ فعلا گیرنده‌ای در پروژه ندارد و فقط نقطه اتصال است
+# ممکن است برای یک سفارش بیش از یک بار برسد
+orders_paid = Signal()
+
+
+def paid_event(order, reserved):
+    """
+    Outbox payload of a verified order; ``reserved`` is what
+    ``reservations.confirm`` left to apply.
+    """
+    return {
+        "order_id": order.pk,
+        "payment_id": order.payment_id,
+        "coupon_id": order.coupon_id,
+        "reserved": {str(variant_id): quantity for variant_id, quantity in reserved.items()},
+    }
+
+
+@handler(PAID)
+def apply_paid_orders(events):
+    quantities = defaultdict(int)
+
+    for event in events:
+        for variant_id, quantity in event.payload["reserved"].items():
+            quantities[int(variant_id)] += quantity
+
+    # یک قفل و یک UPDATE برای همه سفارش‌های این دسته
+    reservations.apply_confirmed(quantities)
+
+    # منقضی کردن کد تخفیف
+    coupon_ids = {event.payload["coupon_id"] for event in events if event.payload["coupon_id"]}
+
+    if coupon_ids:
+        CouponModel.objects.filter(pk__in=coupon_ids).update(is_active=False)
+
+    orders_paid.send(
+        sender=OrderModel,
+        order_ids=[event.payload["order_id"] for event in events]
+    )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from order.reservations import release_expired
+
+
+class Command(BaseCommand):
+
+    help = "Release expired stock holds and cancel their pending orders (the task worker also does this on schedule)"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of reservations released per transaction",
+        )
+
+    def handle(self, *args, **options):
+
+        released = release_expired(options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} reservations")
+        )
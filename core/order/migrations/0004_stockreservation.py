@@ -0,0 +1,73 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:21
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def hold_pending_orders(apps, schema_editor):
+    """
+    Stock of pending orders was already taken at creation: record it as held
+    so the payment commits it (or the sweeper returns it) exactly once.
+    """
+    OrderItemsModel = apps.get_model('order', 'OrderItemsModel')
+    ProductVariant = apps.get_model('shop', 'ProductVariant')
+    StockReservation = apps.get_model('order', 'StockReservation')
+
+    expires_at = timezone.now() + timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 20 * 60))
+
+    quantities = defaultdict(int)
+    reserved = defaultdict(int)
+    for order_id, variant_id, quantity in OrderItemsModel.objects.filter(order__status=1).values_list(
+        'order_id', 'variant_id', 'quantity'
+    ):
+        quantities[order_id, variant_id] += quantity
+        reserved[variant_id] += quantity
+
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(order_id=order_id, variant_id=variant_id, quantity=quantity, expires_at=expires_at)
+            for (order_id, variant_id), quantity in quantities.items()
+        ],
+        batch_size=500,
+    )
+
+    variants = list(ProductVariant.objects.filter(pk__in=reserved.keys()).only('pk'))
+    for variant in variants:
+        variant.reserved = reserved[variant.pk]
+
+    ProductVariant.objects.bulk_update(variants, ['reserved'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_productvariant_reserved'),
+        ('order', '0003_ordermodel_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='تعداد')),
+                ('status', models.IntegerField(choices=[(1, 'رزرو'), (2, 'قطعی'), (3, 'آزاد شده')], default=1, verbose_name='وضعیت')),
+                ('expires_at', models.DateTimeField(verbose_name='تاریخ انقضا')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='تاریخ آخرین بروزرسانی')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='order.ordermodel', verbose_name='سفارش')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservations', to='shop.productvariant', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'رزرو موجودی',
+                'verbose_name_plural': 'رزروهای موجودی',
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='order_stock_status_f89e3d_idx')],
+            },
+        ),
+        migrations.RunPython(hold_pending_orders, migrations.RunPython.noop),
+    ]
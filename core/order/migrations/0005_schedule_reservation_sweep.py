@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Min
+
+
+SWEEP_TASK = 'order.release_expired_reservations'
+
+
+def schedule_sweep(apps, schema_editor):
+    """
+    Holds backfilled by 0004 expire like any other: queue the sweeper for
+    the earliest one (the task reschedules itself after each run).
+    """
+    StockReservation = apps.get_model('order', 'StockReservation')
+    Task = apps.get_model('tasks', 'Task')
+
+    next_expiry = StockReservation.objects.filter(status=1).aggregate(next_expiry=Min('expires_at'))['next_expiry']
+
+    if next_expiry is None or Task.objects.filter(unique_key=SWEEP_TASK, status=1).exists():
+        return
+
+    Task.objects.create(name=SWEEP_TASK, unique_key=SWEEP_TASK, run_at=next_expiry)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        ('order', '0004_stockreservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_sweep, migrations.RunPython.noop),
+    ]
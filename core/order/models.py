@@ -128,4 +128,35 @@ class OrderItemsModel(models.Model):
         
     class Meta:
         verbose_name = 'آیتم سفارش'
-        verbose_name_plural = 'آیتم های سفارش'
\ No newline at end of file
+        verbose_name_plural = 'آیتم های سفارش'
+
+
+class ReservationStatusType(models.IntegerChoices):
+    HELD = 1,"رزرو"
+    COMMITTED = 2,"قطعی"
+    RELEASED = 3,"آزاد شده"
+
+
+class StockReservation(models.Model):
+    """
+    A hold of ``quantity`` units of a variant for a pending order. Held units are
+    moved from ProductVariant.stock to ProductVariant.reserved; see order.reservations.
+    """
+    order = models.ForeignKey(OrderModel,on_delete=models.CASCADE,related_name="reservations",verbose_name="سفارش")
+    variant = models.ForeignKey(ProductVariant,on_delete=models.PROTECT,related_name="reservations",verbose_name="محصول")
+    quantity = models.PositiveIntegerField(verbose_name="تعداد")
+    status = models.IntegerField(choices=ReservationStatusType.choices,default=ReservationStatusType.HELD,verbose_name="وضعیت")
+    expires_at = models.DateTimeField(verbose_name="تاریخ انقضا")
+
+    created_date = models.DateTimeField(auto_now_add=True,verbose_name='تاریخ ایجاد')
+    updated_date = models.DateTimeField(auto_now=True,verbose_name='تاریخ آخرین بروزرسانی')
+
+    def __str__(self):
+        return f"{self.order_id} - {self.variant_id} x {self.quantity}"
+
+    class Meta:
+        verbose_name = 'رزرو موجودی'
+        verbose_name_plural = 'رزروهای موجودی'
+        indexes = [
+            models.Index(fields=["status", "expires_at"]),
+        ]
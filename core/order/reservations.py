@@ -0,0 +1,323 @@
+"""
+Stock holds of pending orders.
+
+ProductVariant.stock is what can still be sold and ProductVariant.reserved
+what pending orders hold, so availability never sums reservations:
+
+    hold     stock -= n, reserved += n   (order created, HELD)
+    commit   reserved -= n               (payment verified, COMMITTED)
+    release  stock += n, reserved -= n   (payment failed / timed out, RELEASED)
+
+The payment callback uses ``confirm`` instead of ``commit``: it only marks
+the holds COMMITTED (no variant locks) and the ``reserved -= n`` half is
+applied afterwards from the outbox by ``apply_confirmed``.
+
+Variant rows are always locked in id order before they are updated.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Min, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from shop.models import ProductVariant
+from tasks.base import enqueue
+
+from .models import OrderModel, OrderStatusType, StockReservation, ReservationStatusType
+
+
+SWEEP_TASK = "order.release_expired_reservations"
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def expiry():
+    return timezone.now() + timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 20 * 60))
+
+
+def totals(reservations):
+    quantities = defaultdict(int)
+    for reservation in reservations:
+        quantities[reservation.variant_id] += reservation.quantity
+    return quantities
+
+
+def order_quantities(order):
+    quantities = defaultdict(int)
+    for variant_id, quantity in order.order_items.values_list("variant_id", "quantity"):
+        quantities[variant_id] += quantity
+    return quantities
+
+
+def lock_variants(variant_ids):
+    list(
+        ProductVariant.objects.select_for_update().filter(
+            id__in=variant_ids
+        ).order_by("id").values_list("id", flat=True)
+    )
+
+
+def change(field, quantities, sign):
+    return Case(
+        *(When(id=variant_id, then=F(field) + sign * quantity) for variant_id, quantity in quantities.items()),
+        output_field=PositiveIntegerField()
+    )
+
+
+def schedule_sweep(delay=None):
+    if delay is None:
+        next_expiry = StockReservation.objects.filter(
+            status=ReservationStatusType.HELD
+        ).aggregate(next_expiry=Min("expires_at"))["next_expiry"]
+
+        if next_expiry is None:
+            return
+
+        delay = max(0, (next_expiry - timezone.now()).total_seconds())
+
+    # یک sweep در صف کافی است؛ بعد از اجرا خودش را برای رزرو بعدی زمان‌بندی می‌کند
+    enqueue(SWEEP_TASK, delay=delay, unique_key=SWEEP_TASK)
+
+
+def hold(order, quantities):
+    """
+    Move ``quantities`` ({variant_id: n}) of ``order`` from stock to
+    reserved with one conditional UPDATE; raises InsufficientStock (and
+    changes nothing) if any variant has less. The caller runs this in a
+    transaction with the variants already locked in id order.
+    """
+    held = ProductVariant.objects.filter(
+        reduce(
+            or_,
+            (Q(id=variant_id, stock__gte=quantity) for variant_id, quantity in quantities.items())
+        )
+    ).refresh_later().update(
+        stock=change("stock", quantities, -1),
+        reserved=change("reserved", quantities, 1),
+    )
+
+    if held != len(quantities):
+        raise InsufficientStock
+
+    expires_at = expiry()
+
+    reservations = StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order,
+            variant_id=variant_id,
+            quantity=quantity,
+            expires_at=expires_at,
+        )
+        for variant_id, quantity in quantities.items()
+    ])
+
+    schedule_sweep(delay=(expires_at - timezone.now()).total_seconds())
+
+    return reservations
+
+
+def held_reservations(order):
+    return list(
+        order.reservations.select_for_update().filter(
+            status=ReservationStatusType.HELD
+        )
+    )
+
+
+def reacquire(order):
+    """
+    The holds of ``order`` were released (e.g. the customer paid after they
+    expired): take the stock again if it is still there.
+    """
+    quantities = order_quantities(order)
+    lock_variants(quantities)
+    return hold(order, quantities)
+
+
+def renew(order):
+    """
+    Extend the holds of ``order`` before sending the customer to the
+    gateway; re-holds released stock. Raises InsufficientStock.
+    """
+    with transaction.atomic():
+        held = held_reservations(order)
+
+        if held:
+            order.reservations.filter(
+                pk__in=[reservation.pk for reservation in held]
+            ).update(expires_at=expiry())
+
+        elif not order.reservations.filter(status=ReservationStatusType.COMMITTED).exists():
+            reacquire(order)
+
+
+def commit(order):
+    """
+    Payment verified: the held units leave ``reserved`` for good. Raises
+    InsufficientStock if the holds had been released and the stock is gone.
+    """
+    with transaction.atomic():
+        held = held_reservations(order)
+
+        if not held:
+            if order.reservations.filter(status=ReservationStatusType.COMMITTED).exists():
+                return
+
+            held = reacquire(order)
+
+        quantities = totals(held)
+        lock_variants(quantities)
+
+        ProductVariant.objects.filter(id__in=quantities).update(
+            reserved=change("reserved", quantities, -1)
+        )
+
+        StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in held]
+        ).update(status=ReservationStatusType.COMMITTED)
+
+
+def confirm_orders(orders):
+    """
+    Payment verified for ``orders``: their held reservations become
+    COMMITTED without touching variant rows. Returns
+    ``({order_id: {variant_id: n}}, unfulfilled)``: the units still to take
+    out of ``reserved`` (``apply_confirmed``), and the orders whose holds
+    had been released and whose stock is gone. Released holds are taken
+    again and committed inline.
+    """
+    confirmed = {}
+    unfulfilled = []
+
+    with transaction.atomic():
+        held = list(
+            StockReservation.objects.select_for_update().filter(
+                order__in=orders,
+                status=ReservationStatusType.HELD
+            ).order_by("id")
+        )
+
+        StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in held]
+        ).update(status=ReservationStatusType.COMMITTED)
+
+        for reservation in held:
+            quantities = confirmed.setdefault(reservation.order_id, defaultdict(int))
+            quantities[reservation.variant_id] += reservation.quantity
+
+        for order in orders:
+            if order.pk in confirmed:
+                continue
+
+            try:
+                with transaction.atomic():
+                    commit(order)
+            except InsufficientStock:
+                unfulfilled.append(order)
+            else:
+                confirmed[order.pk] = {}
+
+    return confirmed, unfulfilled
+
+
+def confirm(order):
+    """
+    ``confirm_orders`` for one order; raises InsufficientStock.
+    """
+    confirmed, unfulfilled = confirm_orders([order])
+
+    if unfulfilled:
+        raise InsufficientStock
+
+    return confirmed[order.pk]
+
+
+def apply_confirmed(quantities):
+    """
+    ``reserved -= n`` for confirmed units ({variant_id: n}), one UPDATE.
+    """
+    quantities = {int(variant_id): quantity for variant_id, quantity in quantities.items() if quantity}
+
+    if not quantities:
+        return
+
+    lock_variants(quantities)
+
+    ProductVariant.objects.filter(id__in=quantities).update(
+        reserved=change("reserved", quantities, -1)
+    )
+
+
+def release(reservations):
+    """
+    Give held ``reservations`` (locked by the caller) back to stock.
+    """
+    quantities = totals(reservations)
+    lock_variants(quantities)
+
+    ProductVariant.objects.filter(id__in=quantities).refresh_later().update(
+        stock=change("stock", quantities, 1),
+        reserved=change("reserved", quantities, -1),
+    )
+
+    StockReservation.objects.filter(
+        pk__in=[reservation.pk for reservation in reservations]
+    ).update(status=ReservationStatusType.RELEASED)
+
+
+def expire(order):
+    """
+    Payment failed: end the holds now and let the sweeper release them.
+    """
+    expire_orders([order.pk])
+
+
+def expire_orders(order_ids):
+    StockReservation.objects.filter(
+        order_id__in=order_ids,
+        status=ReservationStatusType.HELD
+    ).update(expires_at=timezone.now())
+
+    schedule_sweep(delay=0)
+
+
+def release_expired(batch_size=500):
+    """
+    Release expired holds and cancel their still pending orders, one
+    batch per transaction; returns the number of released reservations.
+    """
+    released = 0
+
+    while True:
+        with transaction.atomic():
+            reservations = list(
+                StockReservation.objects.select_for_update(skip_locked=True).filter(
+                    status=ReservationStatusType.HELD,
+                    expires_at__lte=timezone.now()
+                ).order_by("expires_at")[:batch_size]
+            )
+
+            if not reservations:
+                break
+
+            release(reservations)
+
+            OrderModel.objects.filter(
+                pk__in={reservation.order_id for reservation in reservations},
+                status=OrderStatusType.PENDING
+            ).update(status=OrderStatusType.FAILED)
+
+        released += len(reservations)
+
+        if len(reservations) < batch_size:
+            break
+
+    schedule_sweep()
+
+    return released
@@ -8,9 +8,10 @@ from .models import (OrderModel,
                      )
 from shop.seralizers import ProductVariantSerializer
 from shop.models import ProductVariant
+from . import reservations
+from collections import defaultdict
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import F
 
 class CouponApplySerializer(serializers.ModelSerializer):
     code = serializers.CharField(max_length=10)
@@ -66,7 +67,7 @@ class OrderCreateItemSerializer(serializers.Serializer):
     
 
 class OrderCreateSerializer(serializers.ModelSerializer):
-    items = OrderCreateItemSerializer(many=True)
+    items = OrderCreateItemSerializer(many=True, allow_empty=False)
     coupon_code = serializers.CharField(required=False, allow_null=True, allow_blank=True)
 
     class Meta:
@@ -101,58 +102,76 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             coupon = coupon_serializer.validated_data["coupon"]
             discount_percent = coupon.discount_percent
 
-        with transaction.atomic():
+        # quantities per variant; repeated lines of one variant are merged
+        quantities = defaultdict(int)
+        for item in items_data:
+            quantities[item["variant_id"]] += item["quantity"]
 
-            order = OrderModel.objects.create(
-                user=user,
-                coupon=coupon,
-                **validated_data
-            )
+        variant_ids = sorted(quantities)
 
-            total_price = 0
+        with transaction.atomic():
 
-            for item in items_data:
-                variant = ProductVariant.objects.select_for_update().get(
-                    id=item["variant_id"],
+            # one locking query, rows locked in id order so concurrent checkouts cannot deadlock
+            variants = list(
+                ProductVariant.objects.select_for_update(of=("self",)).filter(
+                    id__in=variant_ids,
                     is_active=True
-                )
+                ).select_related(
+                    "product",
+                    "color",
+                    "size"
+                ).order_by("id")
+            )
 
-                quantity = item["quantity"]
+            if len(variants) != len(variant_ids):
+                raise serializers.ValidationError(
+                    {"error": "برخی از محصولات انتخاب شده موجود نیستند"}
+                )
 
-                
-                if variant.stock < quantity:
+            for variant in variants:
+                if variant.stock < quantities[variant.id]:
                     raise serializers.ValidationError(
-                        f"موجودی برای {variant} کافی نیست"
+                        {"error": f"موجودی برای {variant} کافی نیست"}
                     )
 
-                price = variant.final_price
-
-                OrderItemsModel.objects.create(
-                    order=order,
-                    variant=variant,
-                    quantity=quantity,
-                    price=price
-                )
-
-                
-                variant.stock = F("stock") - quantity
-                variant.save(update_fields=["stock"])
-
-                total_price += price * quantity
+            total_price = sum(
+                variant.final_price * quantities[variant.id]
+                for variant in variants
+            )
 
-            
             if discount_percent:
                 total_price = total_price - (total_price * discount_percent // 100)
 
                 coupon.used_by.add(user)
 
-                
                 if hasattr(coupon, "usage_limit") and coupon.usage_limit == 1:
                     coupon.is_active = False
                     coupon.save(update_fields=["is_active"])
 
-            order.total_price = total_price
-            order.save(update_fields=["total_price"])
+            order = OrderModel.objects.create(
+                user=user,
+                coupon=coupon,
+                total_price=total_price,
+                **validated_data
+            )
+
+            # held until the payment is verified or the hold expires (order.reservations)
+            try:
+                reservations.hold(order, quantities)
+            except reservations.InsufficientStock:
+                raise serializers.ValidationError(
+                    {"error": "موجودی برخی از محصولات کافی نیست"}
+                )
+
+            OrderItemsModel.objects.bulk_create([
+                OrderItemsModel(
+                    order=order,
+                    variant=variant,
+                    quantity=quantities[variant.id],
+                    price=variant.final_price
+                )
+                for variant in variants
+            ])
 
         return order
 
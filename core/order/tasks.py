@@ -0,0 +1,8 @@
+from tasks.base import task
+
+from . import reservations
+
+
+@task()
+def release_expired_reservations():
+    reservations.release_expired()
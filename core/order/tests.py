@@ -1,3 +1,185 @@
+import importlib
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from shop.models import ProductVariant
+from shop.tests import CatalogFixtureMixin
+from tasks.models import Task, TaskStatus
+
+from . import reservations
+from .models import (
+    OrderModel,
+    OrderStatusType,
+    ReservationStatusType,
+    ShippingMethodType,
+    UserAddressModel,
+)
+
+
+class OrderFixtureMixin(CatalogFixtureMixin):
+
+    def setUp(self):
+        super().setUp()
+
+        self.user = User.objects.create_user(
+            phone_number="09120000001",
+            password="password"
+        )
+
+        self.address = UserAddressModel.objects.create(
+            user=self.user,
+            address="خیابان",
+            state="اصفهان",
+            city="اصفهان",
+            zip_code="12345",
+        )
+
+        self.client.force_authenticate(self.user)
+
+    def order(self, items):
+        return self.client.post(
+            reverse("order:order-create"),
+            {
+                "address": self.address.pk,
+                "shipping_method": ShippingMethodType.PISHTAZ,
+                "items": items,
+            },
+            format="json"
+        )
+
+    def items(self, products, quantity=1):
+        return [
+            {"variant_id": product.variants.get().pk, "quantity": quantity}
+            for product in products
+        ]
+
+
+
+class OrderCreateTests(OrderFixtureMixin, TestCase):
+
+    client_class = APIClient
+
+    def count_order_queries(self, items):
+        with CaptureQueriesContext(connection) as context:
+            response = self.order(items)
+
+        self.assertEqual(response.status_code, 201)
+
+        return len(context.captured_queries)
+
+    def test_queries_do_not_grow_with_cart_size(self):
+        products = self.create_products(8)
+
+        # the first order also queues the reservation sweeper
+        self.count_order_queries(self.items(products[:1]))
+
+        few = self.count_order_queries(self.items(products[:2]))
+
+        self.assertEqual(self.count_order_queries(self.items(products)), few)
+
+    def test_oversell_rolls_back_the_whole_order(self):
+        products = self.create_products(2)
+
+        items = self.items(products[:1]) + self.items(products[1:], quantity=6)
+
+        response = self.order(items)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OrderModel.objects.exists())
+        self.assertEqual(
+            set(ProductVariant.objects.values_list("stock", flat=True)),
+            {5}
+        )
+
+    def test_repeated_lines_are_merged(self):
+        product, = self.create_products(1)
+
+        response = self.order(self.items([product], quantity=2) * 2)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(product.variants.get().stock, 1)
+        self.assertEqual(response.data["order_items"][0]["quantity"], 4)
+        self.assertEqual(response.data["total_price"], "400000")
+
+
+class StockReservationTests(OrderFixtureMixin, TestCase):
+
+    client_class = APIClient
+
+    def create_order(self, quantity=2):
+        product = self.create_products(1)[-1]
+
+        response = self.order(self.items([product], quantity=quantity))
+        self.assertEqual(response.status_code, 201)
+
+        return OrderModel.objects.get(pk=response.data["id"]), product.variants.get()
+
+    def assertVariant(self, variant, stock, reserved):
+        variant.refresh_from_db()
+        self.assertEqual((variant.stock, variant.reserved), (stock, reserved))
+
+    def test_order_holds_stock(self):
+        order, variant = self.create_order()
+
+        self.assertVariant(variant, 3, 2)
+        self.assertEqual(order.reservations.get().status, ReservationStatusType.HELD)
+
+    def test_commit(self):
+        order, variant = self.create_order()
+
+        reservations.commit(order)
+        reservations.commit(order)
+
+        self.assertVariant(variant, 3, 0)
+        self.assertEqual(order.reservations.get().status, ReservationStatusType.COMMITTED)
+
+    def test_expired_holds_are_released(self):
+        order, variant = self.create_order()
+
+        reservations.expire(order)
+
+        self.assertEqual(reservations.release_expired(), 1)
+        self.assertVariant(variant, 5, 0)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatusType.FAILED)
+
+    def test_commit_after_release_takes_stock_again(self):
+        order, variant = self.create_order()
+
+        reservations.expire(order)
+        reservations.release_expired()
+
+        reservations.commit(order)
+        self.assertVariant(variant, 3, 0)
+
+        ProductVariant.objects.filter(pk=variant.pk).update(stock=1)
+        other, other_variant = self.create_order(quantity=1)
+        reservations.expire(other)
+        reservations.release_expired()
+        ProductVariant.objects.filter(pk=other_variant.pk).update(stock=0)
+
+        with self.assertRaises(reservations.InsufficientStock):
+            reservations.commit(other)
+
+    def test_migration_schedules_a_sweep_for_backfilled_holds(self):
+        migration = importlib.import_module("order.migrations.0005_schedule_reservation_sweep")
+
+        order, variant = self.create_order()
+
+        # مثل 0004: رزروها هستند ولی sweep در صف نیست
+        Task.objects.all().delete()
+
+        migration.schedule_sweep(apps, None)
+        migration.schedule_sweep(apps, None)
 
-# Create your tests here.
+        task = Task.objects.get()
+        self.assertEqual((task.name, task.unique_key, task.status), (reservations.SWEEP_TASK, reservations.SWEEP_TASK, TaskStatus.QUEUED))
+        self.assertEqual(task.run_at, order.reservations.get().expires_at)
@@ -0,0 +1,29 @@
+from django.contrib import admin
+
+from .models import OutboxEvent
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "topic",
+        "attempts",
+        "available_date",
+        "created_date",
+        "processed_date",
+    )
+
+    list_filter = (
+        "topic",
+        ("processed_date", admin.EmptyFieldListFilter),
+    )
+
+    readonly_fields = (
+        "topic",
+        "payload",
+        "attempts",
+        "last_error",
+        "created_date",
+        "processed_date",
+    )
@@ -0,0 +1,165 @@
+"""
+Transactional outbox.
+
+``publish`` writes an event in the caller's transaction, so an effect is
+recorded if and only if the change that caused it commits, and the caller
+does not wait for it. The drain task applies pending events in batches,
+one handler call per topic. A batch's database effects and its processed
+mark commit together; anything a handler does outside the database (a
+notification) can repeat after a crash, so handlers must tolerate
+delivery more than once.
+"""
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from tasks.base import enqueue
+
+from .models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+DRAIN_TASK = "outbox.drain_outbox"
+
+MAX_BACKOFF = 60 * 60
+
+# موضوع -> تابعی که لیست رویدادها را می‌گیرد
+handlers = {}
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def handler(topic):
+    """
+    Register ``func(events)`` as the handler of ``topic``.
+    """
+    def decorator(func):
+        handlers[topic] = func
+        return func
+
+    return decorator
+
+
+def schedule_drain(delay=None):
+    if delay is None:
+        next_date = OutboxEvent.objects.filter(
+            processed_date=None
+        ).aggregate(next_date=Min("available_date"))["next_date"]
+
+        if next_date is None:
+            return
+
+        delay = max(0, (next_date - timezone.now()).total_seconds())
+
+    # رویدادهای پشت سر هم با یک drain در صف جمع می‌شوند
+    enqueue(DRAIN_TASK, delay=delay, unique_key=DRAIN_TASK)
+
+
+def publish_many(topic, payloads):
+    """
+    Record events of ``topic`` in the current transaction.
+    """
+    if topic not in handlers:
+        raise KeyError(f"No outbox handler for {topic!r}")
+
+    events = OutboxEvent.objects.bulk_create([
+        OutboxEvent(topic=topic, payload=payload)
+        for payload in payloads
+    ])
+
+    if events:
+        schedule_drain(delay=setting("OUTBOX_DRAIN_DELAY", 1))
+
+    return events
+
+
+def publish(topic, payload):
+    return publish_many(topic, [payload])[0]
+
+
+def retry_delay(attempts):
+    return min(setting("OUTBOX_BACKOFF", 30) * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def apply(topic, events):
+    """
+    Run the handler in a savepoint; on failure a batch is retried event by
+    event so one bad event does not hold back the others. Returns the
+    events that failed (their attempts and next run are updated).
+    """
+    try:
+        with transaction.atomic():
+            handlers[topic](events)
+        return []
+
+    except Exception:
+        if len(events) > 1:
+            return [failed for event in events for failed in apply(topic, [event])]
+
+        event = events[0]
+        event.attempts += 1
+        event.last_error = traceback.format_exc()
+        event.available_date = timezone.now() + timedelta(seconds=retry_delay(event.attempts))
+
+        logger.warning("Outbox event %s (%s) failed (attempt %s)", event.pk, topic, event.attempts, exc_info=True)
+
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            attempts=event.attempts,
+            last_error=event.last_error,
+            available_date=event.available_date,
+        )
+
+        return [event]
+
+
+def drain(batch_size=100):
+    """
+    Apply pending events, a batch per transaction; returns the number of
+    events processed.
+    """
+    processed = 0
+
+    while True:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.pending().select_for_update(skip_locked=True).order_by("id")[:batch_size]
+            )
+
+            if not events:
+                break
+
+            topics = defaultdict(list)
+
+            for event in events:
+                topics[event.topic].append(event)
+
+            done = []
+
+            for topic, batch in topics.items():
+                failed = {event.pk for event in apply(topic, batch)}
+                done.extend(event.pk for event in batch if event.pk not in failed)
+
+            OutboxEvent.objects.filter(pk__in=done).update(processed_date=timezone.now())
+
+        processed += len(done)
+
+        if len(events) < batch_size:
+            break
+
+    return processed
+
+
+def purge():
+    # حداکثر ساعتی یک بار
+    if cache.add("outbox:purged", True, timeout=60 * 60):
+        OutboxEvent.objects.purge()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from outbox.base import drain
+from outbox.models import OutboxEvent
+
+
+class Command(BaseCommand):
+
+    help = "Apply pending outbox events (the task worker also does this after every publish)"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of events applied per transaction",
+        )
+
+        parser.add_argument(
+            "--purge",
+            action="store_true",
+            help="Also delete processed events older than OUTBOX_KEEP_DAYS",
+        )
+
+    def handle(self, *args, **options):
+
+        processed = drain(options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Applied {processed} events")
+        )
+
+        if options["purge"]:
+            deleted, _ = OutboxEvent.objects.purge()
+            self.stdout.write(f"Deleted {deleted} processed events")
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:37
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100, verbose_name='موضوع')),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='داده')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخرین خطا')),
+                ('available_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان اجرا')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('processed_date', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ اجرا')),
+            ],
+            options={
+                'verbose_name': 'رویداد',
+                'verbose_name_plural': 'رویدادها',
+                'indexes': [models.Index(condition=models.Q(('processed_date', None)), fields=['available_date', 'id'], name='outbox_pending_idx'), models.Index(fields=['processed_date'], name='outbox_outb_process_398bd0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class OutboxEventQuerySet(models.QuerySet):
+
+    def pending(self, now=None):
+        return self.filter(
+            processed_date=None,
+            available_date__lte=now or timezone.now()
+        )
+
+    def purge(self):
+        days = getattr(settings, "OUTBOX_KEEP_DAYS", 7)
+
+        return self.filter(
+            processed_date__lt=timezone.now() - timedelta(days=days)
+        ).delete()
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect to apply after the transaction that wrote it commits.
+    """
+    topic = models.CharField(max_length=100, verbose_name="موضوع")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="داده")
+
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="تعداد تلاش")
+    last_error = models.TextField(blank=True, verbose_name="آخرین خطا")
+
+    # بعد از خطا تا این زمان دوباره اجرا نمی‌شود
+    available_date = models.DateTimeField(default=timezone.now, verbose_name="زمان اجرا")
+
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد")
+    processed_date = models.DateTimeField(null=True, blank=True, verbose_name="تاریخ اجرا")
+
+    objects = OutboxEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "رویداد"
+        verbose_name_plural = "رویدادها"
+
+        indexes = [
+            models.Index(
+                fields=["available_date", "id"],
+                condition=Q(processed_date=None),
+                name="outbox_pending_idx",
+            ),
+            models.Index(fields=["processed_date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
@@ -0,0 +1,13 @@
+from tasks.base import task
+
+from . import base
+
+
+@task(max_attempts=1)
+def drain_outbox():
+    try:
+        base.drain()
+        base.purge()
+    finally:
+        # رویدادهای ناموفق در زمان تلاش بعدی‌شان
+        base.schedule_drain()
@@ -0,0 +1,52 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from . import base
+from .models import OutboxEvent
+
+
+class DrainTests(TestCase):
+
+    def setUp(self):
+        self.applied = []
+
+        def apply(events):
+            for event in events:
+                if event.payload.get("fail"):
+                    raise RuntimeError("boom")
+            self.applied.append([event.payload["n"] for event in events])
+
+        patcher = mock.patch.dict(base.handlers, {"tests.event": apply})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_events_are_applied_once_in_a_batch(self):
+        base.publish_many("tests.event", [{"n": 1}, {"n": 2}, {"n": 3}])
+
+        self.assertEqual(base.drain(), 3)
+        self.assertEqual(base.drain(), 0)
+
+        self.assertEqual(self.applied, [[1, 2, 3]])
+        self.assertFalse(OutboxEvent.objects.filter(processed_date=None).exists())
+
+    def test_failing_event_does_not_hold_back_the_batch(self):
+        base.publish_many("tests.event", [{"n": 1}, {"n": 2, "fail": True}, {"n": 3}])
+
+        with self.assertLogs("outbox.base", "WARNING"):
+            self.assertEqual(base.drain(), 2)
+
+        self.assertEqual(self.applied, [[1], [3]])
+
+        failed = OutboxEvent.objects.get(processed_date=None)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.available_date, timezone.now() + timedelta(seconds=20))
+
+        # تا زمان تلاش بعدی دوباره اجرا نمی‌شود
+        self.assertEqual(base.drain(), 0)
+
+    def test_unknown_topic_is_rejected(self):
+        with self.assertRaises(KeyError):
+            base.publish("tests.unknown", {})
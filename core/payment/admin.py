@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentModel, PaymentStatusType
+from .models import PaymentModel, PaymentStatusType, ReconciliationCheckpoint
 from django.utils.html import format_html
 
 
@@ -89,4 +89,24 @@ class PaymentAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         if obj and obj.status == PaymentStatusType.SUCCESS:
             return False
-        return super().has_delete_permission(request, obj)
\ No newline at end of file
+        return super().has_delete_permission(request, obj)
+
+
+@admin.register(ReconciliationCheckpoint)
+class ReconciliationCheckpointAdmin(admin.ModelAdmin):
+
+    list_display = (
+        "name",
+        "last_payment_id",
+        "checked",
+        "paid",
+        "failed",
+        "errors",
+        "started_date",
+        "completed_date",
+    )
+
+    readonly_fields = list_display + ("updated_date",)
+
+    def has_add_permission(self, request):
+        return False
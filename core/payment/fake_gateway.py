@@ -0,0 +1,255 @@
+"""
+A local stand-in for ZarinPal's v4 API, for offline checkout and load
+tests (``manage.py fake_zarinpal``). It implements the part of the
+contract ZarinPalSandbox uses:
+
+    POST /pg/v4/payment/request.json   -> authority
+    GET  /pg/StartPay/<authority>      -> 302 to callback_url?Authority=..&Status=OK|NOK
+    POST /pg/v4/payment/verify.json    -> code 100 (paid), then 101 (already verified)
+
+plus ``GET /__stats__`` (every authority and what happened to it) and
+``POST /__reset__`` for the load test. Point ZARINPAL_BASE_URL at it.
+"""
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlsplit
+
+
+REQUEST_PATH = "/pg/v4/payment/request.json"
+VERIFY_PATH = "/pg/v4/payment/verify.json"
+STARTPAY_PATH = "/pg/StartPay/"
+
+# ZarinPal error codes used here
+INVALID_INPUT = -9
+AMOUNT_MISMATCH = -50
+NOT_PAID = -51
+UNKNOWN_AUTHORITY = -54
+
+
+class FakeZarinPal:
+
+    """
+    Gateway state; every public method is thread safe.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, cancel_rate=0.0,
+                 already_verified_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.cancel_rate = cancel_rate
+        self.already_verified_rate = already_verified_rate
+
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.payments = {}
+            self.counters = {"request": 0, "verify": 0, "startpay": 0, "errors": 0}
+            self.next_ref_id = 1000
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        with self.lock:
+            seconds = self.latency + self.random.uniform(0, self.jitter)
+        time.sleep(seconds)
+
+    def fail_now(self):
+        """
+        Whether this call should answer 500 (counted).
+        """
+        if not self.chance(self.error_rate):
+            return False
+
+        with self.lock:
+            self.counters["errors"] += 1
+
+        return True
+
+    # ---- endpoints
+
+    def request(self, payload):
+        with self.lock:
+            self.counters["request"] += 1
+
+        if not payload.get("merchant_id") or not payload.get("amount") or not payload.get("callback_url"):
+            return error(INVALID_INPUT, "The input params invalid, validation error.")
+
+        authority = "A" + secrets.token_hex(18)[:35]
+
+        with self.lock:
+            self.payments[authority] = {
+                "amount": int(payload["amount"]),
+                "callback_url": payload["callback_url"],
+                "description": payload.get("description", ""),
+                "paid": False,
+                "cancelled": False,
+                "verified": 0,
+                "ref_id": None,
+            }
+
+        return {
+            "data": {"code": 100, "message": "Success", "authority": authority, "fee_type": "Merchant", "fee": 0},
+            "errors": [],
+        }
+
+    def start_pay(self, authority):
+        """
+        The customer "pays": returns the callback URL to redirect to, or
+        None for an unknown authority.
+        """
+        cancelled = self.chance(self.cancel_rate)
+
+        with self.lock:
+            self.counters["startpay"] += 1
+
+            payment = self.payments.get(authority)
+
+            if payment is None:
+                return None
+
+            if not payment["paid"] and not payment["cancelled"]:
+                payment["paid"] = not cancelled
+                payment["cancelled"] = cancelled
+
+            status = "OK" if payment["paid"] else "NOK"
+            separator = "&" if urlsplit(payment["callback_url"]).query else "?"
+
+            return payment["callback_url"] + separator + urlencode({"Authority": authority, "Status": status})
+
+    def verify(self, payload):
+        already_verified = self.chance(self.already_verified_rate)
+
+        with self.lock:
+            self.counters["verify"] += 1
+
+            payment = self.payments.get(payload.get("authority"))
+
+            if payment is None:
+                return error(UNKNOWN_AUTHORITY, "Authority is invalid.")
+
+            if int(payload.get("amount") or 0) != payment["amount"]:
+                return error(AMOUNT_MISMATCH, "Amount is not the same as the payment.")
+
+            if not payment["paid"]:
+                return error(NOT_PAID, "Session is not valid, session is not active paid try.")
+
+            if payment["ref_id"] is None:
+                payment["ref_id"] = self.next_ref_id
+                self.next_ref_id += 1
+
+            payment["verified"] += 1
+
+            # 101 روی تایید اول یعنی پرداخت قبلا (مثلا در یک تلاش قطع‌شده) تایید شده
+            code = 101 if payment["verified"] > 1 or already_verified else 100
+
+            return {
+                "data": {
+                    "code": code,
+                    "message": "Paid" if code == 100 else "Verified",
+                    "card_hash": "0" * 64,
+                    "card_pan": "502229******5995",
+                    "ref_id": payment["ref_id"],
+                    "fee_type": "Merchant",
+                    "fee": 0,
+                },
+                "errors": [],
+            }
+
+    def stats(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "payments": {authority: dict(payment) for authority, payment in self.payments.items()},
+            }
+
+
+def error(code, message):
+    return {"data": [], "errors": {"code": code, "message": message, "validations": []}}
+
+
+def make_handler(gateway, verbose=False):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        # keep-alive, like the real gateway
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, body, status=200):
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return None
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            payload = self.read_json()
+
+            if path == "/__reset__":
+                gateway.reset()
+                return self.send_json({"reset": True})
+
+            if path not in (REQUEST_PATH, VERIFY_PATH):
+                return self.send_json(error(INVALID_INPUT, "Not found."), status=404)
+
+            gateway.delay()
+
+            if gateway.fail_now():
+                return self.send_json({"message": "Internal Server Error"}, status=500)
+
+            if not isinstance(payload, dict):
+                return self.send_json(error(INVALID_INPUT, "Invalid JSON."), status=400)
+
+            body = gateway.request(payload) if path == REQUEST_PATH else gateway.verify(payload)
+
+            self.send_json(body, status=400 if body["errors"] else 200)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+
+            if path == "/__stats__":
+                return self.send_json(gateway.stats())
+
+            if not path.startswith(STARTPAY_PATH):
+                return self.send_json(error(INVALID_INPUT, "Not found."), status=404)
+
+            location = gateway.start_pay(path[len(STARTPAY_PATH):].strip("/"))
+
+            if location is None:
+                return self.send_json(error(UNKNOWN_AUTHORITY, "Authority is invalid."), status=404)
+
+            self.send_response(302)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def make_server(gateway, host="127.0.0.1", port=8765, verbose=False):
+    server = ThreadingHTTPServer((host, port), make_handler(gateway, verbose=verbose))
+    server.daemon_threads = True
+    return server
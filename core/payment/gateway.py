@@ -0,0 +1,371 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from functools import lru_cache
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# ==========================================
+# Errors
+# ==========================================
+
+class ZarinPalError(Exception):
+    pass
+
+
+class GatewayUnavailable(ZarinPalError):
+    """
+    The circuit is open: the call was not attempted.
+    """
+
+
+# ==========================================
+# Session
+# ==========================================
+
+@lru_cache(maxsize=None)
+def get_session():
+    """
+    One keep-alive connection pool per process. Only connection errors are
+    retried here (the request never reached the gateway); read retries are
+    decided per call.
+    """
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=getattr(settings, "ZARINPAL_POOL_SIZE", 10),
+        max_retries=Retry(total=None, connect=2, read=0, status=0, backoff_factor=0.1),
+    )
+
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    session.headers.update({
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    })
+
+    return session
+
+
+# one AsyncClient per event loop: its connections belong to the loop that opened them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    Keep-alive pool for the async views. Like the sync session, only
+    connection errors are retried by the transport.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+
+    if client is None or client.is_closed:
+        connect, read = timeouts()
+        pool_size = getattr(settings, "ZARINPAL_ASYNC_POOL_SIZE", 100)
+
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=httpx.AsyncHTTPTransport(retries=2),
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+        )
+
+        _async_clients[loop] = client
+
+    return client
+
+
+def timeouts():
+    return (
+        getattr(settings, "ZARINPAL_CONNECT_TIMEOUT", 3),
+        getattr(settings, "ZARINPAL_READ_TIMEOUT", 10),
+    )
+
+
+# ==========================================
+# Circuit breaker
+# ==========================================
+
+class CircuitBreaker:
+
+    """
+    Per-process breaker over a sliding window of call outcomes. Opens when
+    at least ``min_calls`` calls in ``window`` seconds failed at
+    ``failure_rate`` or more; after ``reset_timeout`` one trial call is let
+    through (half open) and decides whether it closes again; a trial that
+    never reports back is replaced by another after ``reset_timeout``.
+
+    ``record`` returns True when the call opened the circuit; the caller
+    counts it (the metric is a cache write, made outside the lock and, in
+    async views, off the event loop).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=30, reset_timeout=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.outcomes = deque()
+
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.outcomes and self.outcomes[0][0] < now - self.window:
+            self.outcomes.popleft()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            now = time.monotonic()
+
+            # باز: بعد از reset_timeout یک درخواست آزمایشی؛ نیمه‌باز: اگر نتیجه
+            # آزمایش تا reset_timeout نرسید، آزمایش تازه
+            if now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return True
+
+            return False
+
+    def record(self, success):
+        with self._lock:
+            now = time.monotonic()
+
+            if self.state == self.HALF_OPEN:
+                if success:
+                    self.state = self.CLOSED
+                    self.outcomes.clear()
+                    return False
+
+                return self._open(now)
+
+            self.outcomes.append((now, success))
+            self._trim(now)
+
+            failures = sum(1 for _, ok in self.outcomes if not ok)
+
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_rate:
+                return self._open(now)
+
+            return False
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.outcomes.clear()
+
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_breaker():
+    return CircuitBreaker("zarinpal", **getattr(settings, "ZARINPAL_CIRCUIT_BREAKER", {}))
+
+
+# ==========================================
+# Metrics
+# ==========================================
+#
+# Counters in the shared cache so every gunicorn worker adds to the same
+# numbers: calls, total milliseconds and a latency histogram per
+# operation and outcome (ok / error / rejected). ``manage.py gateway_stats``
+# prints them.
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+OPERATIONS = ("request", "verify", "breaker")
+
+OUTCOMES = ("ok", "error", "rejected", "opened")
+
+
+def metric_key(operation, outcome, name):
+    return f"payment:gateway:{operation}:{outcome}:{name}"
+
+
+def incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, delta)
+
+
+def record_metric(operation, outcome, seconds):
+    incr(metric_key(operation, outcome, "count"))
+    incr(metric_key(operation, outcome, "ms"), int(seconds * 1000))
+
+    bucket = next(
+        (str(bound) for bound in LATENCY_BUCKETS if seconds <= bound),
+        "inf"
+    )
+    incr(metric_key(operation, outcome, f"le_{bucket}"))
+
+
+def read_metrics():
+    """
+    ``{(operation, outcome): {"count", "ms", "buckets": {bound: n}}}``
+    """
+    bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["inf"]
+
+    keys = [
+        metric_key(operation, outcome, name)
+        for operation in OPERATIONS
+        for outcome in OUTCOMES
+        for name in ["count", "ms"] + [f"le_{bound}" for bound in bounds]
+    ]
+
+    values = cache.get_many(keys)
+
+    metrics = {}
+
+    for operation in OPERATIONS:
+        for outcome in OUTCOMES:
+            count = values.get(metric_key(operation, outcome, "count"))
+
+            if not count:
+                continue
+
+            metrics[operation, outcome] = {
+                "count": count,
+                "ms": values.get(metric_key(operation, outcome, "ms"), 0),
+                "buckets": {
+                    bound: values.get(metric_key(operation, outcome, f"le_{bound}"), 0)
+                    for bound in bounds
+                },
+            }
+
+    return metrics
+
+
+# ==========================================
+# Calls
+# ==========================================
+
+def decode(operation, response):
+    if response.status_code >= 500:
+        raise ZarinPalError(f"ZarinPal {operation} returned {response.status_code}")
+
+    # 4xx بدنه خطای زرین‌پال را دارد و پاسخ معتبر حساب می‌شود
+    return response.json()
+
+
+def as_error(operation, error):
+    if isinstance(error, ZarinPalError):
+        return error
+
+    return ZarinPalError(f"ZarinPal {operation} failed: {error}")
+
+
+def post(operation, url, payload, retries=0):
+    """
+    POST ``payload`` through the breaker; returns the decoded JSON body.
+    ``retries`` extra attempts are made on timeouts and 5xx (only for
+    calls that are safe to repeat).
+    """
+    breaker = get_breaker()
+
+    if not breaker.allow():
+        record_metric(operation, "rejected", 0)
+        raise GatewayUnavailable("ZarinPal circuit is open")
+
+    success = False
+
+    try:
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+
+            try:
+                data = decode(operation, get_session().post(url, json=payload, timeout=timeouts()))
+
+            except (requests.RequestException, ValueError, ZarinPalError) as error:
+                record_metric(operation, "error", time.monotonic() - started)
+
+                if attempt < retries:
+                    attempt += 1
+                    time.sleep(0.2 * attempt)
+                    continue
+
+                raise as_error(operation, error) from error
+
+            success = True
+            record_metric(operation, "ok", time.monotonic() - started)
+
+            return data
+
+    finally:
+        # هر خروجی ثبت می‌شود، حتی خطای پیش‌بینی نشده؛ وگرنه درخواست آزمایشی نیمه‌باز بی‌جواب می‌ماند
+        if breaker.record(success):
+            record_metric("breaker", "opened", 0)
+
+
+# شمارنده‌ها در cache مشترک نوشته می‌شوند (I/O همگام)، پس بیرون از event loop
+arecord_metric = sync_to_async(record_metric, thread_sensitive=False)
+
+
+async def apost(operation, url, payload, retries=0):
+    """
+    ``post`` for async views: the wait for the gateway is an await on the
+    event loop, not a blocked thread.
+    """
+    breaker = get_breaker()
+
+    if not breaker.allow():
+        await arecord_metric(operation, "rejected", 0)
+        raise GatewayUnavailable("ZarinPal circuit is open")
+
+    success = False
+
+    try:
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+
+            try:
+                data = decode(operation, await get_async_client().post(url, json=payload))
+
+            except (httpx.HTTPError, ValueError, ZarinPalError) as error:
+                await arecord_metric(operation, "error", time.monotonic() - started)
+
+                if attempt < retries:
+                    attempt += 1
+                    await asyncio.sleep(0.2 * attempt)
+                    continue
+
+                raise as_error(operation, error) from error
+
+            success = True
+            await arecord_metric(operation, "ok", time.monotonic() - started)
+
+            return data
+
+    finally:
+        # CancelledError (قطع اتصال کاربر زیر ASGI) هم از اینجا می‌گذرد
+        if breaker.record(success):
+            await arecord_metric("breaker", "opened", 0)
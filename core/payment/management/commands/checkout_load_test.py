@@ -0,0 +1,472 @@
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from accounts.models import User
+from order.models import OrderItemsModel, OrderModel, OrderStatusType, ShippingMethodType, UserAddressModel
+from outbox.models import OutboxEvent
+from shop.models import ProductVariant
+
+
+STEPS = (
+    "otp_request",
+    "otp_verify",
+    "cart_add",
+    "order_create",
+    "payment_request",
+    "startpay",
+    "verify",
+    "verify_replay",
+    "cart_clear",
+)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Recorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.outcomes = Counter()
+        self.checkouts = []
+
+    @contextmanager
+    def step(self, name):
+        """
+        Times one HTTP call; the block sets ``call["status"]``.
+        """
+        call = {"status": "exception"}
+        started = time.monotonic()
+
+        try:
+            yield call
+        finally:
+            elapsed = time.monotonic() - started
+
+            with self.lock:
+                self.latencies[name].append(elapsed)
+                self.statuses[name][call["status"]] += 1
+
+    def finish(self, outcome, **checkout):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.checkouts.append(dict(checkout, outcome=outcome))
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Drive OTP login -> cart -> order -> payment request -> StartPay -> "
+        "verify against a running shop (with ZARINPAL_BASE_URL pointing at "
+        "fake_zarinpal) and check the stock and charge invariants. Uses this "
+        "settings' database for fixtures and checks: run it on a test database."
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+
+        parser.add_argument(
+            "--gateway-url",
+            default=None,
+            help="fake_zarinpal address, for the double charge checks (default: ZARINPAL_BASE_URL)",
+        )
+
+        parser.add_argument("--orders", type=int, default=200, help="Checkouts to run")
+
+        parser.add_argument("--concurrency", type=int, default=20, help="Virtual users running at once")
+
+        parser.add_argument(
+            "--variants",
+            type=int,
+            default=5,
+            help="Hot variants every checkout picks from (fewer means more contention)",
+        )
+
+        parser.add_argument("--quantity", type=int, default=1, help="Units per checkout")
+
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=None,
+            help="Set the stock of the hot variants before the run",
+        )
+
+        parser.add_argument(
+            "--replay-rate",
+            type=float,
+            default=0.1,
+            help="Fraction of checkouts that hit the verify callback twice",
+        )
+
+        parser.add_argument("--phone-prefix", default="0990", help="Phone numbers of the virtual users")
+
+        parser.add_argument("--timeout", type=float, default=30, help="Seconds per HTTP call")
+
+        parser.add_argument(
+            "--outbox-wait",
+            type=float,
+            default=30,
+            help="Seconds to wait for the worker to drain the outbox before the checks",
+        )
+
+        parser.add_argument("--seed", type=int, default=None)
+
+    # ==========================================
+    # Fixtures
+    # ==========================================
+
+    def prepare(self, options):
+
+        variants = list(
+            ProductVariant.objects.filter(is_active=True).order_by("id")[:options["variants"]]
+        )
+
+        if not variants:
+            raise CommandError("No active product variants; run insert_products first")
+
+        if options["stock"] is not None:
+            ProductVariant.objects.filter(
+                pk__in=[variant.pk for variant in variants]
+            ).update(stock=options["stock"])
+
+        initial = {
+            pk: stock + reserved
+            for pk, stock, reserved in ProductVariant.objects.filter(
+                pk__in=[variant.pk for variant in variants]
+            ).values_list("pk", "stock", "reserved")
+        }
+
+        users = []
+
+        for index in range(options["concurrency"]):
+            phone = f"{options['phone_prefix']}{index:07d}"[:11]
+
+            user, _ = User.objects.get_or_create(phone_number=phone)
+
+            address = UserAddressModel.objects.filter(user=user).first() or UserAddressModel.objects.create(
+                user=user,
+                address="آدرس تست بار",
+                state="تهران",
+                city="تهران",
+                zip_code="1234567890",
+            )
+
+            users.append((phone, address.pk))
+
+        return list(initial), initial, users
+
+    # ==========================================
+    # One virtual user
+    # ==========================================
+
+    def call(self, session, method, path, **kwargs):
+        url = path if path.startswith("http") else self.base_url + path
+        return session.request(method, url, timeout=self.timeout, allow_redirects=False, **kwargs)
+
+    def login(self, session, phone):
+
+        with self.recorder.step("otp_request") as call:
+            response = self.call(session, "POST", "/accounts/auth", json={"phone_number": phone})
+            call["status"] = response.status_code
+
+        if response.status_code != 200:
+            return False
+
+        with self.recorder.step("otp_verify") as call:
+            response = self.call(
+                session,
+                "POST",
+                "/accounts/auth/verify/",
+                json={"phone_number": phone, "code": response.json()["code"]},
+            )
+            call["status"] = response.status_code
+
+        if response.status_code != 200:
+            return False
+
+        session.headers["Authorization"] = f"Bearer {response.json()['access']}"
+        return True
+
+    def checkout(self, session, address_id, rng):
+
+        variant_id = rng.choice(self.variant_ids)
+        quantity = self.quantity
+
+        with self.recorder.step("cart_add") as call:
+            response = self.call(
+                session, "POST", "/cart/items/", json={"variant_id": variant_id, "quantity": quantity}
+            )
+            call["status"] = response.status_code
+
+        if response.status_code != 200:
+            return self.recorder.finish("cart_rejected", variant_id=variant_id)
+
+        cart_items = [item["id"] for item in response.json().get("items", []) if item["variant"] == variant_id]
+
+        try:
+            return self.order_and_pay(session, address_id, variant_id, quantity, rng)
+        finally:
+            for item_id in cart_items:
+                with self.recorder.step("cart_clear") as call:
+                    call["status"] = self.call(session, "DELETE", f"/cart/items/{item_id}/delete/").status_code
+
+    def order_and_pay(self, session, address_id, variant_id, quantity, rng):
+
+        with self.recorder.step("order_create") as call:
+            response = self.call(
+                session,
+                "POST",
+                "/order/create/",
+                json={
+                    "address": address_id,
+                    "shipping_method": ShippingMethodType.PISHTAZ,
+                    "items": [{"variant_id": variant_id, "quantity": quantity}],
+                },
+                headers={"Idempotency-Key": str(uuid.uuid4())},
+            )
+            call["status"] = response.status_code
+
+        if response.status_code == 400:
+            return self.recorder.finish("out_of_stock", variant_id=variant_id)
+
+        if response.status_code != 201:
+            return self.recorder.finish("order_error", variant_id=variant_id)
+
+        order_id = response.json()["id"]
+
+        with self.recorder.step("payment_request") as call:
+            response = self.call(
+                session,
+                "POST",
+                f"/payment/request/{order_id}/",
+                headers={"Idempotency-Key": str(uuid.uuid4())},
+            )
+            call["status"] = response.status_code
+
+        if response.status_code != 200:
+            return self.recorder.finish("payment_request_error", order_id=order_id)
+
+        authority = response.json()["authority"]
+
+        with self.recorder.step("startpay") as call:
+            response = self.call(session, "GET", response.json()["payment_url"])
+            call["status"] = response.status_code
+
+        if response.status_code != 302:
+            return self.recorder.finish("startpay_error", order_id=order_id, authority=authority)
+
+        # کاربر به callback برمی‌گردد؛ همان query روی سرور تست فراخوانی می‌شود
+        callback = f"/payment/verify/?{urlsplit(response.headers['Location']).query}"
+
+        with self.recorder.step("verify") as call:
+            response = self.call(session, "GET", callback)
+            call["status"] = response.status_code
+
+        if rng.random() < self.replay_rate:
+            with self.recorder.step("verify_replay") as call:
+                call["status"] = self.call(session, "GET", callback).status_code
+
+        if response.status_code != 302:
+            return self.recorder.finish("verify_error", order_id=order_id, authority=authority)
+
+        outcome = "paid" if response.headers["Location"] == settings.PAYMENT_SUCCESS_URL else "payment_failed"
+
+        return self.recorder.finish(outcome, order_id=order_id, authority=authority)
+
+    def run_user(self, phone, address_id, counter, seed):
+
+        rng = random.Random(seed)
+
+        with requests.Session() as session:
+
+            if not self.login(session, phone):
+                return
+
+            while True:
+                with self.counter_lock:
+                    if next(counter) >= self.orders:
+                        return
+
+                try:
+                    self.checkout(session, address_id, rng)
+                except requests.RequestException:
+                    self.recorder.finish("connection_error")
+
+    # ==========================================
+    # Invariants
+    # ==========================================
+
+    def gateway_payments(self, gateway_url):
+        try:
+            response = requests.get(gateway_url.rstrip("/") + "/__stats__", timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            self.stderr.write(f"Gateway stats unavailable ({error}); charge checks skipped")
+            return None
+
+        return response.json()["payments"]
+
+    def wait_for_outbox(self, timeout):
+        """
+        ``reserved`` of paid orders drops when the worker drains the outbox.
+        """
+        deadline = time.monotonic() + timeout
+
+        while OutboxEvent.objects.filter(processed_date=None).exists():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.5)
+
+        return True
+
+    def violations(self, initial, gateway_url):
+
+        problems = []
+
+        if not self.wait_for_outbox(self.outbox_wait):
+            problems.append("outbox not drained (is run_worker running?); stock checks may be off")
+
+        order_ids = [checkout["order_id"] for checkout in self.recorder.checkouts if checkout.get("order_id")]
+
+        statuses = dict(OrderModel.objects.filter(pk__in=order_ids).values_list("pk", "status"))
+
+        sold = dict(
+            OrderItemsModel.objects.filter(
+                order_id__in=order_ids,
+                order__status=OrderStatusType.SUCCESS,
+            ).values("variant_id").annotate(units=Sum("quantity")).values_list("variant_id", "units")
+        )
+
+        current = ProductVariant.objects.filter(pk__in=initial).values_list("pk", "stock", "reserved")
+
+        # stock + reserved + فروخته‌شده باید ثابت بماند
+        for pk, stock, reserved in current:
+            units = sold.get(pk, 0)
+
+            if units > initial[pk]:
+                problems.append(f"oversell: variant {pk} sold {units} of {initial[pk]}")
+
+            if stock + reserved + units != initial[pk]:
+                problems.append(
+                    f"stock leak: variant {pk} stock {stock} + reserved {reserved} + sold {units} != {initial[pk]}"
+                )
+
+        payments = self.gateway_payments(gateway_url)
+
+        if payments is None:
+            return problems
+
+        charged = defaultdict(list)
+
+        for checkout in self.recorder.checkouts:
+            payment = payments.get(checkout.get("authority"))
+
+            if payment and payment["paid"] and payment["verified"]:
+                charged[checkout["order_id"]].append(checkout["authority"])
+
+        for order_id, status in statuses.items():
+            authorities = charged.get(order_id, [])
+
+            if len(authorities) > 1:
+                problems.append(f"double charge: order {order_id} verified {len(authorities)} payments")
+
+            if authorities and status != OrderStatusType.SUCCESS:
+                problems.append(f"charged, not fulfilled: order {order_id} (status {status})")
+
+            if not authorities and status == OrderStatusType.SUCCESS:
+                problems.append(f"fulfilled, not charged: order {order_id}")
+
+        return problems
+
+    # ==========================================
+    # Report
+    # ==========================================
+
+    def report(self, elapsed, problems):
+
+        recorder = self.recorder
+        finished = sum(recorder.outcomes.values())
+
+        self.stdout.write(f"\n{finished} checkouts in {elapsed:.1f}s: {finished / elapsed:.1f} checkouts/s, "
+                          f"{recorder.outcomes['paid'] / elapsed:.1f} paid/s")
+
+        for outcome, count in recorder.outcomes.most_common():
+            self.stdout.write(f"  {outcome:22} {count}")
+
+        self.stdout.write(f"\n{'step':16} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+
+        for step in STEPS:
+            values = recorder.latencies.get(step)
+
+            if not values:
+                continue
+
+            statuses = ", ".join(f"{status}x{count}" for status, count in recorder.statuses[step].most_common())
+
+            self.stdout.write(
+                f"{step:16} {len(values):>6} "
+                f"{percentile(values, 0.5) * 1000:>8.0f} {percentile(values, 0.95) * 1000:>8.0f} "
+                f"{percentile(values, 0.99) * 1000:>8.0f} {max(values) * 1000:>8.0f}  {statuses}"
+            )
+
+        if problems:
+            self.stdout.write(self.style.ERROR(f"\n{len(problems)} invariant violations"))
+
+            for problem in problems:
+                self.stdout.write(f"  {problem}")
+        else:
+            self.stdout.write(self.style.SUCCESS("\nNo oversell, stock leak or double charge"))
+
+    def handle(self, *args, **options):
+
+        self.base_url = options["base_url"].rstrip("/")
+        self.timeout = options["timeout"]
+        self.orders = options["orders"]
+        self.quantity = options["quantity"]
+        self.replay_rate = options["replay_rate"]
+        self.outbox_wait = options["outbox_wait"]
+
+        self.recorder = Recorder()
+        self.counter_lock = threading.Lock()
+
+        self.variant_ids, initial, users = self.prepare(options)
+
+        seeds = random.Random(options["seed"])
+        counter = itertools.count()
+
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            futures = [
+                pool.submit(self.run_user, phone, address_id, counter, seeds.random())
+                for phone, address_id in users
+            ]
+
+            for future in futures:
+                future.result()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+
+        gateway_url = options["gateway_url"] or getattr(settings, "ZARINPAL_BASE_URL", "")
+
+        self.report(elapsed, self.violations(initial, gateway_url))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+
+from payment.fake_gateway import FakeZarinPal, make_server
+
+
+class Command(BaseCommand):
+
+    help = "Serve a local ZarinPal stand-in (set ZARINPAL_BASE_URL to its address)"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument("--host", default="127.0.0.1")
+
+        parser.add_argument("--port", type=int, default=8765)
+
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=50,
+            help="Milliseconds every request/verify call takes",
+        )
+
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0,
+            help="Extra random milliseconds, uniform in [0, jitter]",
+        )
+
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Fraction of request/verify calls answered with HTTP 500",
+        )
+
+        parser.add_argument(
+            "--cancel-rate",
+            type=float,
+            default=0,
+            help="Fraction of StartPay visits that return Status=NOK",
+        )
+
+        parser.add_argument(
+            "--already-verified-rate",
+            type=float,
+            default=0,
+            help="Fraction of first verifies answered with code 101 instead of 100",
+        )
+
+        parser.add_argument("--seed", type=int, default=None)
+
+        parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    def handle(self, *args, **options):
+
+        gateway = FakeZarinPal(
+            latency=options["latency"] / 1000,
+            jitter=options["jitter"] / 1000,
+            error_rate=options["error_rate"],
+            cancel_rate=options["cancel_rate"],
+            already_verified_rate=options["already_verified_rate"],
+            seed=options["seed"],
+        )
+
+        server = make_server(gateway, options["host"], options["port"], verbose=options["verbose"])
+
+        host, port = server.server_address[:2]
+
+        self.stdout.write(f"Fake ZarinPal listening on http://{host}:{port}")
+        self.stdout.write(f"Run the shop with ZARINPAL_BASE_URL = \"http://{host}:{port}\"")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from payment.gateway import read_metrics
+
+
+class Command(BaseCommand):
+
+    help = "Print ZarinPal call counts and latency percentiles (all processes)"
+
+    def percentile(self, buckets, count, fraction):
+
+        seen = 0
+
+        for bound, hits in buckets.items():
+
+            seen += hits
+
+            if seen >= count * fraction:
+                return bound
+
+        return "inf"
+
+    def handle(self, *args, **options):
+
+        metrics = read_metrics()
+
+        if not metrics:
+            self.stdout.write("No gateway calls recorded")
+            return
+
+        self.stdout.write(
+            f"{'operation':10} {'outcome':9} {'calls':>7} {'avg ms':>8} {'p50 <=':>7} {'p95 <=':>7} {'p99 <=':>7}"
+        )
+
+        for (operation, outcome), row in metrics.items():
+
+            self.stdout.write(
+                f"{operation:10} {outcome:9} {row['count']:>7} {row['ms'] / row['count']:>8.1f} "
+                f"{self.percentile(row['buckets'], row['count'], 0.5):>7} "
+                f"{self.percentile(row['buckets'], row['count'], 0.95):>7} "
+                f"{self.percentile(row['buckets'], row['count'], 0.99):>7}"
+            )
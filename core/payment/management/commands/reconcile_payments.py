@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+
+from payment.reconcile import reconcile
+
+
+class Command(BaseCommand):
+
+    help = "Verify stuck pending payments against the gateway and settle them (the task worker also does this on schedule)"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=None,
+            help="Minutes a payment must be pending (default: PAYMENT_RECONCILE_AFTER)",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Payments verified and settled per page",
+        )
+
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Concurrent gateway calls (default: ZARINPAL_POOL_SIZE)",
+        )
+
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Stop after this many payments; the next run continues from the checkpoint",
+        )
+
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and start a new pass",
+        )
+
+    def handle(self, *args, **options):
+
+        older_than = options["older_than"]
+
+        checkpoint = reconcile(
+            older_than=None if older_than is None else older_than * 60,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            limit=options["limit"],
+            restart=options["restart"],
+        )
+
+        state = "pass complete" if checkpoint.completed_date else f"continues after payment {checkpoint.last_payment_id}"
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {checkpoint.checked} payments this pass: {checkpoint.paid} paid, "
+                f"{checkpoint.failed} failed, {checkpoint.errors} gateway errors ({state})"
+            )
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='نام')),
+                ('last_payment_id', models.PositiveBigIntegerField(default=0, verbose_name='آخرین پرداخت بررسی شده')),
+                ('checked', models.PositiveIntegerField(default=0, verbose_name='بررسی شده')),
+                ('paid', models.PositiveIntegerField(default=0, verbose_name='پرداخت شده')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='ناموفق')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='خطای درگاه')),
+                ('started_date', models.DateTimeField(verbose_name='شروع دور')),
+                ('completed_date', models.DateTimeField(blank=True, null=True, verbose_name='پایان دور')),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='تاریخ آخرین بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'وضعیت تطبیق پرداخت\u200cها',
+                'verbose_name_plural': 'وضعیت تطبیق پرداخت\u200cها',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='paymentmodel',
+            index=models.Index(fields=['status', 'id'], name='payment_pay_status_04f1da_idx'),
+        ),
+    ]
@@ -20,7 +20,37 @@ class PaymentModel(models.Model):
     
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # reconcile_payments: pending payments in id order
+            models.Index(fields=["status", "id"]),
+        ]
     
     
     def __str__(self):
-        return self.authority_id
\ No newline at end of file
+        return self.authority_id
+
+
+class ReconciliationCheckpoint(models.Model):
+    """
+    Progress of reconcile_payments through the pending payments, so an
+    interrupted or ``--limit``ed run continues where it stopped.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="نام")
+    last_payment_id = models.PositiveBigIntegerField(default=0, verbose_name="آخرین پرداخت بررسی شده")
+    checked = models.PositiveIntegerField(default=0, verbose_name="بررسی شده")
+    paid = models.PositiveIntegerField(default=0, verbose_name="پرداخت شده")
+    failed = models.PositiveIntegerField(default=0, verbose_name="ناموفق")
+    errors = models.PositiveIntegerField(default=0, verbose_name="خطای درگاه")
+
+    started_date = models.DateTimeField(verbose_name="شروع دور")
+    completed_date = models.DateTimeField(null=True, blank=True, verbose_name="پایان دور")
+    updated_date = models.DateTimeField(auto_now=True, verbose_name="تاریخ آخرین بروزرسانی")
+
+    class Meta:
+        verbose_name = "وضعیت تطبیق پرداخت‌ها"
+        verbose_name_plural = "وضعیت تطبیق پرداخت‌ها"
+
+    def __str__(self):
+        return self.name
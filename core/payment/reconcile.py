@@ -0,0 +1,246 @@
+"""
+Settle payments whose customer never came back to the verify callback.
+
+Pending payments older than PAYMENT_RECONCILE_AFTER are verified against
+the gateway a page at a time (concurrently, on a thread pool sized like
+the gateway connection pool) and settled in bulk: paid ones confirm their
+stock holds, complete their orders and publish their outbox events,
+unpaid ones fail and end their holds. A checkpoint row records the last payment id of the pass, so an
+interrupted or limited run resumes there instead of starting over.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from order import effects, reservations
+from order.models import OrderModel, OrderStatusType
+from outbox.base import publish_many
+from tasks.base import enqueue
+
+from .gateway import GatewayUnavailable, ZarinPalError
+from .models import PaymentModel, PaymentStatusType, ReconciliationCheckpoint
+from .zarinpal_clients import gateway_for
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "reconcile_payments"
+
+TASK = "payment.reconcile_payments"
+
+# the breaker refused the call: stop the run here
+UNAVAILABLE = object()
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def reconcile_after():
+    return setting("PAYMENT_RECONCILE_AFTER", 30 * 60)
+
+
+def schedule(delay=None):
+    """
+    Queue the reconcile task for when the oldest pending payment becomes
+    due, but not sooner than PAYMENT_RECONCILE_INTERVAL.
+    """
+    if delay is None:
+        oldest = PaymentModel.objects.filter(
+            status=PaymentStatusType.PENDING
+        ).aggregate(oldest=Min("created_date"))["oldest"]
+
+        if oldest is None:
+            return
+
+        due = oldest + timedelta(seconds=reconcile_after()) - timezone.now()
+
+        delay = max(due.total_seconds(), setting("PAYMENT_RECONCILE_INTERVAL", 10 * 60))
+
+    enqueue(TASK, delay=delay, unique_key=TASK)
+
+
+def get_checkpoint(restart=False):
+    checkpoint, _ = ReconciliationCheckpoint.objects.get_or_create(
+        name=CHECKPOINT,
+        defaults={"started_date": timezone.now()}
+    )
+
+    # دور قبلی تمام شده؛ دور تازه از ابتدای پرداخت‌های در انتظار
+    if restart or checkpoint.completed_date:
+        checkpoint.last_payment_id = 0
+        checkpoint.checked = checkpoint.paid = checkpoint.failed = checkpoint.errors = 0
+        checkpoint.started_date = timezone.now()
+        checkpoint.completed_date = None
+        checkpoint.save()
+
+    return checkpoint
+
+
+def due_payments(after_id, older_than, limit):
+    return list(
+        PaymentModel.objects.filter(
+            status=PaymentStatusType.PENDING,
+            created_date__lte=timezone.now() - timedelta(seconds=older_than),
+            id__gt=after_id,
+        ).select_related("order").order_by("id")[:limit]
+    )
+
+
+def verify(payment):
+    """
+    Runs on the pool: the gateway call, whose metrics are written to the
+    shared cache on this thread's own connection. Nothing closes the
+    connections of pool threads, so they are closed after each call.
+    """
+    try:
+        return gateway_for(payment.amount).payment_verify(payment.authority_id)
+    except GatewayUnavailable:
+        return UNAVAILABLE
+    except ZarinPalError:
+        logger.warning("Reconcile verify of payment %s failed", payment.pk, exc_info=True)
+        return None
+    finally:
+        connections.close_all()
+
+
+def order_of(payment):
+    # پرداختی که سفارش بعدا پرداخت تازه‌ای گرفته به هیچ سفارشی وصل نیست
+    return getattr(payment, "order", None)
+
+
+def settle(results):
+    """
+    Apply gateway answers (``[(payment, result)]``) in one transaction;
+    payments settled meanwhile by the verify view are skipped. Returns
+    ``(paid, failed)`` counts.
+    """
+    now = timezone.now()
+    paid, failed = [], []
+
+    with transaction.atomic():
+        still_pending = set(
+            PaymentModel.objects.select_for_update().filter(
+                pk__in=[payment.pk for payment, _ in results],
+                status=PaymentStatusType.PENDING
+            ).values_list("pk", flat=True)
+        )
+
+        for payment, result in results:
+            if payment.pk not in still_pending:
+                continue
+
+            payment.updated_date = now
+
+            if result["success"]:
+                payment.status = PaymentStatusType.SUCCESS
+                payment.ref_id = result["ref_id"]
+                payment.response_code = result["code"]
+                payment.response_json = result["raw"]
+                paid.append(payment)
+            else:
+                payment.status = PaymentStatusType.FAILED
+                payment.response_json = result
+                failed.append(payment)
+
+        PaymentModel.objects.bulk_update(
+            paid + failed,
+            ["status", "ref_id", "response_code", "response_json", "updated_date"]
+        )
+
+        orders = []
+
+        for payment in paid:
+            order = order_of(payment)
+
+            if order is None:
+                logger.error("Payment %s (ref %s) is paid but has no order", payment.pk, payment.ref_id)
+            else:
+                orders.append(order)
+
+        confirmed, unfulfilled = reservations.confirm_orders(orders)
+
+        for order in unfulfilled:
+            # رزرو منقضی شده و موجودی هم دیگر نیست؛ مبلغ باید برگشت داده شود
+            logger.error("Order %s paid (ref %s) after its stock was sold", order.pk, order.payment.ref_id)
+
+        fulfilled = [order for order in orders if order not in unfulfilled]
+
+        OrderModel.objects.filter(pk__in=[order.pk for order in fulfilled]).update(
+            status=OrderStatusType.SUCCESS, updated_date=now
+        )
+
+        OrderModel.objects.filter(pk__in=[order.pk for order in unfulfilled]).update(
+            status=OrderStatusType.FAILED, updated_date=now
+        )
+
+        # موجودی و کد تخفیف در outbox اعمال می‌شوند
+        publish_many(effects.PAID, [effects.paid_event(order, confirmed[order.pk]) for order in fulfilled])
+
+        failed_orders = [order.pk for order in map(order_of, failed) if order is not None]
+
+        if failed_orders:
+            reservations.expire_orders(failed_orders)
+
+    return len(paid), len(failed)
+
+
+def reconcile(older_than=None, batch_size=100, workers=None, limit=None, restart=False):
+    """
+    Verify and settle due pending payments from the checkpoint on; stops
+    after ``limit`` payments or when the gateway circuit opens. Returns
+    the checkpoint.
+    """
+    older_than = reconcile_after() if older_than is None else older_than
+    workers = workers or setting("ZARINPAL_POOL_SIZE", 10)
+
+    checkpoint = get_checkpoint(restart)
+    checked = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+
+        while limit is None or checked < limit:
+            page_size = batch_size if limit is None else min(batch_size, limit - checked)
+
+            payments = due_payments(checkpoint.last_payment_id, older_than, page_size)
+
+            if not payments:
+                checkpoint.completed_date = timezone.now()
+                checkpoint.save()
+                break
+
+            results = list(pool.map(verify, payments))
+
+            interrupted = UNAVAILABLE in results
+
+            if interrupted:
+                # تا پرداخت رد شده پیش می‌رویم تا دور بعد از همان‌جا ادامه دهد
+                stop = results.index(UNAVAILABLE)
+                payments, results = payments[:stop], results[:stop]
+
+            answered = [(payment, result) for payment, result in zip(payments, results) if result is not None]
+
+            with transaction.atomic():
+                paid, failed = settle(answered)
+
+                if payments:
+                    checkpoint.last_payment_id = payments[-1].pk
+
+                checkpoint.checked += len(payments)
+                checkpoint.paid += paid
+                checkpoint.failed += failed
+                checkpoint.errors += len(payments) - len(answered)
+                checkpoint.save()
+
+            checked += len(payments)
+
+            if interrupted:
+                logger.warning("Reconcile stopped at payment %s: gateway circuit is open", checkpoint.last_payment_id)
+                break
+
+    return checkpoint
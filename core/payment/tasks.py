@@ -0,0 +1,14 @@
+from django.conf import settings
+
+from tasks.base import task
+
+from . import reconcile
+
+
+@task(max_attempts=1, timeout=30 * 60)
+def reconcile_payments():
+    try:
+        reconcile.reconcile(limit=getattr(settings, "PAYMENT_RECONCILE_LIMIT", 1000))
+    finally:
+        # تا وقتی پرداخت در انتظار هست دوباره زمان‌بندی می‌شود
+        reconcile.schedule()
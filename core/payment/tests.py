@@ -1,3 +1,490 @@
-from django.test import TestCase
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from order.effects import orders_paid
+from order.models import OrderModel, OrderStatusType, ReservationStatusType
+from order.tests import OrderFixtureMixin
+from outbox.base import drain
+from outbox.models import OutboxEvent
+
+from .fake_gateway import FakeZarinPal, make_server
+from .gateway import CircuitBreaker, GatewayUnavailable, ZarinPalError, apost, post, read_metrics
+from . import reconcile, views
+from .models import PaymentModel, PaymentStatusType
+from .views import AsyncPaymentRequestApiView, AsyncPaymentVerifyApiView
+from .zarinpal_clients import ZarinPalSandbox
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    @mock.patch("payment.gateway.time.monotonic", return_value=100)
+    def test_opens_on_failure_rate_and_closes_after_trial(self, monotonic):
+        breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, window=30, reset_timeout=30)
+
+        for success in (True, False, True):
+            self.assertFalse(breaker.record(success))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        # فقط فراخوانی‌ای که مدار را باز کرد True برمی‌گرداند
+        self.assertTrue(breaker.record(False))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        # بعد از reset_timeout یک درخواست آزمایشی عبور می‌کند و بقیه منتظر نتیجه می‌مانند
+        monotonic.return_value = 130
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record(True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @mock.patch("payment.gateway.time.monotonic", return_value=100)
+    def test_trial_without_outcome_is_replaced(self, monotonic):
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=30)
+        breaker.record(False)
+
+        monotonic.return_value = 130
+        self.assertTrue(breaker.allow())
+
+        # آزمایش هیچ‌وقت نتیجه‌ای ثبت نکرد
+        monotonic.return_value = 159
+        self.assertFalse(breaker.allow())
+
+        monotonic.return_value = 160
+        self.assertTrue(breaker.allow())
+
+    @mock.patch("payment.gateway.record_metric")
+    def test_unexpected_error_is_recorded(self, record_metric):
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=0)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+
+        session = mock.Mock()
+        session.post.side_effect = KeyError("bug")
+
+        with mock.patch("payment.gateway.get_breaker", return_value=breaker), \
+                mock.patch("payment.gateway.get_session", return_value=session):
+            with self.assertRaises(KeyError):
+                post("verify", "http://gateway/verify", {})
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    @mock.patch("payment.gateway.arecord_metric", new_callable=mock.AsyncMock)
+    def test_cancelled_async_trial_is_recorded(self, arecord_metric):
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=0)
+        breaker.record(False)
+        breaker.allow()
+
+        client = mock.Mock()
+        client.post = mock.AsyncMock(side_effect=asyncio.CancelledError)
+
+        with mock.patch("payment.gateway.get_breaker", return_value=breaker), \
+                mock.patch("payment.gateway.get_async_client", return_value=client):
+            with self.assertRaises(asyncio.CancelledError):
+                async_to_sync(apost)("verify", "http://gateway/verify", {})
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_open_circuit_rejects_without_calling_gateway(self):
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=60)
+        session = mock.Mock()
+        session.post.side_effect = requests.ConnectionError
+
+        with mock.patch("payment.gateway.get_breaker", return_value=breaker), \
+                mock.patch("payment.gateway.get_session", return_value=session), \
+                mock.patch("payment.gateway.record_metric"):
+            with self.assertRaises(ZarinPalError):
+                post("verify", "http://gateway/verify", {}, retries=1)
+
+            self.assertEqual(session.post.call_count, 2)
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+            with self.assertRaises(GatewayUnavailable):
+                post("verify", "http://gateway/verify", {})
+
+            self.assertEqual(session.post.call_count, 2)
+
+
+DATABASE_CACHE = {
+    "default": {
+        "BACKEND": "core.cache.DatabaseCache",
+        "LOCATION": "cache_table",
+    }
+}
+
+
+@override_settings(CACHES=DATABASE_CACHE)
+class GatewayDatabaseCacheTests(TransactionTestCase):
+
+    """
+    The gateway calls with the production cache backend, metrics unpatched.
+    """
+
+    def setUp(self):
+        # cache_table مدل ندارد و flush آن را خالی نمی‌کند
+        cache.clear()
+
+    def breaker(self):
+        return CircuitBreaker("test", min_calls=2, reset_timeout=60)
+
+    def test_post_counts_the_opened_circuit(self):
+        breaker = self.breaker()
+        session = mock.Mock()
+        session.post.side_effect = requests.ConnectionError
+
+        with mock.patch("payment.gateway.get_breaker", return_value=breaker), \
+                mock.patch("payment.gateway.get_session", return_value=session):
+            for _ in range(2):
+                with self.assertRaises(ZarinPalError):
+                    post("verify", "http://gateway/verify", {})
+
+            with self.assertRaises(GatewayUnavailable):
+                post("verify", "http://gateway/verify", {})
+
+        metrics = read_metrics()
+        self.assertEqual(metrics["breaker", "opened"]["count"], 1)
+        self.assertEqual(metrics["verify", "error"]["count"], 2)
+        self.assertEqual(metrics["verify", "rejected"]["count"], 1)
+
+    def test_apost_counts_the_opened_circuit(self):
+        breaker = self.breaker()
+        client = mock.Mock()
+        client.post = mock.AsyncMock(side_effect=httpx.ConnectError("down"))
+
+        # روی event loop هیچ نوشتن همگامی در cache نیست (SynchronousOnlyOperation)
+        async def call():
+            with self.assertRaises(ZarinPalError) as raised:
+                await apost("verify", "http://gateway/verify", {})
+
+            return raised.exception
+
+        with mock.patch("payment.gateway.get_breaker", return_value=breaker), \
+                mock.patch("payment.gateway.get_async_client", return_value=client):
+            for _ in range(2):
+                self.assertNotIsInstance(async_to_sync(call)(), GatewayUnavailable)
+
+            self.assertIsInstance(async_to_sync(call)(), GatewayUnavailable)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        metrics = read_metrics()
+        self.assertEqual(metrics["breaker", "opened"]["count"], 1)
+        self.assertEqual(metrics["verify", "error"]["count"], 2)
+        self.assertEqual(metrics["verify", "rejected"]["count"], 1)
+
+    def test_reconcile_verify_closes_its_connection(self):
+        session = mock.Mock()
+        session.post.side_effect = requests.ConnectionError
+        payment = PaymentModel(pk=1, authority_id="A0001", amount=1000)
+
+        closed_on = []
+
+        def close_all():
+            closed_on.append(threading.get_ident())
+
+        with mock.patch("payment.gateway.get_breaker", return_value=self.breaker()), \
+                mock.patch("payment.gateway.get_session", return_value=session), \
+                mock.patch.object(reconcile.connections, "close_all", side_effect=close_all), \
+                self.assertLogs("payment.reconcile", "WARNING"):
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                self.assertIsNone(pool.submit(reconcile.verify, payment).result())
+                thread = pool.submit(threading.get_ident).result()
+
+        # اتصال نخ pool بعد از نوشتن متریک‌ها بسته می‌شود
+        self.assertEqual(closed_on, [thread])
+        self.assertEqual(read_metrics()["verify", "error"]["count"], session.post.call_count)
+
+
+class AsyncPaymentViewTests(OrderFixtureMixin, TestCase):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+
+        product = self.create_products(1)[-1]
+        response = self.order(self.items([product], quantity=2))
+
+        self.order_obj = OrderModel.objects.get(pk=response.data["id"])
+        self.variant = product.variants.get()
+
+    def call(self, view, request, **kwargs):
+        response = async_to_sync(view.as_view())(request, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def request_payment(self):
+        request = APIRequestFactory().post(f"/payment/request/{self.order_obj.pk}/")
+        force_authenticate(request, self.user)
+
+        return self.call(AsyncPaymentRequestApiView, request, order_id=self.order_obj.pk)
+
+    @mock.patch("payment.zarinpal_clients.ZarinPalSandbox.apayment_request")
+    def test_request_and_verify(self, apayment_request):
+        apayment_request.return_value = "A0001"
+
+        response = self.request_payment()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["authority"], "A0001")
+
+        with mock.patch("payment.zarinpal_clients.ZarinPalSandbox.apayment_verify") as apayment_verify:
+            apayment_verify.return_value = {"success": True, "ref_id": 7, "code": 100, "raw": {"code": 100}}
+
+            request = APIRequestFactory().get("/payment/verify/", {"Authority": "A0001", "Status": "OK"})
+            response = self.call(AsyncPaymentVerifyApiView, request)
+
+        self.assertRedirects(response, settings.PAYMENT_SUCCESS_URL, fetch_redirect_response=False)
+
+        self.order_obj.refresh_from_db()
+        self.variant.refresh_from_db()
+
+        self.assertEqual(self.order_obj.status, OrderStatusType.SUCCESS)
+        self.assertEqual(self.order_obj.payment.status, PaymentStatusType.SUCCESS)
+
+        # واحدهای رزرو شده بعد از drain از reserved کم می‌شوند
+        self.assertEqual((self.variant.stock, self.variant.reserved), (3, 2))
+
+        drain()
+
+        self.variant.refresh_from_db()
+        self.assertEqual((self.variant.stock, self.variant.reserved), (3, 0))
+
+    @mock.patch("payment.zarinpal_clients.ZarinPalSandbox.apayment_request")
+    def test_gateway_down(self, apayment_request):
+        apayment_request.side_effect = GatewayUnavailable
+
+        response = self.request_payment()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNone(OrderModel.objects.get(pk=self.order_obj.pk).payment_id)
+
+
+@mock.patch("payment.gateway.record_metric")
+class FakeGatewayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.gateway = FakeZarinPal(latency=0)
+        self.server = make_server(self.gateway, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        host, port = self.server.server_address[:2]
+        self.settings = override_settings(ZARINPAL_BASE_URL=f"http://{host}:{port}")
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_request_startpay_verify(self, record_metric):
+        zarinpal = ZarinPalSandbox("merchant", 10000, callback_url="http://shop/payment/verify/")
+
+        authority = zarinpal.payment_request()
+
+        # پیش از پرداخت تایید نمی‌شود
+        self.assertFalse(zarinpal.payment_verify(authority)["success"])
+
+        response = requests.get(zarinpal.generate_payment_url(authority), allow_redirects=False)
+        self.assertEqual(
+            response.headers["Location"],
+            f"http://shop/payment/verify/?Authority={authority}&Status=OK"
+        )
+
+        self.assertEqual(zarinpal.payment_verify(authority)["code"], 100)
+        self.assertEqual(zarinpal.payment_verify(authority)["code"], 101)
+
+        wrong_amount = ZarinPalSandbox("merchant", 500).payment_verify(authority)
+        self.assertEqual(wrong_amount["errors"]["code"], -50)
+
+
+class PaymentVerifyTests(OrderFixtureMixin, TestCase):
+
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+
+        product = self.create_products(1)[-1]
+        response = self.order(self.items([product], quantity=2))
+
+        self.order_obj = OrderModel.objects.get(pk=response.data["id"])
+        self.order_obj.payment = PaymentModel.objects.create(authority_id="A0001", amount=self.order_obj.total_price)
+        self.order_obj.save()
+
+        self.client.logout()
+
+    def verify(self, status="OK"):
+        answer = {"success": True, "ref_id": 7, "code": 100, "raw": {"code": 100}}
+
+        with mock.patch("payment.zarinpal_clients.ZarinPalSandbox.payment_verify", return_value=answer) as verify:
+            response = self.client.get("/payment/verify/", {"Authority": "A0001", "Status": status})
+
+        return response, verify
+
+    def test_settled_payment_is_not_changed_again(self):
+        response, _ = self.verify()
+        self.assertRedirects(response, settings.PAYMENT_SUCCESS_URL, fetch_redirect_response=False)
+
+        # callback تکراری: نه تایید دوباره، نه رویداد دوباره
+        response, verify = self.verify()
+        self.assertRedirects(response, settings.PAYMENT_SUCCESS_URL, fetch_redirect_response=False)
+        verify.assert_not_called()
+
+        # Status جعلی پرداخت موفق را ناموفق نمی‌کند
+        response, _ = self.verify(status="NOK")
+        self.assertRedirects(response, settings.PAYMENT_SUCCESS_URL, fetch_redirect_response=False)
+
+        self.order_obj.refresh_from_db()
+        self.assertEqual(self.order_obj.payment.status, PaymentStatusType.SUCCESS)
+        self.assertEqual(self.order_obj.reservations.get().status, ReservationStatusType.COMMITTED)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_payment_settled_meanwhile_is_skipped(self):
+        # reconcile بین خواندن پرداخت و قفل آن را ناموفق کرده است
+        payment = views.find_payment("A0001")
+        PaymentModel.objects.filter(pk=payment.pk).update(status=PaymentStatusType.FAILED)
+
+        response = views.settle_payment(payment, {"success": True, "ref_id": 7, "code": 100, "raw": {}})
+
+        self.assertRedirects(response, settings.PAYMENT_FAILED_URL, fetch_redirect_response=False)
+        self.assertEqual(OutboxEvent.objects.count(), 0)
+
+        self.order_obj.refresh_from_db()
+        self.assertEqual(self.order_obj.status, OrderStatusType.PENDING)
+
+        # async: همان مراحل
+        PaymentModel.objects.filter(pk=payment.pk).update(status=PaymentStatusType.SUCCESS)
+
+        request = APIRequestFactory().get("/payment/verify/", {"Authority": "A0001", "Status": "NOK"})
+        response = async_to_sync(AsyncPaymentVerifyApiView.as_view())(request)
+
+        self.assertRedirects(response, settings.PAYMENT_SUCCESS_URL, fetch_redirect_response=False)
+        self.assertEqual(PaymentModel.objects.get(pk=payment.pk).status, PaymentStatusType.SUCCESS)
+
+
+    def test_callbacks_of_a_superseded_payment(self):
+        # سفارش دوباره درخواست پرداخت شده و حالا به پرداخت دوم تعلق دارد
+        first = self.order_obj.payment
+        self.order_obj.payment = PaymentModel.objects.create(authority_id="A0002", amount=self.order_obj.total_price)
+        self.order_obj.save()
+
+        response, _ = self.verify(status="NOK")
+        self.assertRedirects(response, settings.PAYMENT_FAILED_URL, fetch_redirect_response=False)
+        self.assertEqual(PaymentModel.objects.get(pk=first.pk).status, PaymentStatusType.FAILED)
+
+        PaymentModel.objects.filter(pk=first.pk).update(status=PaymentStatusType.PENDING)
+
+        with self.assertLogs("payment.views", "ERROR"):
+            response, _ = self.verify()
+
+        self.assertRedirects(response, settings.PAYMENT_FAILED_URL, fetch_redirect_response=False)
+        self.assertEqual(PaymentModel.objects.get(pk=first.pk).status, PaymentStatusType.SUCCESS)
+
+        # سفارش و رزرو آن با پرداخت دوم ادامه می‌دهند
+        self.order_obj.refresh_from_db()
+        self.assertEqual(self.order_obj.status, OrderStatusType.PENDING)
+        self.assertEqual(self.order_obj.reservations.get().status, ReservationStatusType.HELD)
+        self.assertEqual(OutboxEvent.objects.count(), 0)
+
+
+class ReconcileTests(OrderFixtureMixin, TestCase):
+
+    client_class = APIClient
+
+    def pending_order(self, authority):
+        product = self.create_products(1)[-1]
+        response = self.order(self.items([product], quantity=2))
+
+        order = OrderModel.objects.get(pk=response.data["id"])
+        order.payment = PaymentModel.objects.create(authority_id=authority, amount=order.total_price)
+        order.save()
+
+        PaymentModel.objects.filter(pk=order.payment_id).update(
+            created_date=timezone.now() - timedelta(hours=1)
+        )
+
+        return order, product.variants.get()
+
+    def gateway(self, answers):
+        def payment_verify(zarinpal, authority):
+            answer = answers[authority]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        return mock.patch("payment.zarinpal_clients.ZarinPalSandbox.payment_verify", autospec=True,
+                          side_effect=payment_verify)
+
+    def test_settles_paid_unpaid_and_leaves_errors_pending(self):
+        paid, paid_variant = self.pending_order("A-paid")
+        unpaid, _ = self.pending_order("A-unpaid")
+        broken, _ = self.pending_order("A-broken")
+
+        answers = {
+            "A-paid": {"success": True, "ref_id": 9, "code": 100, "raw": {"code": 100}},
+            "A-unpaid": {"success": False, "errors": {"code": -51}},
+            "A-broken": ZarinPalError("timeout"),
+        }
+
+        with self.gateway(answers), self.assertLogs("payment.reconcile", "WARNING"):
+            checkpoint = reconcile.reconcile()
+
+        self.assertEqual((checkpoint.checked, checkpoint.paid, checkpoint.failed, checkpoint.errors), (3, 1, 1, 1))
+        self.assertIsNotNone(checkpoint.completed_date)
+
+        receiver = mock.Mock()
+        orders_paid.connect(receiver)
+        self.addCleanup(orders_paid.disconnect, receiver)
+
+        drain()
+
+        # بعد از اعمال موجودی و کد تخفیف، فقط سفارش پرداخت‌شده
+        receiver.assert_called_once()
+        self.assertEqual(receiver.call_args.kwargs["order_ids"], [paid.pk])
+
+        paid.refresh_from_db()
+        paid_variant.refresh_from_db()
+        self.assertEqual((paid.status, paid.payment.status), (OrderStatusType.SUCCESS, PaymentStatusType.SUCCESS))
+        self.assertEqual(paid_variant.reserved, 0)
+
+        unpaid.refresh_from_db()
+        self.assertEqual(unpaid.payment.status, PaymentStatusType.FAILED)
+        self.assertLessEqual(unpaid.reservations.get().expires_at, timezone.now())
+
+        broken.refresh_from_db()
+        self.assertEqual(broken.payment.status, PaymentStatusType.PENDING)
+        self.assertEqual(broken.reservations.get().status, ReservationStatusType.HELD)
+
+    def test_limited_runs_resume_from_checkpoint(self):
+        first, _ = self.pending_order("A-1")
+        second, _ = self.pending_order("A-2")
+
+        answers = {
+            "A-1": {"success": False, "errors": {"code": -51}},
+            "A-2": {"success": False, "errors": {"code": -51}},
+        }
+
+        with self.gateway(answers) as payment_verify:
+            checkpoint = reconcile.reconcile(limit=1)
+            self.assertEqual(checkpoint.last_payment_id, first.payment_id)
+            self.assertIsNone(checkpoint.completed_date)
+
+            checkpoint = reconcile.reconcile(limit=1)
+            self.assertEqual(checkpoint.last_payment_id, second.payment_id)
+
+        self.assertEqual([call.args[1] for call in payment_verify.call_args_list], ["A-1", "A-2"])
@@ -1,9 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from .views import PaymentRequestApiView, PaymentVerifyApiView
+from .views import (
+    AsyncPaymentRequestApiView,
+    AsyncPaymentVerifyApiView,
+    PaymentRequestApiView,
+    PaymentVerifyApiView,
+)
 
 app_name = "payment"
 
+# زیر ASGI نسخه async، زیر WSGI نسخه همگام
+if getattr(settings, "PAYMENT_ASYNC_VIEWS", False):
+    request_view, verify_view = AsyncPaymentRequestApiView, AsyncPaymentVerifyApiView
+else:
+    request_view, verify_view = PaymentRequestApiView, PaymentVerifyApiView
+
 urlpatterns = [
-    path("request/<int:order_id>/", PaymentRequestApiView.as_view(), name="request"),
-    path("verify/", PaymentVerifyApiView.as_view(), name="verify"),
+    path("request/<int:order_id>/", request_view.as_view(), name="request"),
+    path("verify/", verify_view.as_view(), name="verify"),
 ]
\ No newline at end of file
@@ -1,110 +1,288 @@
+import logging
+
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, permissions
 from django.conf import settings
-from .models import PaymentModel, PaymentStatusType
-from .zarinpal_clients import ZarinPalSandbox
-from order.models import OrderModel, OrderStatusType
 from django.db import transaction
 from django.shortcuts import redirect, get_object_or_404
 
-class PaymentRequestApiView(APIView):
+from core.async_views import AsyncAPIView
+from idempotency.decorators import idempotent
+from outbox.base import publish
+from .models import PaymentModel, PaymentStatusType
+from . import reconcile
+from .gateway import ZarinPalError
+from .zarinpal_clients import gateway_for
+from order import effects, reservations
+from order.models import OrderModel, OrderStatusType
 
-    def post(self, request, order_id):
-        user = request.user
 
-        order = get_object_or_404(
-            OrderModel,
-            id=order_id,
-            user=user,
-            status=OrderStatusType.PENDING.value
-        )
+logger = logging.getLogger(__name__)
 
-        # جلوگیری از پرداخت تکراری
-        if hasattr(order, "payment"):
-            if order.payment.status == PaymentStatusType.SUCCESS.value:
-                return Response(
-                    {"error": "این سفارش قبلا پرداخت شده"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
 
-        amount = int(order.total_price) * 10  # تومان → ریال
+# ==========================================
+# Steps shared by the sync and async views
+# ==========================================
+#
+# Everything except the gateway call is database work; the async views run
+# these steps through sync_to_async and only await ZarinPal themselves.
 
-        zarinpal = ZarinPalSandbox(
-            merchant=settings.ZARINPAL_MERCHANT_ID,
-            amount=amount
-        )
+def prepare_request(user, order_id):
+    """
+    Returns ``(order, None)`` for a payable order with its stock holds
+    renewed, or ``(None, error_response)``.
+    """
+    order = get_object_or_404(
+        OrderModel,
+        id=order_id,
+        user=user,
+        status=OrderStatusType.PENDING.value
+    )
 
-        authority = zarinpal.payment_request(
-            description=f"پرداخت سفارش {order.id}"
+    # جلوگیری از پرداخت تکراری
+    if order.payment_id and order.payment.status == PaymentStatusType.SUCCESS.value:
+        return None, Response(
+            {"error": "این سفارش قبلا پرداخت شده"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-        payment = PaymentModel.objects.create(
-            authority_id=authority,
-            amount=order.total_price
+    # رزرو موجودی برای مدت پرداخت تمدید می‌شود
+    try:
+        reservations.renew(order)
+    except reservations.InsufficientStock:
+        return None, Response(
+            {"error": "موجودی برخی از محصولات سفارش تمام شده است"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-        order.payment = payment
-        order.save()
+    return order, None
 
-        return Response({
-            "payment_url": zarinpal.generate_payment_url(authority),
-            "authority": authority
-        })
-        
 
-from django.db import transaction
-from django.shortcuts import redirect
-from payment.models import PaymentModel, PaymentStatusType
-from order.models import OrderModel
+def gateway_unavailable(order):
+    logger.warning("Payment request of order %s failed", order.id, exc_info=True)
+
+    return Response(
+        {"error": "درگاه پرداخت در دسترس نیست، کمی بعد دوباره تلاش کنید"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def start_payment(order, zarinpal, authority):
+    payment = PaymentModel.objects.create(
+        authority_id=authority,
+        amount=order.total_price
+    )
+
+    # اگر کاربر به callback برنگردد، reconcile پرداخت را تعیین تکلیف می‌کند
+    reconcile.schedule(delay=reconcile.reconcile_after())
+
+    order.payment = payment
+    order.save(update_fields=["payment", "updated_date"])
+
+    return Response({
+        "payment_url": zarinpal.generate_payment_url(authority),
+        "authority": authority
+    })
+
+
+def find_payment(authority):
+    return PaymentModel.objects.select_related("order").filter(authority_id=authority).first()
+
+
+def payment_not_found():
+    return Response({"error": "payment not found"}, status=404)
+
+
+def lock_pending(payment_obj):
+    """
+    Inside a transaction: lock the payment row, refresh its status and
+    tell whether it is still pending.
+    """
+    payment_obj.status = PaymentModel.objects.select_for_update().values_list(
+        "status", flat=True
+    ).get(pk=payment_obj.pk)
+
+    return payment_obj.status == PaymentStatusType.PENDING
+
+
+def settled_redirect(payment_obj):
+    # پرداخت قبلا تعیین تکلیف شده (callback تکراری یا reconcile)؛ چیزی تغییر نمی‌کند
+    if payment_obj.status == PaymentStatusType.SUCCESS:
+        return redirect(settings.PAYMENT_SUCCESS_URL)
+
+    return redirect(settings.PAYMENT_FAILED_URL)
+
+
+def fail_payment(payment_obj, result=None):
+    with transaction.atomic():
+        if not lock_pending(payment_obj):
+            return settled_redirect(payment_obj)
+
+        payment_obj.status = PaymentStatusType.FAILED
+        if result is not None:
+            payment_obj.response_json = result
+        payment_obj.save()
+
+        order = reconcile.order_of(payment_obj)
+
+        # موجودی رزرو شده را sweeper آزاد می‌کند؛ پرداخت قدیمی سفارشی ندارد
+        if order is not None:
+            reservations.expire(order)
+
+    return redirect(settings.PAYMENT_FAILED_URL)
+
+
+def verify_unavailable(payment_obj):
+    # پرداخت در انتظار می‌ماند و رزرو موجودی دست نمی‌خورد تا دوباره تایید شود
+    logger.warning("Verify of payment %s failed", payment_obj.id, exc_info=True)
+
+    return redirect(settings.PAYMENT_FAILED_URL)
+
+
+def settle_payment(payment_obj, result):
+    if not result["success"]:
+        return fail_payment(payment_obj, result)
+
+    with transaction.atomic():
+        if not lock_pending(payment_obj):
+            return settled_redirect(payment_obj)
+
+        payment_obj.ref_id = result["ref_id"]
+        payment_obj.response_code = result["code"]
+        payment_obj.status = PaymentStatusType.SUCCESS
+        payment_obj.response_json = result["raw"]
+        payment_obj.save()
+
+        order = reconcile.order_of(payment_obj)
+
+        if order is None:
+            # سفارش بعدا پرداخت تازه‌ای گرفته (مثل reconcile)؛ مبلغ باید برگشت داده شود
+            logger.error("Payment %s (ref %s) is paid but has no order", payment_obj.pk, payment_obj.ref_id)
+
+            return redirect(settings.PAYMENT_FAILED_URL)
+
+        # موجودی هنگام ثبت سفارش رزرو شده؛ اینجا فقط قطعی می‌شود
+        try:
+            reserved = reservations.confirm(order)
+        except reservations.InsufficientStock:
+            # رزرو منقضی شده و موجودی هم دیگر نیست؛ مبلغ باید برگشت داده شود
+            logger.error("Order %s paid (ref %s) after its stock was sold", order.id, payment_obj.ref_id)
+
+            order.status = OrderStatusType.FAILED
+            order.save(update_fields=["status", "updated_date"])
+
+            return redirect(settings.PAYMENT_FAILED_URL)
+
+        order.status = OrderStatusType.SUCCESS
+        order.save(update_fields=["status", "updated_date"])
+
+        # موجودی، کد تخفیف و بقیه اثرات پرداخت بعد از commit در outbox اعمال می‌شوند
+        publish(effects.PAID, effects.paid_event(order, reserved))
+
+    return redirect(settings.PAYMENT_SUCCESS_URL)
+
+
+# ==========================================
+# Sync views (WSGI)
+# ==========================================
+
+@idempotent(name="post")
+class PaymentRequestApiView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, order_id):
+        order, error = prepare_request(request.user, order_id)
+
+        if error:
+            return error
+
+        zarinpal = gateway_for(order.total_price)
+
+        try:
+            authority = zarinpal.payment_request(
+                description=f"پرداخت سفارش {order.id}"
+            )
+        except ZarinPalError:
+            return gateway_unavailable(order)
+
+        return start_payment(order, zarinpal, authority)
 
 
 class PaymentVerifyApiView(APIView):
 
     def get(self, request):
         authority = request.GET.get("Authority")
-        status = request.GET.get("Status")
+
+        payment_obj = find_payment(authority)
+
+        if payment_obj is None:
+            return payment_not_found()
+
+        if payment_obj.status != PaymentStatusType.PENDING:
+            return settled_redirect(payment_obj)
+
+        if request.GET.get("Status") != "OK":
+            return fail_payment(payment_obj)
 
         try:
-            payment_obj = PaymentModel.objects.get(authority_id=authority)
-        except PaymentModel.DoesNotExist:
-            return Response({"error": "payment not found"}, status=404)
+            result = gateway_for(payment_obj.amount).payment_verify(authority)
+        except ZarinPalError:
+            return verify_unavailable(payment_obj)
 
-        if status != "OK":
-            payment_obj.status = PaymentStatusType.FAILED
-            payment_obj.save()
-            return redirect("order:order-failed")
+        return settle_payment(payment_obj, result)
 
-        order = payment_obj.order  # ← از related_name استفاده کن
 
-        zp = ZarinPalSandbox(settings.ZARINPAL_MERCHANT_ID, payment_obj.amount)
-        result = zp.payment_verify(payment_obj.amount, authority)
+# ==========================================
+# Async views (ASGI)
+# ==========================================
+#
+# Same flow; the database steps run in a thread and the gateway call is
+# awaited, so hundreds of payments can wait on ZarinPal in one process.
+# Routed instead of the sync views when PAYMENT_ASYNC_VIEWS is on.
 
-        if result["code"] == 100:
-            with transaction.atomic():
-                payment_obj.ref_id = result["ref_id"]
-                payment_obj.status = PaymentStatusType.SUCCESS
-                payment_obj.response_json = result
-                payment_obj.save()
+@idempotent(name="post")
+class AsyncPaymentRequestApiView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-                order.status = "paid"
-                order.save()
+    async def post(self, request, order_id):
+        order, error = await sync_to_async(prepare_request)(request.user, order_id)
 
-                # کاهش موجودی
-                for item in order.order_items.all():
-                    variant = item.variant
-                    if variant.stock < item.quantity:
-                        raise Exception("stock error")
-                    variant.stock -= item.quantity
-                    variant.save()
+        if error:
+            return error
 
-                # منقضی کردن کد تخفیف
-                if order.coupon:
-                    order.coupon.is_active = False
-                    order.coupon.save()
+        zarinpal = gateway_for(order.total_price)
 
-            return redirect("order:order-success")
+        try:
+            authority = await zarinpal.apayment_request(
+                description=f"پرداخت سفارش {order.id}"
+            )
+        except ZarinPalError:
+            return gateway_unavailable(order)
 
-        payment_obj.status = PaymentStatusType.FAILED
-        payment_obj.save()
-        return redirect("order:order-failed")
\ No newline at end of file
+        return await sync_to_async(start_payment)(order, zarinpal, authority)
+
+
+class AsyncPaymentVerifyApiView(AsyncAPIView):
+
+    async def get(self, request):
+        authority = request.GET.get("Authority")
+
+        payment_obj = await sync_to_async(find_payment)(authority)
+
+        if payment_obj is None:
+            return payment_not_found()
+
+        if payment_obj.status != PaymentStatusType.PENDING:
+            return settled_redirect(payment_obj)
+
+        if request.GET.get("Status") != "OK":
+            return await sync_to_async(fail_payment)(payment_obj)
+
+        try:
+            result = await gateway_for(payment_obj.amount).apayment_verify(authority)
+        except ZarinPalError:
+            return verify_unavailable(payment_obj)
+
+        return await sync_to_async(settle_payment)(payment_obj, result)
@@ -1,75 +1,59 @@
-import requests
 from django.conf import settings
 
+from .gateway import ZarinPalError, apost, post
+
 
 class ZarinPalSandbox:
-    ZP_API_REQUEST = "https://sandbox.zarinpal.com/pg/v4/payment/request.json"
-    ZP_API_VERIFY = "https://sandbox.zarinpal.com/pg/v4/payment/verify.json"
-    ZP_API_STARTPAY = "https://sandbox.zarinpal.com/pg/StartPay/"
 
     def __init__(self, merchant, amount, callback_url=None):
         self.merchant = merchant
         self.amount = int(amount)
         self.callback_url = callback_url or settings.ZARINPAL_CALLBACK_URL
+        self.base_url = getattr(settings, "ZARINPAL_BASE_URL", "https://sandbox.zarinpal.com").rstrip("/")
 
-    def payment_request(self, description="پرداخت سفارش"):
-        payload = {
+    @property
+    def request_url(self):
+        return f"{self.base_url}/pg/v4/payment/request.json"
+
+    @property
+    def verify_url(self):
+        return f"{self.base_url}/pg/v4/payment/verify.json"
+
+    @property
+    def startpay_url(self):
+        return f"{self.base_url}/pg/StartPay/"
+
+    def request_payload(self, description):
+        return {
             "merchant_id": self.merchant,
             "amount": self.amount,
             "callback_url": self.callback_url,
             "description": description,
         }
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(
-            self.ZP_API_REQUEST,
-            json=payload,
-            headers=headers,
-            timeout=15
-        )
-
-        if response.status_code != 200:
-            raise Exception("ZarinPal request connection error")
-
-        data = response.json().get("data")
-        errors = response.json().get("errors")
+    def parse_request(self, body):
+        data = body.get("data")
+        errors = body.get("errors")
 
         if errors:
-            raise Exception(f"ZarinPal error: {errors}")
+            raise ZarinPalError(f"ZarinPal error: {errors}")
 
-        authority = data.get("authority")
+        authority = (data or {}).get("authority")
         if not authority:
-            raise Exception("Authority not returned from ZarinPal")
+            raise ZarinPalError("Authority not returned from ZarinPal")
 
         return authority
 
-    def payment_verify(self, authority):
-        payload = {
+    def verify_payload(self, authority):
+        return {
             "merchant_id": self.merchant,
             "amount": self.amount,
             "authority": authority
         }
 
-        headers = {
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(
-            self.ZP_API_VERIFY,
-            json=payload,
-            headers=headers,
-            timeout=15
-        )
-
-        if response.status_code != 200:
-            raise Exception("ZarinPal verify connection error")
-
-        data = response.json().get("data")
-        errors = response.json().get("errors")
+    def parse_verify(self, body):
+        data = body.get("data")
+        errors = body.get("errors")
 
         if errors:
             return {
@@ -84,5 +68,38 @@ class ZarinPalSandbox:
             "raw": data
         }
 
+    @property
+    def verify_retries(self):
+        return getattr(settings, "ZARINPAL_VERIFY_RETRIES", 2)
+
+    def payment_request(self, description="پرداخت سفارش"):
+        # تکرار درخواست یک authority جدید می‌سازد؛ فقط خطای اتصال تکرار می‌شود
+        body = post("request", self.request_url, self.request_payload(description))
+        return self.parse_request(body)
+
+    def payment_verify(self, authority):
+        # verify تکرارپذیر است (کد 101 یعنی قبلا تایید شده)
+        body = post("verify", self.verify_url, self.verify_payload(authority), retries=self.verify_retries)
+        return self.parse_verify(body)
+
+    async def apayment_request(self, description="پرداخت سفارش"):
+        body = await apost("request", self.request_url, self.request_payload(description))
+        return self.parse_request(body)
+
+    async def apayment_verify(self, authority):
+        body = await apost("verify", self.verify_url, self.verify_payload(authority), retries=self.verify_retries)
+        return self.parse_verify(body)
+
     def generate_payment_url(self, authority):
-        return f"{self.ZP_API_STARTPAY}{authority}"
\ No newline at end of file
+        return f"{self.startpay_url}{authority}"
+
+
+def gateway_amount(amount):
+    return int(amount) * 10  # تومان → ریال
+
+
+def gateway_for(amount):
+    return ZarinPalSandbox(
+        merchant=settings.ZARINPAL_MERCHANT_ID,
+        amount=gateway_amount(amount)
+    )
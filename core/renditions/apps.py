@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class RenditionsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'renditions'
+
+    def ready(self):
+        from . import signals
+
+        signals.connect_models()
@@ -0,0 +1,115 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from renditions import pipeline, process
+from renditions.signals import rendition_models
+
+
+class Command(BaseCommand):
+
+    help = "Generate missing or outdated image renditions in a pool of worker processes"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "models",
+            nargs="*",
+            help="Model labels to process, e.g. shop.ProductImages (default: every model with renditions)",
+        )
+
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of worker processes",
+        )
+
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate renditions that are already up to date",
+        )
+
+    def get_models(self, labels):
+
+        models = rendition_models()
+
+        if not labels:
+            return models
+
+        by_label = {
+            model._meta.label_lower: model
+            for model in models
+        }
+
+        try:
+            return [by_label[label.lower()] for label in labels]
+        except KeyError as error:
+            raise CommandError(f"{error.args[0]} has no renditions")
+
+    def get_jobs(self, models, force):
+
+        jobs = []
+
+        for model in models:
+
+            for instance in model.objects.exclude(**{model.rendition_field: ""}).iterator():
+
+                if force or instance.renditions_outdated:
+                    jobs.append((model._meta.label, instance.pk))
+
+        return jobs
+
+    def handle(self, *args, **options):
+
+        jobs = self.get_jobs(
+            self.get_models(options["models"]),
+            options["force"]
+        )
+
+        if not jobs:
+            self.stdout.write(self.style.SUCCESS("Every rendition is up to date"))
+            return
+
+        # اتصال‌های باز نباید با fork بین فرآیندها مشترک شوند
+        connections.close_all()
+
+        rendered = defaultdict(list)
+        failed = 0
+
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=process.setup) as executor:
+
+            futures = [
+                executor.submit(process.render, label, pk)
+                for label, pk in jobs
+            ]
+
+            for future in as_completed(futures):
+
+                label, pk, error = future.result()
+
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{label} {pk}: {error}")
+                else:
+                    rendered[label].append(pk)
+
+        # کش و صفحه اصلی در این فرآیند هم باید از نسخه‌های جدید خبردار شوند
+        for label, pks in rendered.items():
+
+            model = apps.get_model(label)
+
+            pipeline.renditions_updated.send(
+                sender=model,
+                instances=list(model.objects.filter(pk__in=pks))
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {len(jobs) - failed} images ({failed} failed)"
+            )
+        )
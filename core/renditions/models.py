@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class RenditionsMixin(models.Model):
+
+    """
+    Resized WebP/JPEG copies of ``rendition_field`` are generated on upload
+    (renditions.pipeline) and described in ``renditions``:
+
+        {"source": "<original name>", "items": [
+            {"name": ..., "width": ..., "height": ..., "format": "webp"}, ...
+        ]}
+    """
+
+    rendition_field = "image"
+
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="عرض تصویر"
+    )
+
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="ارتفاع تصویر"
+    )
+
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="نسخه‌های تصویر"
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rendition_file(self):
+        return getattr(self, self.rendition_field)
+
+    @property
+    def renditions_outdated(self):
+        file = self.rendition_file
+
+        return bool(file) and self.renditions.get("source") != file.name
@@ -0,0 +1,195 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.dispatch import Signal
+
+from PIL import Image, ImageOps
+
+
+# بعد از ساخت نسخه‌ها با مدل (sender) و شناسه‌ها ارسال می‌شود
+renditions_updated = Signal()
+
+DEFAULT_WIDTHS = (320, 640, 1024, 1600)
+
+DEFAULT_FORMATS = ("webp", "jpeg")
+
+RENDER_ERRORS = (
+    OSError,
+    ValueError,
+    Image.DecompressionBombError,
+)
+
+PIL_FORMATS = {
+    "webp": "WEBP",
+    "jpeg": "JPEG",
+}
+
+
+def rendition_widths(original_width):
+    """
+    Configured widths narrower than the original; never upscales, and an
+    image smaller than every width keeps one copy at its own width.
+    """
+    widths = [
+        width
+        for width in getattr(settings, "RENDITION_WIDTHS", DEFAULT_WIDTHS)
+        if width < original_width
+    ]
+
+    return widths or [original_width]
+
+
+def rendition_name(source, width, format):
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+
+    return posixpath.join(
+        directory,
+        "renditions",
+        f"{stem}-{width}w.{format}"
+    )
+
+
+def encode(image, format):
+    if format == "jpeg" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+        image = background
+
+    buffer = BytesIO()
+
+    image.save(
+        buffer,
+        PIL_FORMATS[format],
+        quality=getattr(settings, "RENDITION_QUALITY", 80),
+        optimize=True,
+    )
+
+    return buffer.getvalue()
+
+
+def delete_renditions(storage, renditions, keep=()):
+    for item in renditions.get("items", ()):
+        # storageهایی که روی فایل هم‌نام می‌نویسند همان نام را برمی‌گردانند
+        if item["name"] not in keep:
+            storage.delete(item["name"])
+
+
+def render(instance):
+    """
+    Generate every width/format of ``instance.rendition_file`` and store the
+    metadata with an UPDATE (no save signals). Returns the new renditions,
+    or None if the image changed meanwhile.
+
+    The new files are written next to the old ones and swapped in under a
+    lock on the row; the replaced files are deleted after commit, so the
+    stored renditions always point at existing files.
+    """
+    file = instance.rendition_file
+    storage = file.storage
+    model = type(instance)
+
+    with storage.open(file.name, "rb") as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    if original.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in original.getbands() or "transparency" in original.info
+        original = original.convert("RGBA" if has_alpha else "RGB")
+
+    width, height = original.size
+
+    items = []
+
+    try:
+        for target_width in rendition_widths(width):
+            target_height = max(1, round(height * target_width / width))
+
+            resized = original.resize(
+                (target_width, target_height),
+                Image.Resampling.LANCZOS
+            )
+
+            for format in getattr(settings, "RENDITION_FORMATS", DEFAULT_FORMATS):
+                name = storage.save(
+                    rendition_name(file.name, target_width, format),
+                    ContentFile(encode(resized, format))
+                )
+
+                items.append({
+                    "name": name,
+                    "width": target_width,
+                    "height": target_height,
+                    "format": format,
+                })
+
+    except Exception:
+        delete_renditions(storage, {"items": items})
+        raise
+
+    renditions = {
+        "source": file.name,
+        "items": items,
+    }
+
+    names = {item["name"] for item in items}
+
+    with transaction.atomic():
+        current = model.objects.select_for_update().filter(
+            pk=instance.pk
+        ).values_list(
+            model.rendition_field,
+            "renditions"
+        ).first()
+
+        # حذف شده یا تصویرش در این فاصله عوض شده؛ تسک جدیدی در صف است
+        if current is None or current[0] != file.name:
+            delete_renditions(storage, renditions)
+            return None
+
+        model.objects.filter(pk=instance.pk).update(
+            image_width=width,
+            image_height=height,
+            renditions=renditions,
+        )
+
+        replaced = current[1] or {}
+
+        transaction.on_commit(
+            lambda: delete_renditions(storage, replaced, keep=names)
+        )
+
+    instance.image_width = width
+    instance.image_height = height
+    instance.renditions = renditions
+
+    renditions_updated.send(
+        sender=model,
+        instances=[instance]
+    )
+
+    return renditions
+
+
+def clear(instance):
+    """
+    The image was removed: drop its renditions and metadata.
+    """
+    storage, replaced = instance.rendition_file.storage, instance.renditions or {}
+
+    type(instance).objects.filter(pk=instance.pk).update(
+        image_width=None,
+        image_height=None,
+        renditions={},
+    )
+
+    transaction.on_commit(
+        lambda: delete_renditions(storage, replaced)
+    )
+
+    instance.image_width = None
+    instance.image_height = None
+    instance.renditions = {}
@@ -0,0 +1,32 @@
+"""
+Entry points of build_renditions' worker processes. A spawned interpreter
+imports this module before Django is set up, so models are only imported
+inside.
+"""
+
+import django
+
+
+def setup():
+    django.setup()
+
+
+def render(label, pk):
+    """
+    Returns (label, pk, error).
+    """
+    from django.apps import apps
+
+    from . import pipeline
+
+    instance = apps.get_model(label).objects.filter(pk=pk).first()
+
+    if instance is None or not instance.rendition_file:
+        return label, pk, None
+
+    try:
+        pipeline.render(instance)
+    except pipeline.RENDER_ERRORS as error:
+        return label, pk, str(error)
+
+    return label, pk, None
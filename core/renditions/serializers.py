@@ -0,0 +1,49 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+
+
+def absolute_url(storage, name, request):
+    url = storage.url(name)
+
+    if request:
+        return request.build_absolute_uri(url)
+
+    return url
+
+
+class RenditionsField(serializers.Field):
+
+    """
+    Width/height and ``srcset`` strings (one per format) of a model using
+    RenditionsMixin. Use with ``source`` pointing at the instance, e.g.
+    ``source="*"`` or ``source="main_image"``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        kwargs.setdefault("source", "*")
+
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        if instance is None or not instance.rendition_file:
+            return None
+
+        request = self.context.get("request")
+        storage = instance.rendition_file.storage
+
+        srcset = defaultdict(list)
+
+        for item in instance.renditions.get("items", ()):
+            url = absolute_url(storage, item["name"], request)
+            srcset[item["format"]].append(f"{url} {item['width']}w")
+
+        return {
+            "width": instance.image_width,
+            "height": instance.image_height,
+            "srcset": {
+                format: ", ".join(candidates)
+                for format, candidates in srcset.items()
+            },
+        }
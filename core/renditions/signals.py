@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from tasks.base import enqueue
+
+from . import pipeline
+from .models import RenditionsMixin
+
+
+def render_on_upload(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    if instance.renditions_outdated:
+        label = sender._meta.label
+
+        # ساخت نسخه‌ها در worker؛ آپلودهای پشت سر هم یک تسک می‌شوند
+        enqueue(
+            "renditions.render",
+            [label, instance.pk],
+            unique_key=f"renditions:{label}:{instance.pk}"
+        )
+
+    elif not instance.rendition_file and instance.renditions:
+        pipeline.clear(instance)
+
+
+def delete_renditions(sender, instance, **kwargs):
+    storage, renditions = instance.rendition_file.storage, instance.renditions or {}
+
+    # اگر حذف rollback شود، فایل‌ها هنوز لازم‌اند
+    transaction.on_commit(
+        lambda: pipeline.delete_renditions(storage, renditions)
+    )
+
+
+def rendition_models():
+    return [
+        model
+        for model in apps.get_models()
+        if issubclass(model, RenditionsMixin)
+    ]
+
+
+def connect_models():
+    for model in rendition_models():
+        post_save.connect(render_on_upload, sender=model, dispatch_uid=f"renditions-{model._meta.label}-save")
+        post_delete.connect(delete_renditions, sender=model, dispatch_uid=f"renditions-{model._meta.label}-delete")
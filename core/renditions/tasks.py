@@ -0,0 +1,25 @@
+import logging
+
+from django.apps import apps
+
+from tasks.base import task
+
+from . import pipeline
+
+
+logger = logging.getLogger(__name__)
+
+
+@task()
+def render(label, pk):
+    instance = apps.get_model(label).objects.filter(pk=pk).first()
+
+    # حذف شده یا در این فاصله تصویرش دوباره عوض شده و تسک جدیدی در صف است
+    if instance is None or not instance.renditions_outdated:
+        return
+
+    try:
+        pipeline.render(instance)
+    except pipeline.RENDER_ERRORS:
+        # تصویر خراب یا ناموجود با تلاش دوباره درست نمی‌شود
+        logger.warning("Could not render %s %s", label, pk, exc_info=True)
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from PIL import Image
+
+from shop.models import ProductCategory
+from tasks.models import Task
+
+from . import pipeline
+
+
+def image_file(size=(200, 100), mode="RGB", format="PNG"):
+    buffer = BytesIO()
+
+    Image.new(mode, size).save(buffer, format)
+
+    return ContentFile(buffer.getvalue(), name=f"image.{format.lower()}")
+
+
+@override_settings(RENDITION_WIDTHS=(50, 100, 400), RENDITION_FORMATS=("webp", "jpeg"))
+class RenditionPipelineTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.category = ProductCategory.objects.create(title="مانتو", slug="manto")
+        self.category.image.save("manto.png", image_file(mode="RGBA"))
+
+    def names(self, renditions):
+        return [item["name"] for item in renditions["items"]]
+
+    def test_widths_never_upscale(self):
+        self.assertEqual(pipeline.rendition_widths(120), [50, 100])
+        self.assertEqual(pipeline.rendition_widths(30), [30])
+
+    def test_upload_queues_a_render(self):
+        self.assertEqual(
+            list(Task.objects.values_list("name", "args")),
+            [("renditions.render", ["shop.ProductCategory", self.category.pk])]
+        )
+
+    def test_render(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            renditions = pipeline.render(self.category)
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.renditions, renditions)
+        self.assertEqual((self.category.image_width, self.category.image_height), (200, 100))
+        self.assertFalse(self.category.renditions_outdated)
+
+        self.assertEqual(
+            [(item["width"], item["height"], item["format"]) for item in renditions["items"]],
+            [(50, 25, "webp"), (50, 25, "jpeg"), (100, 50, "webp"), (100, 50, "jpeg")]
+        )
+
+        for name in self.names(renditions):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_rerender_swaps_before_deleting(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            old = pipeline.render(self.category)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            new = pipeline.render(self.category)
+
+            # تا commit نسخه‌های قبلی هنوز هستند
+            for name in self.names(old) + self.names(new):
+                self.assertTrue(default_storage.exists(name))
+
+        for callback in callbacks:
+            callback()
+
+        for name in self.names(old):
+            self.assertFalse(default_storage.exists(name))
+
+        for name in self.names(new):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_failed_render_keeps_the_old_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            old = pipeline.render(self.category)
+
+        encode = pipeline.encode
+
+        calls = []
+
+        def failing_encode(image, format):
+            calls.append(format)
+
+            if len(calls) == 3:
+                raise OSError("disk full")
+
+            return encode(image, format)
+
+        with mock.patch.object(pipeline, "encode", failing_encode):
+            with self.assertRaises(OSError):
+                pipeline.render(self.category)
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.renditions, old)
+
+        for name in self.names(old):
+            self.assertTrue(default_storage.exists(name))
+
+        # فایل‌های نیمه‌کاره این اجرا پاک شده‌اند
+        self.assertEqual(
+            sorted(default_storage.listdir("shop/categories/images/renditions")[1]),
+            sorted(name.rsplit("/", 1)[1] for name in self.names(old))
+        )
+
+    def test_image_changed_meanwhile(self):
+        stale = ProductCategory.objects.get(pk=self.category.pk)
+
+        self.category.image.save("other.png", image_file())
+
+        self.assertIsNone(pipeline.render(stale))
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.renditions, {})
+        self.assertEqual(default_storage.listdir("shop/categories/images/renditions")[1], [])
+
+    def test_clear(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            renditions = pipeline.render(self.category)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.image = None
+            self.category.save()
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.renditions, {})
+        self.assertIsNone(self.category.image_width)
+
+        for name in self.names(renditions):
+            self.assertFalse(default_storage.exists(name))
+
+    def test_delete_removes_the_files_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            renditions = pipeline.render(self.category)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.category.delete()
+
+        # تا commit فایل‌ها دست نمی‌خورند
+        for name in self.names(renditions):
+            self.assertTrue(default_storage.exists(name))
+
+        for callback in callbacks:
+            callback()
+
+        for name in self.names(renditions):
+            self.assertFalse(default_storage.exists(name))
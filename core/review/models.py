@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from shop.models import Product
 from accounts.models import User
 
@@ -44,3 +46,49 @@ class Review(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.product} - {self.rating}"
+
+    def save(self, *args, **kwargs):
+        # ستون‌های امتیاز محصول در همان تراکنش بروز می‌شوند (signals)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+# ===========================
+# Signals
+# ===========================
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = Review.objects.filter(
+            pk=instance.pk
+        ).values_list("product_id", "rating").first()
+
+
+@receiver(post_save, sender=Review)
+def update_product_rating_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_rating", None)
+    current = (instance.product_id, instance.rating)
+
+    if previous == current:
+        return
+
+    if previous and previous[0] == instance.product_id:
+        Product.objects.filter(pk=instance.product_id).apply_ratings(
+            added=[instance.rating],
+            removed=[previous[1]]
+        )
+        return
+
+    if previous:
+        Product.objects.filter(pk=previous[0]).apply_ratings(removed=[previous[1]])
+
+    Product.objects.filter(pk=instance.product_id).apply_ratings(added=[instance.rating])
+
+
+@receiver(post_delete, sender=Review)
+def update_product_rating_on_delete(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).apply_ratings(
+        removed=[instance.rating]
+    )
@@ -1,3 +1,149 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from shop.models import Product, ProductStatus
+
+from .models import Review
+
+
+class ReviewFixtureMixin:
+
+    def setUp(self):
+        super().setUp()
+
+        self.product = Product.objects.create(
+            title="محصول",
+            slug="product",
+            description="توضیحات",
+            status=ProductStatus.PUBLISHED,
+        )
+
+        self.users = [
+            User.objects.create(phone_number=f"0912000000{index}")
+            for index in range(5)
+        ]
+
+    def review(self, user, rating):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Review.objects.create(
+                user=user,
+                product=self.product,
+                rating=rating,
+                comment="نظر",
+            )
+
+
+class RatingColumnsTests(ReviewFixtureMixin, TestCase):
+
+    def assertRatings(self, product, average, histogram):
+        product.refresh_from_db()
+
+        self.assertAlmostEqual(product.rating_avg, average)
+        self.assertEqual(product.rating_count, sum(histogram.values()))
+        self.assertEqual(
+            {rating: getattr(product, f"rating_{rating}") for rating in range(1, 6)},
+            {rating: histogram.get(rating, 0) for rating in range(1, 6)}
+        )
+
+        self.assertEqual(Product.objects.rating_drift(), [])
+
+    def test_create_update_delete(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+
+        self.assertRatings(self.product, 3.5, {5: 1, 2: 1})
+
+        first.rating = 4
+        first.save()
+
+        self.assertRatings(self.product, 3.0, {4: 1, 2: 1})
+
+        first.delete()
+
+        self.assertRatings(self.product, 2.0, {2: 1})
+
+        Review.objects.all().delete()
+
+        self.assertRatings(self.product, 0.0, {})
+
+    def test_move_to_another_product(self):
+        other = Product.objects.create(
+            title="محصول دیگر",
+            slug="other",
+            description="توضیحات",
+            status=ProductStatus.PUBLISHED,
+        )
+
+        review = self.review(self.users[0], 4)
+
+        review.product = other
+        review.save()
+
+        self.assertRatings(self.product, 0.0, {})
+        self.assertRatings(other, 4.0, {4: 1})
+
+    def test_rebuild_command_repairs_drift(self):
+        self.review(self.users[0], 5)
+
+        # update() از سیگنال‌ها رد می‌شود
+        Review.objects.update(rating=1)
+
+        self.assertEqual(Product.objects.rating_drift(), [self.product.pk])
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_product_ratings", "--check", stdout=StringIO())
+
+        call_command("rebuild_product_ratings", stdout=StringIO())
+
+        self.assertRatings(self.product, 1.0, {1: 1})
+
+    def test_detail_and_top_rated_sort(self):
+        other = Product.objects.create(
+            title="محصول دیگر",
+            slug="other",
+            description="توضیحات",
+            status=ProductStatus.PUBLISHED,
+        )
+
+        self.review(self.users[0], 3)
+        self.review(self.users[1], 4)
+
+        response = self.client.get(reverse("shop:product-detail", args=[self.product.slug]))
+
+        self.assertEqual(
+            response.data["product"]["review_stats"],
+            {"count": 2, "average": 3.5, "ratings": {1: 0, 2: 0, 3: 1, 4: 1, 5: 0}}
+        )
+
+        response = self.client.get(reverse("shop:product-list"), {"sort": "top_rated"})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [self.product.pk, other.pk]
+        )
+
+
+class ReviewConditionalGetTests(ReviewFixtureMixin, TestCase):
+
+    def test_etag_follows_the_reviews(self):
+        url = reverse("review:product-reviews", kwargs={"product_id": self.product.pk})
+
+        self.review(self.users[0], 5)
+
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.client.get(url, headers={"if_none_match": etag}).status_code, 304)
+
+        review = Review.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+
+        response = self.client.get(url, headers={"if_none_match": etag})
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [])
@@ -1,12 +1,30 @@
 from rest_framework import generics
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+
+from core.conditional import conditional_get
+from shop.cache import ResponseCacheMixin, get_versions, review_version_key
 
 from .models import Review
 from .serializers import ReviewSerializer
 
 
-class ReviewListCreateView(generics.ListCreateAPIView):
+class ReviewCursorPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    ordering = ("-created_date", "-id")
+
+
+def review_versions(request, product_id):
+    return get_versions(review_version_key(product_id))
+
+
+@conditional_get(review_versions, name="get")
+class ReviewListCreateView(ResponseCacheMixin, generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
+    pagination_class = ReviewCursorPagination
 
     def get_permissions(self):
         if self.request.method == "GET":
@@ -21,6 +39,20 @@ class ReviewListCreateView(generics.ListCreateAPIView):
             product_id=product_id
         ).select_related("user", "product")
 
+    def list(self, request, *args, **kwargs):
+        # هر صفحه جدا کش می‌شود؛ ثبت/ویرایش نظر نسخه نظرات محصول را عوض می‌کند
+        cache_key, data = self.cached_data(
+            request,
+            "reviews",
+            review_version_key(self.kwargs.get("product_id"))
+        )
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        self.cache_data(cache_key, response.data)
+        return response
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -32,4 +64,4 @@ class ReviewUpdateView(generics.UpdateAPIView):
     def get_queryset(self):
         return Review.objects.filter(
             user=self.request.user
-        ).select_related("user", "product")
\ No newline at end of file
+        ).select_related("user", "product")
@@ -0,0 +1,355 @@
+import math
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils.module_loading import import_string
+
+from shop.models import Product, ProductStatus, FeatureValue
+
+from .models import SearchDocument, SearchPosting
+from .normalizer import normalize, tokenize
+
+
+# ==========================================
+# Base
+# ==========================================
+
+class BaseSearchBackend:
+
+    def filter(self, queryset, query):
+        """
+        Narrow a product queryset to the matches of ``query``, annotated
+        with a ``search_score`` to order by.
+        """
+        raise NotImplementedError
+
+    def search(self, query, limit=None):
+        """
+        Return ``[(product_id, score), ...]`` ordered by relevance.
+        """
+
+        results = self.filter(
+            Product.objects.all(),
+            query
+        ).order_by(
+            "-search_score",
+            "pk"
+        ).values_list(
+            "pk",
+            "search_score"
+        )
+
+        return list(results[:limit] if limit else results)
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+# ==========================================
+# icontains (no index)
+# ==========================================
+
+class IContainsSearchBackend(BaseSearchBackend):
+
+    """
+    The original substring scan; kept as a fallback backend.
+    """
+
+    def filter(self, queryset, query):
+
+        return queryset.filter(
+            Q(title__icontains=query)
+            |
+            Q(brief_description__icontains=query)
+        ).annotate(
+            search_score=Value(0.0, output_field=FloatField())
+        )
+
+
+# ==========================================
+# BM25 over a database inverted index
+# ==========================================
+
+class DatabaseBM25Backend(BaseSearchBackend):
+
+    # وزن هر فیلد در فراوانی واژه
+    FIELD_WEIGHTS = (
+        ("title", 3.0),
+        ("brief_description", 2.0),
+        ("description", 1.0),
+        ("features", 1.5),
+    )
+
+    k1 = 1.2
+
+    b = 0.75
+
+    # واژه نیمه‌کاره کوتاه‌تر از این فقط به صورت کامل جستجو می‌شود
+    min_prefix_length = 2
+
+    # ---------------------------------
+    # Indexing
+    # ---------------------------------
+
+    def analyze(self, fields):
+
+        frequencies = Counter()
+
+        for field, weight in self.FIELD_WEIGHTS:
+
+            for token in tokenize(fields.get(field, "")):
+                frequencies[token[:100]] += weight
+
+        return frequencies
+
+    def index_products(self, product_ids):
+
+        product_ids = set(product_ids)
+
+        products = Product.objects.filter(
+            pk__in=product_ids,
+            status=ProductStatus.PUBLISHED
+        ).values(
+            "pk",
+            "title",
+            "brief_description",
+            "description",
+        )
+
+        features = defaultdict(list)
+
+        for product_id, value in FeatureValue.objects.filter(
+            product_id__in=product_ids
+        ).values_list("product_id", "value"):
+            features[product_id].append(value)
+
+        documents = []
+
+        postings = []
+
+        for product in products:
+
+            frequencies = self.analyze({
+                **product,
+                "features": " ".join(features[product["pk"]]),
+            })
+
+            length = sum(frequencies.values())
+
+            documents.append(
+                SearchDocument(
+                    product_id=product["pk"],
+                    length=length
+                )
+            )
+
+            postings.extend(
+                SearchPosting(
+                    term=term,
+                    document_id=product["pk"],
+                    frequency=frequency,
+                    length=length
+                )
+                for term, frequency in frequencies.items()
+            )
+
+        with transaction.atomic():
+
+            SearchDocument.objects.filter(
+                pk__in=product_ids
+            ).delete()
+
+            SearchDocument.objects.bulk_create(
+                documents
+            )
+
+            SearchPosting.objects.bulk_create(
+                postings,
+                batch_size=1000
+            )
+
+    def remove_products(self, product_ids):
+
+        SearchDocument.objects.filter(
+            pk__in=set(product_ids)
+        ).delete()
+
+    def rebuild(self):
+
+        with transaction.atomic():
+
+            SearchDocument.objects.all().delete()
+
+            product_ids = list(
+                Product.objects.filter(
+                    status=ProductStatus.PUBLISHED
+                ).values_list("pk", flat=True)
+            )
+
+            for start in range(0, len(product_ids), 500):
+                self.index_products(
+                    product_ids[start:start + 500]
+                )
+
+        return len(product_ids)
+
+    # ---------------------------------
+    # Query
+    # ---------------------------------
+
+    def conditions(self, query):
+        """
+        One posting condition per distinct query term; the last term may
+        still be typed, so it also matches as a prefix once it is long
+        enough.
+        """
+
+        terms = tokenize(query)
+
+        if not terms:
+
+            # عبارت فقط از توقف‌واژه‌ها تشکیل شده است
+            terms = normalize(query).split()
+
+        if not terms:
+            return []
+
+        *complete, partial = terms
+
+        conditions = {
+            ("exact", term): Q(term=term)
+            for term in complete
+        }
+
+        # پیشوند یکی دو حرفی بخش بزرگی از ایندکس را می‌خواند
+        if len(partial) >= self.min_prefix_length:
+            conditions[("prefix", partial)] = Q(term__startswith=partial)
+        else:
+            conditions[("exact", partial)] = Q(term=partial)
+
+        return list(conditions.values())
+
+    def filter(self, queryset, query):
+        """
+        Documents containing every query term, scored by BM25 in the
+        database. A prefix counts as one term whose document frequency is
+        that of all its completions.
+        """
+
+        conditions = self.conditions(query)
+
+        if not conditions:
+            return queryset.none()
+
+        matching = Q()
+
+        for condition in conditions:
+            matching |= condition
+
+        frequencies = SearchPosting.objects.filter(
+            matching
+        ).aggregate(**{
+            f"term_{index}": Count(
+                "document_id",
+                filter=condition,
+                distinct=True
+            )
+            for index, condition in enumerate(conditions)
+        })
+
+        stats = SearchDocument.objects.aggregate(
+            total=Count("pk"),
+            average_length=Avg("length"),
+        )
+
+        total = stats["total"] or 0
+
+        average_length = stats["average_length"] or 1
+
+        idf = Case(
+            *[
+                When(
+                    condition,
+                    then=Value(
+                        math.log(
+                            1 + (total - count + 0.5) / (count + 0.5)
+                        )
+                    )
+                )
+                for condition, count in zip(
+                    conditions,
+                    (
+                        frequencies[f"term_{index}"]
+                        for index in range(len(conditions))
+                    )
+                )
+            ],
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+
+        term_score = idf * F("frequency") * (self.k1 + 1) / (
+            F("frequency")
+            + self.k1 * (1 - self.b)
+            + F("length") * (self.k1 * self.b / average_length)
+        )
+
+        scores = SearchPosting.objects.filter(
+            matching,
+            document_id=OuterRef("pk")
+        ).values(
+            "document_id"
+        ).annotate(
+            score=Sum(term_score, output_field=FloatField())
+        ).values("score")
+
+        # همه واژه‌های جستجو باید در سند باشند
+        return queryset.filter(*[
+            Exists(
+                SearchPosting.objects.filter(
+                    condition,
+                    document_id=OuterRef("pk")
+                )
+            )
+            for condition in conditions
+        ]).annotate(
+            search_score=Subquery(scores, output_field=FloatField())
+        )
+
+
+# ==========================================
+# Backend loader
+# ==========================================
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+
+    backend = getattr(
+        settings,
+        "SEARCH_BACKEND",
+        "search.backends.DatabaseBM25Backend"
+    )
+
+    return import_string(backend)()
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('shop', '0004_product_best_variant_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='shop.product', verbose_name='محصول')),
+                ('length', models.FloatField(default=0, verbose_name='طول سند')),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'سند جستجو',
+                'verbose_name_plural': 'اسناد جستجو',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=100, verbose_name='واژه')),
+                ('frequency', models.FloatField(verbose_name='فراوانی')),
+                ('length', models.FloatField(verbose_name='طول سند')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='search.searchdocument', verbose_name='سند')),
+            ],
+            options={
+                'verbose_name': 'واژه ایندکس',
+                'verbose_name_plural': 'واژه های ایندکس',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'document'), name='unique_search_posting'),
+        ),
+    ]
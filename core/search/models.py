@@ -0,0 +1,79 @@
+from django.db import models
+
+from shop.models import Product
+
+
+# ===========================
+# Search Document
+# ===========================
+
+class SearchDocument(models.Model):
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+        verbose_name="محصول"
+    )
+
+    # طول وزن‌دار سند (مجموع وزن توکن‌ها) برای BM25
+    length = models.FloatField(
+        default=0,
+        verbose_name="طول سند"
+    )
+
+    updated_date = models.DateTimeField(
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = "سند جستجو"
+        verbose_name_plural = "اسناد جستجو"
+
+    def __str__(self):
+        return f"{self.product_id}"
+
+
+# ===========================
+# Search Posting
+# ===========================
+
+class SearchPosting(models.Model):
+
+    term = models.CharField(
+        max_length=100,
+        db_index=True,
+        verbose_name="واژه"
+    )
+
+    document = models.ForeignKey(
+        SearchDocument,
+        on_delete=models.CASCADE,
+        related_name="postings",
+        verbose_name="سند"
+    )
+
+    # فراوانی وزن‌دار واژه در سند
+    frequency = models.FloatField(
+        verbose_name="فراوانی"
+    )
+
+    # کپی طول سند تا امتیازدهی بدون join انجام شود
+    length = models.FloatField(
+        verbose_name="طول سند"
+    )
+
+    class Meta:
+        verbose_name = "واژه ایندکس"
+        verbose_name_plural = "واژه های ایندکس"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "document"],
+                name="unique_search_posting"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.term} - {self.document_id}"
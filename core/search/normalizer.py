@@ -0,0 +1,73 @@
+import re
+
+
+# ==========================================
+# Persian normalization
+# ==========================================
+
+CHARACTER_MAP = str.maketrans({
+    # عربی -> فارسی
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "ؤ": "و",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "آ": "ا",
+
+    # ارقام فارسی و عربی
+    "۰": "0", "۱": "1", "۲": "2", "۳": "3", "۴": "4",
+    "۵": "5", "۶": "6", "۷": "7", "۸": "8", "۹": "9",
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+})
+
+# اعراب، تنوین، تشدید، کشیده و نویسه‌های کنترلی جهت/اتصال
+IGNORED_CHARACTERS = re.compile(
+    "[\u064B-\u065F\u0670\u0640\u200C\u200D\u200E\u200F]"
+)
+
+TOKEN = re.compile(r"\w+")
+
+STOP_WORDS = frozenset({
+    "و",
+    "در",
+    "به",
+    "از",
+    "که",
+    "با",
+    "را",
+    "این",
+    "ان",
+    "برای",
+    "یک",
+    "تا",
+    "هم",
+    "یا",
+})
+
+
+def normalize(text):
+    """
+    Fold Persian text so spelling variants compare equal: Arabic yeh/kaf,
+    hamza forms and digits are mapped, diacritics, tatweel and ZWNJ dropped.
+    """
+
+    text = (text or "").translate(CHARACTER_MAP)
+
+    text = IGNORED_CHARACTERS.sub("", text)
+
+    return text.casefold()
+
+
+def tokenize(text):
+
+    return [
+        token
+        for token in TOKEN.findall(normalize(text))
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
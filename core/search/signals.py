@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from shop.models import Product, ProductCategory, ProductStatus, FeatureValue
+from tasks.base import enqueue
+
+from .suggest import suggest_index
+
+
+def reindex_products(product_ids):
+
+    # ایندکس BM25 در worker بروز می‌شود
+    enqueue(
+        "search.index_products",
+        [sorted(set(product_ids))]
+    )
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+
+    # محصولات غیرفعال در index_products حذف می‌شوند
+    reindex_products([instance.pk])
+
+    product_id, title, slug = instance.pk, instance.title, instance.slug
+
+    if instance.status == ProductStatus.PUBLISHED:
+
+        transaction.on_commit(
+            lambda: suggest_index.publish("add_product", product_id, title, slug)
+        )
+
+    else:
+
+        transaction.on_commit(
+            lambda: suggest_index.publish("remove_product", product_id)
+        )
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_suggestion(sender, instance, **kwargs):
+
+    product_id = instance.pk
+
+    transaction.on_commit(
+        lambda: suggest_index.publish("remove_product", product_id)
+    )
+
+
+@receiver(post_save, sender=FeatureValue)
+@receiver(post_delete, sender=FeatureValue)
+def reindex_feature_value_product(sender, instance, **kwargs):
+
+    reindex_products([instance.product_id])
+
+    transaction.on_commit(
+        suggest_index.invalidate
+    )
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def rebuild_category_suggestions(sender, instance, **kwargs):
+
+    transaction.on_commit(
+        suggest_index.invalidate
+    )
@@ -0,0 +1,284 @@
+import heapq
+from bisect import bisect_left
+from collections import Counter
+
+from django.db.models import Count, Q, Sum
+
+from order.models import OrderItemsModel
+from shop.models import (
+    Product,
+    ProductCategory,
+    ProductStatus,
+    FeatureValue,
+)
+from shop.snapshot import ProcessSnapshot
+
+from .normalizer import normalize
+
+
+# پیشوندهای کوتاه بازه بزرگی دارند؛ نتیجه آن‌ها کش می‌شود
+HOT_PREFIX_LENGTH = 2
+
+HOT_PREFIX_RESULTS = 20
+
+END_OF_RANGE = chr(0x10FFFF)
+
+
+def suggestion_keys(text):
+    """
+    The normalized text plus every suffix starting at a word boundary,
+    so "مانتو" completes "مانتو ..." as well as "... مانتو".
+    """
+
+    words = normalize(text).split()
+
+    return {
+        " ".join(words[start:])
+        for start in range(len(words))
+    }
+
+
+class Suggestion:
+
+    __slots__ = ("text", "kind", "slug", "popularity")
+
+    def __init__(self, text, kind, slug, popularity):
+
+        self.text = text
+
+        self.kind = kind
+
+        self.slug = slug
+
+        self.popularity = popularity
+
+    def as_dict(self):
+
+        return {
+            "text": self.text,
+            "type": self.kind,
+            "slug": self.slug,
+        }
+
+
+# ==========================================
+# Prefix index
+# ==========================================
+
+class SuggestIndex:
+
+    """
+    Sorted parallel arrays of (key, suggestion), searched with bisect.
+
+    Writers swap in new arrays instead of mutating them, so readers in
+    other threads never see the two arrays out of step.
+    """
+
+    def __init__(self):
+
+        self.entries = ([], [])
+
+        # product id -> suggestion, to unpublish without a scan
+        self.products = {}
+
+        self.hot = {}
+
+    # ---------------------------------
+    # Build
+    # ---------------------------------
+
+    @classmethod
+    def build(cls):
+
+        index = cls()
+
+        entries = []
+
+        sales = dict(
+            OrderItemsModel.objects.values_list(
+                "variant__product_id"
+            ).annotate(
+                sold=Sum("quantity")
+            )
+        )
+
+        for product_id, title, slug in Product.objects.filter(
+            status=ProductStatus.PUBLISHED
+        ).values_list("pk", "title", "slug"):
+
+            suggestion = Suggestion(
+                title,
+                "product",
+                slug,
+                sales.get(product_id, 0)
+            )
+
+            index.products[product_id] = suggestion
+
+            entries.extend(
+                (key, suggestion)
+                for key in suggestion_keys(title)
+            )
+
+        for title, slug, product_count in ProductCategory.objects.annotate(
+            product_count=Count(
+                "products",
+                filter=Q(products__status=ProductStatus.PUBLISHED)
+            )
+        ).values_list("title", "slug", "product_count"):
+
+            suggestion = Suggestion(
+                title,
+                "category",
+                slug,
+                product_count
+            )
+
+            entries.extend(
+                (key, suggestion)
+                for key in suggestion_keys(title)
+            )
+
+        feature_counts = Counter(
+            FeatureValue.objects.filter(
+                product__status=ProductStatus.PUBLISHED
+            ).values_list("value", flat=True)
+        )
+
+        for value, product_count in feature_counts.items():
+
+            suggestion = Suggestion(
+                value,
+                "feature",
+                None,
+                product_count
+            )
+
+            entries.extend(
+                (key, suggestion)
+                for key in suggestion_keys(value)
+            )
+
+        entries.sort(key=lambda entry: entry[0])
+
+        index.entries = (
+            [key for key, suggestion in entries],
+            [suggestion for key, suggestion in entries],
+        )
+
+        return index
+
+    # ---------------------------------
+    # Incremental updates
+    # ---------------------------------
+
+    def forget_hot(self, keys):
+
+        for key in keys:
+            for length in range(1, HOT_PREFIX_LENGTH + 1):
+                self.hot.pop(key[:length], None)
+
+    def add_product(self, product_id, title, slug):
+
+        previous = self.remove_product(product_id)
+
+        suggestion = Suggestion(
+            title,
+            "product",
+            slug,
+            previous.popularity if previous else 0
+        )
+
+        self.products[product_id] = suggestion
+
+        keys, suggestions = map(list, self.entries)
+
+        for key in suggestion_keys(title):
+
+            position = bisect_left(keys, key)
+
+            keys.insert(position, key)
+
+            suggestions.insert(position, suggestion)
+
+        self.entries = (keys, suggestions)
+
+        self.forget_hot(suggestion_keys(title))
+
+    def remove_product(self, product_id):
+
+        suggestion = self.products.pop(product_id, None)
+
+        if suggestion is None:
+            return None
+
+        keys, suggestions = map(list, self.entries)
+
+        for key in suggestion_keys(suggestion.text):
+
+            position = bisect_left(keys, key)
+
+            while position < len(keys) and keys[position] == key:
+
+                if suggestions[position] is suggestion:
+
+                    del keys[position]
+
+                    del suggestions[position]
+
+                    break
+
+                position += 1
+
+        self.entries = (keys, suggestions)
+
+        self.forget_hot(suggestion_keys(suggestion.text))
+
+        return suggestion
+
+    # ---------------------------------
+    # Query
+    # ---------------------------------
+
+    def complete(self, prefix, limit):
+
+        keys, suggestions = self.entries
+
+        start = bisect_left(keys, prefix)
+
+        end = bisect_left(keys, prefix + END_OF_RANGE, lo=start)
+
+        unique = {}
+
+        for suggestion in suggestions[start:end]:
+            unique.setdefault(
+                (suggestion.kind, suggestion.text),
+                suggestion
+            )
+
+        return heapq.nlargest(
+            limit,
+            unique.values(),
+            key=lambda suggestion: suggestion.popularity
+        )
+
+    def suggest(self, query, limit=8):
+
+        prefix = " ".join(normalize(query).split())
+
+        if not prefix:
+            return []
+
+        if len(prefix) > HOT_PREFIX_LENGTH:
+            return self.complete(prefix, limit)
+
+        if prefix not in self.hot:
+            self.hot[prefix] = self.complete(prefix, HOT_PREFIX_RESULTS)
+
+        return self.hot[prefix][:limit]
+
+
+suggest_index = ProcessSnapshot(
+    "search:suggest",
+    SuggestIndex.build
+)
@@ -0,0 +1,9 @@
+from tasks.base import task
+
+from .backends import get_search_backend
+
+
+@task()
+def index_products(product_ids):
+
+    get_search_backend().index_products(set(product_ids))
@@ -0,0 +1,301 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from shop.models import Feature, FeatureValue, Product, ProductStatus
+
+from .backends import DatabaseBM25Backend
+from .models import SearchDocument, SearchPosting
+from .normalizer import normalize, tokenize
+from .suggest import SuggestIndex, suggest_index
+
+
+class SearchFixtureMixin:
+
+    """
+    Published products indexed directly (the index task runs in the worker).
+    """
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.backend = DatabaseBM25Backend()
+
+    def create_product(self, title, description="توضیحات", **kwargs):
+
+        number = Product.objects.count() + 1
+
+        product = Product.objects.create(
+            title=title,
+            slug=f"product-{number}",
+            description=description,
+            status=ProductStatus.PUBLISHED,
+            **kwargs
+        )
+
+        self.backend.index_products([product.pk])
+
+        return product
+
+    def search(self, query):
+
+        return [
+            product_id
+            for product_id, score in self.backend.search(query)
+        ]
+
+
+class NormalizerTests(TestCase):
+
+    def test_arabic_letters_and_digits(self):
+
+        self.assertEqual(normalize("كيف"), "کیف")
+
+        self.assertEqual(normalize("سايز ۴۲"), "سایز 42")
+
+        self.assertEqual(normalize("آبي"), "ابی")
+
+    def test_zwnj_and_diacritics(self):
+
+        self.assertEqual(normalize("کفش‌ها"), "کفشها")
+
+        self.assertEqual(normalize("مـانـتو"), "مانتو")
+
+        self.assertEqual(normalize("مُد"), "مد")
+
+    def test_tokenize_drops_stop_words_and_single_letters(self):
+
+        self.assertEqual(
+            tokenize("مانتو و شلوار از پارچه x"),
+            ["مانتو", "شلوار", "پارچه"]
+        )
+
+
+class InvertedIndexTests(SearchFixtureMixin, TestCase):
+
+    def postings(self, product):
+
+        return dict(
+            SearchPosting.objects.filter(
+                document_id=product.pk
+            ).values_list("term", "frequency")
+        )
+
+    def test_field_weights(self):
+
+        product = self.create_product(
+            "مانتو",
+            brief_description="مانتو بلند",
+            description="مانتو",
+        )
+
+        # عنوان 3 + توضیح کوتاه 2 + توضیحات 1
+        self.assertEqual(self.postings(product), {"مانتو": 6.0, "بلند": 2.0})
+
+        self.assertEqual(SearchDocument.objects.get(pk=product.pk).length, 8.0)
+
+    def test_feature_values_are_indexed(self):
+
+        product = self.create_product("مانتو")
+
+        FeatureValue.objects.create(
+            product=product,
+            feature=Feature.objects.create(title="جنس"),
+            value="کتان"
+        )
+
+        self.backend.index_products([product.pk])
+
+        self.assertEqual(self.search("کتان"), [product.pk])
+
+    def test_reindex_replaces_postings(self):
+
+        product = self.create_product("مانتو مشکی")
+
+        Product.objects.filter(pk=product.pk).update(title="مانتو سفید")
+
+        self.backend.index_products([product.pk])
+
+        self.assertEqual(set(self.postings(product)), {"مانتو", "سفید", "توضیحات"})
+
+    def test_unpublished_and_removed_products(self):
+
+        first = self.create_product("مانتو مشکی")
+
+        second = self.create_product("مانتو سفید")
+
+        Product.objects.filter(pk=first.pk).update(status=ProductStatus.DRAFT)
+
+        self.backend.index_products([first.pk])
+
+        self.backend.remove_products([second.pk])
+
+        self.assertEqual(self.search("مانتو"), [])
+
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_rebuild(self):
+
+        product = self.create_product("مانتو مشکی")
+
+        SearchDocument.objects.all().delete()
+
+        self.assertEqual(self.backend.rebuild(), 1)
+
+        self.assertEqual(self.search("مانتو"), [product.pk])
+
+    def test_spelling_variants_match(self):
+
+        product = self.create_product("کیف چرمی")
+
+        self.assertEqual(self.search("كيف"), [product.pk])
+
+
+class BM25QueryTests(SearchFixtureMixin, TestCase):
+
+    def test_title_ranks_above_description(self):
+
+        described = self.create_product("پیراهن", description="مانتو بلند")
+
+        titled = self.create_product("مانتو مشکی")
+
+        self.assertEqual(self.search("مانتو"), [titled.pk, described.pk])
+
+    def test_every_term_must_match(self):
+
+        both = self.create_product("مانتو مشکی")
+
+        self.create_product("مانتو سفید")
+
+        self.assertEqual(self.search("مشکی مانتو"), [both.pk])
+
+    def test_last_term_matches_as_prefix(self):
+
+        product = self.create_product("مانتو مشکی")
+
+        self.assertEqual(self.search("مانتو مش"), [product.pk])
+
+        self.assertEqual(self.search("مان"), [product.pk])
+
+    def test_short_partial_is_not_a_prefix(self):
+
+        product = self.create_product("مانتو مشکی")
+
+        # یک حرف فقط واژه کامل است، نه پیشوند همه واژه‌های «م...»
+        self.assertEqual(self.search("م"), [])
+
+        # و در کنار واژه‌های دیگر نادیده گرفته می‌شود
+        self.assertEqual(self.search("مانتو م"), [product.pk])
+
+    def test_results_are_not_capped(self):
+
+        for number in range(25):
+            self.create_product(f"مانتو {number}")
+
+        response = self.client.get(
+            reverse("shop:product-list"),
+            {"search": "مانتو", "page_size": 10}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(response.data["count"], 25)
+
+    def test_product_list_orders_by_score(self):
+
+        described = self.create_product("پیراهن", description="مانتو بلند")
+
+        titled = self.create_product("مانتو مشکی")
+
+        response = self.client.get(
+            reverse("shop:product-list"),
+            {"search": "مانتو"}
+        )
+
+        self.assertEqual(
+            [product["id"] for product in response.data["results"]],
+            [titled.pk, described.pk]
+        )
+
+
+class SuggestTests(TestCase):
+
+    def setUp(self):
+
+        super().setUp()
+
+        cache.clear()
+
+        suggest_index.invalidate()
+
+        for number, title in enumerate(["مانتو مشکی", "مانتو سفید", "شلوار مشکی"], 1):
+            Product.objects.create(
+                title=title,
+                slug=f"product-{number}",
+                description="توضیحات",
+                status=ProductStatus.PUBLISHED,
+            )
+
+    def suggest(self, query, **params):
+
+        response = self.client.get(
+            reverse("shop:product-suggest"),
+            {"q": query, **params}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        return [
+            suggestion["text"]
+            for suggestion in response.data["results"]
+        ]
+
+    def test_prefix_of_any_word(self):
+
+        self.assertEqual(sorted(self.suggest("مان")), ["مانتو سفید", "مانتو مشکی"])
+
+        self.assertEqual(sorted(self.suggest("مشک")), ["شلوار مشکی", "مانتو مشکی"])
+
+        self.assertEqual(self.suggest("مانتو س"), ["مانتو سفید"])
+
+    def test_query_is_normalized(self):
+
+        self.assertEqual(self.suggest("مشكي"), self.suggest("مشکی"))
+
+        self.assertEqual(self.suggest("   "), [])
+
+    def test_limit(self):
+
+        self.assertEqual(len(self.suggest("م", limit=1)), 1)
+
+        self.assertEqual(len(self.suggest("م", limit="x")), 3)
+
+    def test_published_products_only(self):
+
+        self.assertEqual(len(self.suggest("مان")), 2)
+
+        product = Product.objects.get(title="مانتو سفید")
+
+        product.status = ProductStatus.DRAFT
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        self.assertEqual(self.suggest("مان"), ["مانتو مشکی"])
+
+    def test_incremental_updates_match_a_rebuild(self):
+
+        index = SuggestIndex.build()
+
+        index.suggest("م")
+
+        index.add_product(99, "مانتو کتان", "product-99")
+
+        index.remove_product(Product.objects.get(title="شلوار مشکی").pk)
+
+        # نتیجه کش‌شده پیشوند کوتاه هم بروز می‌شود
+        self.assertEqual(
+            sorted(suggestion.text for suggestion in index.suggest("م")),
+            ["مانتو سفید", "مانتو مشکی", "مانتو کتان"]
+        )
@@ -195,6 +195,16 @@ class ProductAdmin(admin.ModelAdmin):
     )
 
 
+    def get_queryset(self, request):
+
+        # thumbnail در لیست؛ یک کوئری برای تصاویر کل صفحه
+        return super().get_queryset(
+            request
+        ).prefetch_related(
+            "images"
+        )
+
+
 
     def thumbnail(self,obj):
 
@@ -281,6 +291,8 @@ class ProductVariantAdmin(admin.ModelAdmin):
 
         "stock",
 
+        "reserved",
+
         "is_active",
 
     )
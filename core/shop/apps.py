@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        # signal receivers of the in-memory indexes and the response cache
+        from . import cache, categories, facets, filters  # noqa: F401
@@ -0,0 +1,379 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from renditions.pipeline import renditions_updated
+from review.models import Review
+
+from .models import (
+    Feature,
+    Product,
+    ProductCategory,
+    ProductColor,
+    ProductImages,
+    ProductSize,
+    ProductVariant,
+    FeatureValue,
+    variants_changed,
+)
+
+
+# ==========================================
+# Backends
+# ==========================================
+
+class BaseResponseCache:
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, data):
+        raise NotImplementedError
+
+    def clear(self):
+        pass
+
+
+class LRUResponseCache(BaseResponseCache):
+
+    """
+    Per-process LRU; for a single node. Stale entries are never hit because
+    the versions are part of the key, they just age out.
+    """
+
+    def __init__(self, max_entries=2048):
+
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        with self._lock:
+
+            data = self._entries.get(key)
+
+            if data is not None:
+                self._entries.move_to_end(key)
+
+            return data
+
+    def set(self, key, data):
+
+        with self._lock:
+
+            self._entries[key] = data
+
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedResponseCache(BaseResponseCache):
+
+    """
+    Stores responses in a Django cache (redis / memcached), shared by all
+    gunicorn workers.
+    """
+
+    def __init__(self, alias="default", timeout=60 * 60):
+
+        self.alias = alias
+
+        self.timeout = timeout
+
+    @property
+    def backend(self):
+
+        return caches[self.alias]
+
+    def get(self, key):
+
+        return self.backend.get(key)
+
+    def set(self, key, data):
+
+        self.backend.set(key, data, timeout=self.timeout)
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+
+    config = getattr(settings, "SHOP_RESPONSE_CACHE", {})
+
+    backend = import_string(
+        config.get("BACKEND", "shop.cache.LRUResponseCache")
+    )
+
+    return backend(**config.get("OPTIONS", {}))
+
+
+# ==========================================
+# Version counters
+# ==========================================
+#
+# Versions are tokens in the shared Django cache. A bump stores a fresh
+# token instead of incrementing, so two concurrent bumps can never end on
+# a value a response was already cached under.
+
+CATALOG_VERSION_KEY = "shop:version:catalog"
+
+
+def product_version_key(product_id):
+
+    return f"shop:version:product:{product_id}"
+
+
+def review_version_key(product_id):
+
+    return f"shop:version:reviews:{product_id}"
+
+
+def get_versions(*keys):
+
+    versions = cache.get_many(keys)
+
+    for key in keys:
+
+        if key not in versions:
+
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*keys):
+
+    cache.set_many(
+        {key: uuid.uuid4().hex for key in keys},
+        timeout=None
+    )
+
+
+def bump_products(product_ids):
+
+    keys = [
+        product_version_key(product_id)
+        for product_id in set(product_ids)
+    ]
+
+    transaction.on_commit(
+        lambda: bump_versions(CATALOG_VERSION_KEY, *keys)
+    )
+
+
+def bump_catalog(**kwargs):
+
+    transaction.on_commit(
+        lambda: bump_versions(CATALOG_VERSION_KEY)
+    )
+
+
+# ==========================================
+# Keys
+# ==========================================
+
+def response_cache_key(request, view, *versions):
+    """
+    The same page requested with reordered or repeated ``color`` / ``size``
+    params maps to one key.
+    """
+
+    params = sorted(
+        (name, sorted(set(values)))
+        for name, values in request.GET.lists()
+        if any(values)
+    )
+
+    raw = repr((
+        request.scheme,
+        request.get_host(),
+        request.path,
+        params,
+        versions,
+    ))
+
+    digest = hashlib.md5(raw.encode()).hexdigest()
+
+    return f"shop:response:{view}:{digest}"
+
+
+# ==========================================
+# Views
+# ==========================================
+
+class ResponseCacheMixin:
+
+    """
+    Anonymous responses are cached under keys that carry the version
+    counters they depend on; a write bumps the counter instead of
+    deleting entries.
+    """
+
+    def cached_data(self, request, view, *version_keys):
+
+        if request.user.is_authenticated:
+            return None, None
+
+        key = response_cache_key(
+            request,
+            view,
+            *get_versions(*version_keys)
+        )
+
+        return key, get_response_cache().get(key)
+
+    def cache_data(self, key, data):
+
+        if key is not None:
+            get_response_cache().set(key, data)
+
+
+# ==========================================
+# Signals
+# ==========================================
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_version(sender, instance, **kwargs):
+
+    bump_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def bump_variant_product_version(sender, instance, **kwargs):
+
+    # تنوع جابجا شده در هر دو محصول دیده می‌شد
+    bump_products(instance.product_ids)
+
+
+@receiver(post_save, sender=ProductImages)
+@receiver(post_delete, sender=ProductImages)
+@receiver(post_save, sender=FeatureValue)
+@receiver(post_delete, sender=FeatureValue)
+def bump_related_product_version(sender, instance, **kwargs):
+
+    bump_products([instance.product_id])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_review_version(sender, instance, **kwargs):
+
+    key = review_version_key(instance.product_id)
+
+    bump_products([instance.product_id])
+
+    transaction.on_commit(
+        lambda: bump_versions(key)
+    )
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def bump_product_categories_version(sender, instance, action, reverse, pk_set, **kwargs):
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        bump_products([instance.pk])
+
+    elif pk_set:
+        bump_products(pk_set)
+
+    else:
+        bump_catalog()
+
+
+@receiver(variants_changed)
+def bump_changed_products_version(sender, product_ids, **kwargs):
+
+    bump_products(product_ids)
+
+
+@receiver(renditions_updated, sender=ProductImages)
+def bump_rendered_images_version(sender, instances, **kwargs):
+
+    bump_products(
+        instance.product_id
+        for instance in instances
+    )
+
+
+@receiver(renditions_updated, sender=ProductCategory)
+def bump_rendered_categories_version(sender, instances, **kwargs):
+
+    bump_catalog()
+
+
+for model in (ProductCategory, ProductColor, ProductSize):
+    post_save.connect(bump_catalog, sender=model, dispatch_uid=f"cache-{model.__name__}-save")
+    post_delete.connect(bump_catalog, sender=model, dispatch_uid=f"cache-{model.__name__}-delete")
+
+
+# عنوان دسته، رنگ، سایز و ویژگی در بدنه جزئیات محصولات هم آمده است
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(pre_delete, sender=ProductCategory)
+def bump_category_products_version(sender, instance, **kwargs):
+
+    # مسیر دسته‌ها در breadcrumbs محصولات همه زیرشاخه‌ها هست
+    if instance.path:
+        bump_products(
+            Product.objects.filter(
+                categories__in=instance.descendants()
+            ).values_list("pk", flat=True)
+        )
+
+
+@receiver(post_save, sender=ProductColor)
+def bump_color_products_version(sender, instance, created, **kwargs):
+
+    if not created:
+        bump_products(
+            ProductVariant.objects.filter(
+                color=instance
+            ).values_list("product_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=ProductSize)
+def bump_size_products_version(sender, instance, created, **kwargs):
+
+    if not created:
+        bump_products(
+            ProductVariant.objects.filter(
+                size=instance
+            ).values_list("product_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Feature)
+def bump_feature_products_version(sender, instance, created, **kwargs):
+
+    if not created:
+        bump_products(
+            FeatureValue.objects.filter(
+                feature=instance
+            ).values_list("product_id", flat=True)
+        )
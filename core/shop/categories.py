@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ProductCategory
+from .snapshot import ProcessSnapshot
+
+
+# ==========================================
+# Category Tree
+# ==========================================
+
+class CategoryNode:
+
+    __slots__ = ("id", "title", "slug", "parent_id", "path", "depth", "children")
+
+    def __init__(self, id, title, slug, parent_id, path, depth):
+
+        self.id = id
+
+        self.title = title
+
+        self.slug = slug
+
+        self.parent_id = parent_id
+
+        self.path = path
+
+        self.depth = depth
+
+        self.children = []
+
+
+class CategoryTree:
+
+    """
+    The whole category hierarchy, loaded with one query and kept per process.
+    """
+
+    def __init__(self, nodes):
+
+        self.nodes = {node.id: node for node in nodes}
+
+        self.by_slug = {node.slug: node for node in nodes}
+
+        self.roots = []
+
+        for node in nodes:
+
+            parent = self.nodes.get(node.parent_id)
+
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+    @classmethod
+    def build(cls):
+
+        return cls([
+            CategoryNode(*row)
+            for row in ProductCategory.objects.order_by(
+                "title"
+            ).values_list(
+                "id",
+                "title",
+                "slug",
+                "parent_id",
+                "path",
+                "depth",
+            )
+        ])
+
+    def descendant_ids(self, category_id, include_self=True):
+
+        node = self.nodes.get(category_id)
+
+        if node is None:
+            return []
+
+        ids = [node.id] if include_self else []
+
+        stack = list(node.children)
+
+        while stack:
+
+            child = stack.pop()
+
+            ids.append(child.id)
+
+            stack.extend(child.children)
+
+        return ids
+
+    def breadcrumbs(self, category_id):
+
+        node = self.nodes.get(category_id)
+
+        if node is None:
+            return []
+
+        return [
+            self.nodes[int(ancestor_id)]
+            for ancestor_id in node.path.split("/")
+            if ancestor_id and int(ancestor_id) in self.nodes
+        ]
+
+
+category_tree = ProcessSnapshot(
+    "shop:categories",
+    CategoryTree.build
+)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def rebuild_category_tree(sender, **kwargs):
+
+    transaction.on_commit(
+        category_tree.invalidate
+    )
@@ -0,0 +1,457 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    Product,
+    ProductCategory,
+    ProductColor,
+    ProductSize,
+    ProductStatus,
+    ProductVariant,
+    variants_changed,
+)
+from .categories import category_tree
+from .snapshot import ProcessSnapshot
+
+
+# ==========================================
+# Bitmaps
+# ==========================================
+#
+# Product sets are plain Python ints with bit ``n`` set for product id ``n``;
+# intersections and counts are ``&`` and ``int.bit_count``.
+
+def to_bitmap(ids):
+
+    bitmap = 0
+
+    for product_id in ids:
+        bitmap |= 1 << product_id
+
+    return bitmap
+
+
+def bitmap_ids(bitmap):
+
+    bits = bin(bitmap)[:1:-1]
+
+    return [
+        index
+        for index, bit in enumerate(bits)
+        if bit == "1"
+    ]
+
+
+# ==========================================
+# Facet Index
+# ==========================================
+
+class FacetIndex:
+
+    def __init__(self):
+
+        self.published = 0
+
+        # category id -> products directly assigned to the category
+        self.categories = {}
+
+        # category id -> products of the category and all its descendants
+        self.category_subtrees = {}
+
+        self.category_parents = {}
+
+        # color / size id -> products with an active, in-stock variant of it
+        self.colors = {}
+
+        self.sizes = {}
+
+        self.color_codes = {}
+
+        self.size_titles = {}
+
+        # product id -> (category ids, color ids, size ids)
+        self.memberships = {}
+
+    # ---------------------------------
+    # Build
+    # ---------------------------------
+
+    @classmethod
+    def build(cls):
+
+        index = cls()
+
+        index.category_parents = {
+            node.id: node.parent_id
+            for node in category_tree.get().nodes.values()
+        }
+
+        index.color_codes = {
+            code: color_id
+            for color_id, code in ProductColor.objects.values_list(
+                "id",
+                "code"
+            )
+        }
+
+        index.size_titles = {
+            title: size_id
+            for size_id, title in ProductSize.objects.values_list(
+                "id",
+                "title"
+            )
+        }
+
+        index.load_products(
+            Product.objects.all()
+        )
+
+        return index
+
+    def load_products(self, products):
+        """
+        (Re)index the membership of the given products with three queries.
+        """
+
+        product_ids = set(
+            products.values_list("pk", flat=True)
+        )
+
+        published = set(
+            Product.objects.filter(
+                pk__in=product_ids,
+                status=ProductStatus.PUBLISHED
+            ).values_list("pk", flat=True)
+        )
+
+        memberships = {
+            product_id: (set(), set(), set())
+            for product_id in product_ids
+        }
+
+        category_links = Product.categories.through.objects.filter(
+            product_id__in=product_ids
+        ).values_list(
+            "product_id",
+            "productcategory_id"
+        )
+
+        for product_id, category_id in category_links:
+            memberships[product_id][0].add(category_id)
+
+        variants = ProductVariant.objects.filter(
+            product_id__in=product_ids,
+            is_active=True,
+            stock__gt=0
+        ).values_list(
+            "product_id",
+            "color_id",
+            "size_id"
+        )
+
+        for product_id, color_id, size_id in variants:
+            memberships[product_id][1].add(color_id)
+            memberships[product_id][2].add(size_id)
+
+        for product_id in product_ids:
+
+            self.remove_product(product_id)
+
+            if product_id in published:
+                self.add_product(
+                    product_id,
+                    *memberships[product_id]
+                )
+
+    # ---------------------------------
+    # Incremental updates
+    # ---------------------------------
+
+    def reload_products(self, product_ids):
+        """
+        Re-read the given products; deleted ones drop out. Published to the
+        other workers through the snapshot's change log.
+        """
+
+        for product_id in product_ids:
+            self.remove_product(product_id)
+
+        self.load_products(
+            Product.objects.filter(pk__in=product_ids)
+        )
+
+    def category_ancestors(self, category_id):
+
+        seen = set()
+
+        while category_id is not None and category_id not in seen:
+
+            seen.add(category_id)
+
+            yield category_id
+
+            category_id = self.category_parents.get(category_id)
+
+    def add_product(self, product_id, category_ids, color_ids, size_ids):
+
+        bit = 1 << product_id
+
+        self.published |= bit
+
+        for category_id in category_ids:
+
+            self.categories[category_id] = (
+                self.categories.get(category_id, 0) | bit
+            )
+
+            for ancestor_id in self.category_ancestors(category_id):
+
+                self.category_subtrees[ancestor_id] = (
+                    self.category_subtrees.get(ancestor_id, 0) | bit
+                )
+
+        for color_id in color_ids:
+            self.colors[color_id] = self.colors.get(color_id, 0) | bit
+
+        for size_id in size_ids:
+            self.sizes[size_id] = self.sizes.get(size_id, 0) | bit
+
+        self.memberships[product_id] = (
+            frozenset(category_ids),
+            frozenset(color_ids),
+            frozenset(size_ids),
+        )
+
+    def remove_product(self, product_id):
+
+        membership = self.memberships.pop(product_id, None)
+
+        if membership is None:
+            return
+
+        mask = ~(1 << product_id)
+
+        self.published &= mask
+
+        category_ids, color_ids, size_ids = membership
+
+        for category_id in category_ids:
+
+            self.categories[category_id] &= mask
+
+            for ancestor_id in self.category_ancestors(category_id):
+                self.category_subtrees[ancestor_id] &= mask
+
+        for color_id in color_ids:
+            self.colors[color_id] &= mask
+
+        for size_id in size_ids:
+            self.sizes[size_id] &= mask
+
+    # ---------------------------------
+    # Query
+    # ---------------------------------
+
+    def union(self, bitmaps, keys):
+
+        result = 0
+
+        for key in keys:
+            result |= bitmaps.get(key, 0)
+
+        return result
+
+    def query(self, base_ids=None, category_ids=None, color_codes=None, size_titles=None):
+        """
+        Intersect the selected facet values and count every facet value
+        against the other active selections (a selected color does not
+        zero out the counts of the other colors).
+        """
+
+        base = self.published
+
+        if base_ids is not None:
+            base &= to_bitmap(base_ids)
+
+        category_match = color_match = size_match = base
+
+        if category_ids:
+            category_match = self.union(
+                self.category_subtrees,
+                category_ids
+            )
+
+        if color_codes:
+            color_match = self.union(
+                self.colors,
+                [self.color_codes.get(code) for code in color_codes]
+            )
+
+        if size_titles:
+            size_match = self.union(
+                self.sizes,
+                [self.size_titles.get(title) for title in size_titles]
+            )
+
+        matches = base & category_match & color_match & size_match
+
+        without_category = base & color_match & size_match
+        without_color = base & category_match & size_match
+        without_size = base & category_match & color_match
+
+        return FacetResult(
+            matches=matches,
+            categories={
+                category_id: (bitmap & without_category).bit_count()
+                for category_id, bitmap in self.category_subtrees.items()
+            },
+            colors={
+                color_id: (bitmap & without_color).bit_count()
+                for color_id, bitmap in self.colors.items()
+            },
+            sizes={
+                size_id: (bitmap & without_size).bit_count()
+                for size_id, bitmap in self.sizes.items()
+            },
+        )
+
+
+class FacetResult:
+
+    def __init__(self, matches, categories, colors, sizes):
+
+        self.matches = matches
+
+        self.categories = categories
+
+        self.colors = colors
+
+        self.sizes = sizes
+
+    @property
+    def count(self):
+
+        return self.matches.bit_count()
+
+    @property
+    def product_ids(self):
+
+        return bitmap_ids(self.matches)
+
+
+facet_index = ProcessSnapshot(
+    "shop:facets",
+    FacetIndex.build
+)
+
+
+def filter_products(products, category_ids=None, color_codes=None, size_titles=None):
+    """
+    The same selection as a facet query, as subqueries of ``products``:
+    for results too large to bind as ``pk__in`` (SQLite caps the
+    variables of one statement).
+    """
+
+    if category_ids:
+
+        tree = category_tree.get()
+
+        products = products.filter(
+            Exists(
+                Product.categories.through.objects.filter(
+                    product_id=OuterRef("pk"),
+                    productcategory_id__in=[
+                        descendant_id
+                        for category_id in category_ids
+                        for descendant_id in tree.descendant_ids(category_id)
+                    ]
+                )
+            )
+        )
+
+    variants = ProductVariant.objects.filter(
+        product_id=OuterRef("pk"),
+        is_active=True,
+        stock__gt=0
+    )
+
+    if color_codes:
+        products = products.filter(
+            Exists(variants.filter(color__code__in=color_codes))
+        )
+
+    if size_titles:
+        products = products.filter(
+            Exists(variants.filter(size__title__in=size_titles))
+        )
+
+    return products
+
+
+# ==========================================
+# Signals
+# ==========================================
+
+def reindex_products(product_ids):
+
+    product_ids = set(product_ids)
+
+    if not product_ids:
+        return
+
+    # بقیه workerها همین محصولات را از لاگ تغییرات دوباره می‌خوانند، نه کل ایندکس
+    transaction.on_commit(
+        lambda: facet_index.publish("reload_products", sorted(product_ids))
+    )
+
+
+def reindex_all(**kwargs):
+
+    transaction.on_commit(
+        facet_index.invalidate
+    )
+
+
+@receiver(post_save, sender=Product)
+def reindex_product_on_save(sender, instance, **kwargs):
+
+    reindex_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_on_delete(sender, instance, **kwargs):
+
+    product_id = instance.pk
+
+    transaction.on_commit(
+        lambda: facet_index.publish("remove_product", product_id)
+    )
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def reindex_product_categories(sender, instance, action, reverse, pk_set, **kwargs):
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        reindex_products([instance.pk])
+
+    elif pk_set:
+        reindex_products(pk_set)
+
+    else:
+        reindex_all()
+
+
+@receiver(variants_changed)
+def reindex_changed_products(sender, product_ids, **kwargs):
+
+    reindex_products(product_ids)
+
+
+for model in (ProductCategory, ProductColor, ProductSize):
+    post_save.connect(reindex_all, sender=model, dispatch_uid=f"facets-{model.__name__}-save")
+    post_delete.connect(reindex_all, sender=model, dispatch_uid=f"facets-{model.__name__}-delete")
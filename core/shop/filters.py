@@ -0,0 +1,145 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    ProductCategory,
+    ProductColor,
+    ProductSize,
+)
+from .snapshot import ProcessSnapshot
+
+
+# ==========================================
+# Filter metadata
+# ==========================================
+
+class FilterMetadataProvider:
+
+    """
+    Categories, sizes and colors of the ``filters`` block.
+
+    Read from process memory, then from the shared cache, and only then
+    from the database; counts and color availability are overlaid per
+    request from the facet index, which follows variant stock changes.
+    """
+
+    timeout = 60 * 60 * 24
+
+    def __init__(self):
+
+        self.snapshot = ProcessSnapshot(
+            "shop:filters",
+            self.load
+        )
+
+    def shared_key(self):
+
+        return f"shop:filters:{self.snapshot.current_version()}"
+
+    def load(self):
+
+        key = self.shared_key()
+
+        metadata = cache.get(key)
+
+        if metadata is None:
+
+            metadata = self.build()
+
+            cache.set(key, metadata, timeout=self.timeout)
+
+        return metadata
+
+    def build(self):
+
+        return {
+
+            "categories": list(
+                ProductCategory.objects.values(
+                    "id",
+                    "title",
+                    "slug"
+                )
+            ),
+
+            "sizes": list(
+                ProductSize.objects.values(
+                    "id",
+                    "title"
+                )
+            ),
+
+            "colors": list(
+                ProductColor.objects.values(
+                    "id",
+                    "title",
+                    "code"
+                )
+            ),
+
+        }
+
+    def get(self):
+
+        return self.snapshot.get()
+
+    def invalidate(self):
+
+        self.snapshot.invalidate()
+
+    def block(self, facets):
+        """
+        The ``filters`` block with the counts of a facet query; colors
+        without an available product are left out.
+        """
+
+        metadata = self.get()
+
+        return {
+
+            "categories": [
+                {
+                    **category,
+                    "count": facets.categories.get(category["id"], 0),
+                }
+                for category in metadata["categories"]
+            ],
+
+            "sizes": [
+                {
+                    **size,
+                    "count": facets.sizes.get(size["id"], 0),
+                }
+                for size in metadata["sizes"]
+            ],
+
+            "colors": [
+                {
+                    "color__id": color["id"],
+                    "color__title": color["title"],
+                    "color__code": color["code"],
+                    "count": facets.colors[color["id"]],
+                }
+                for color in metadata["colors"]
+                if facets.colors.get(color["id"])
+            ],
+
+        }
+
+
+filter_metadata = FilterMetadataProvider()
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+@receiver(post_save, sender=ProductColor)
+@receiver(post_delete, sender=ProductColor)
+def invalidate_filter_metadata(sender, **kwargs):
+
+    transaction.on_commit(
+        filter_metadata.invalidate
+    )
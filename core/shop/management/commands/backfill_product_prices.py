@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import Product
+
+
+class Command(BaseCommand):
+
+    help = "Recompute stored best-variant price columns on products"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products refreshed per query",
+        )
+
+    def handle(self, *args, **options):
+
+        batch_size = options["batch_size"]
+
+        product_ids = list(
+            Product.objects.order_by(
+                "pk"
+            ).values_list(
+                "pk",
+                flat=True
+            )
+        )
+
+        updated = 0
+
+        for start in range(0, len(product_ids), batch_size):
+
+            updated += Product.objects.filter(
+                pk__in=product_ids[start:start + batch_size]
+            ).refresh_best_variants()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed price columns of {updated} products"
+            )
+        )
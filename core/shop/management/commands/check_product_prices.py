@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Product
+
+
+class Command(BaseCommand):
+
+    help = "Report products whose stored best-variant columns drifted from their variants"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Refresh drifted products instead of failing",
+        )
+
+    def handle(self, *args, **options):
+
+        drifted = Product.objects.best_variant_drift()
+
+        if not drifted:
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "All product price columns are consistent"
+                )
+            )
+
+            return
+
+        self.stdout.write(
+            f"Drifted products: {', '.join(map(str, drifted))}"
+        )
+
+        if not options["fix"]:
+            raise CommandError(
+                f"{len(drifted)} products have stale price columns"
+            )
+
+        Product.objects.filter(
+            pk__in=drifted
+        ).refresh_best_variants()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed {len(drifted)} products"
+            )
+        )
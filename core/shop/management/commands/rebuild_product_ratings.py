@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.cache import CATALOG_VERSION_KEY, bump_versions, product_version_key
+from shop.models import Product
+
+
+class Command(BaseCommand):
+
+    help = "Recompute stored rating average, count and histogram of products from their reviews"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report drifted products and fail if there are any",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products checked per query",
+        )
+
+    def handle(self, *args, **options):
+
+        batch_size = options["batch_size"]
+
+        product_ids = list(
+            Product.objects.order_by(
+                "pk"
+            ).values_list(
+                "pk",
+                flat=True
+            )
+        )
+
+        drifted = []
+
+        for start in range(0, len(product_ids), batch_size):
+
+            drifted += Product.objects.filter(
+                pk__in=product_ids[start:start + batch_size]
+            ).rating_drift()
+
+        if not drifted:
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "All product rating columns are consistent"
+                )
+            )
+
+            return
+
+        if options["check"]:
+
+            raise CommandError(
+                f"{len(drifted)} products have drifted rating columns: "
+                + ", ".join(map(str, drifted[:20]))
+            )
+
+        for start in range(0, len(drifted), batch_size):
+
+            Product.objects.filter(
+                pk__in=drifted[start:start + batch_size]
+            ).refresh_ratings()
+
+        bump_versions(
+            CATALOG_VERSION_KEY,
+            *map(product_version_key, drifted)
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt rating columns of {len(drifted)} products"
+            )
+        )
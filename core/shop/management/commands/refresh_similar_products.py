@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from shop.cache import CATALOG_VERSION_KEY, bump_versions
+from shop.similarity import (
+    SimilarityData,
+    refresh_similar_products,
+    stale_product_ids,
+)
+
+
+class Command(BaseCommand):
+
+    help = "Recompute the precomputed similar products of changed products (or all with --all)"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Refresh every published product instead of only the stale ones",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products written per transaction",
+        )
+
+    def handle(self, *args, **options):
+
+        batch_size = options["batch_size"]
+
+        data = SimilarityData.build()
+
+        if options["all"]:
+            product_ids = sorted(data.prices)
+        else:
+            product_ids = sorted(stale_product_ids(data))
+
+        links = 0
+
+        for start in range(0, len(product_ids), batch_size):
+
+            links += refresh_similar_products(
+                product_ids[start:start + batch_size],
+                data
+            )
+
+        if product_ids:
+            bump_versions(CATALOG_VERSION_KEY)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed similar products of {len(product_ids)} products ({links} links)"
+            )
+        )
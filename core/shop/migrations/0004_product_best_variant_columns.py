@@ -0,0 +1,70 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+def backfill_best_variants(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    ProductVariant = apps.get_model('shop', 'ProductVariant')
+
+    best = {}
+    variants = ProductVariant.objects.filter(
+        is_active=True, stock__gt=0
+    ).order_by('product_id', 'id').values_list('product_id', 'price', 'discount_percent')
+
+    for product_id, price, discount in variants:
+        final_price = (price * (100 - discount)) // 100
+        current = best.get(product_id)
+        if current is None or final_price < current[0]:
+            best[product_id] = (final_price, price, discount)
+
+    products = []
+    for product in Product.objects.filter(pk__in=best.keys()).only('pk'):
+        product.best_variant_price, product.best_variant_original_price, product.best_variant_discount = best[product.pk]
+        product.has_stock = True
+        products.append(product)
+
+    Product.objects.bulk_update(
+        products,
+        ['best_variant_price', 'best_variant_original_price', 'best_variant_discount', 'has_stock'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_alter_feature_options_alter_featurevalue_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='best_variant_discount',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='تخفیف بهترین تنوع'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='best_variant_original_price',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='قیمت اصلی بهترین تنوع'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='best_variant_price',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='کمترین قیمت نهایی'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='has_stock',
+            field=models.BooleanField(default=False, editable=False, verbose_name='موجود'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'best_variant_price'], name='shop_produc_status_4116e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'best_variant_discount'], name='shop_produc_status_f4b304_idx'),
+        ),
+        migrations.RunPython(backfill_best_variants, migrations.RunPython.noop),
+    ]
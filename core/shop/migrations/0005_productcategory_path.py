@@ -0,0 +1,48 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    ProductCategory = apps.get_model('shop', 'ProductCategory')
+
+    categories = {category.pk: category for category in ProductCategory.objects.all()}
+
+    def build_path(category, seen=()):
+        if category.path:
+            return category.path
+        parent = categories.get(category.parent_id)
+        if parent is None or parent.pk in seen:
+            category.path = f"{category.pk}/"
+        else:
+            category.path = f"{build_path(parent, seen + (category.pk,))}{category.pk}/"
+        category.depth = category.path.count('/') - 1
+        return category.path
+
+    for category in categories.values():
+        category.path = ''
+    for category in categories.values():
+        build_path(category)
+
+    ProductCategory.objects.bulk_update(categories.values(), ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_best_variant_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcategory',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='عمق'),
+        ),
+        migrations.AddField(
+            model_name='productcategory',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='مسیر'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_productcategory_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='امتیاز شباهت')),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_products', to='shop.product', verbose_name='محصول')),
+                ('similar_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='shop.product', verbose_name='محصول مشابه')),
+            ],
+            options={
+                'verbose_name': 'محصول مشابه',
+                'verbose_name_plural': 'محصولات مشابه',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['product', '-score'], name='shop_simila_product_4e9b78_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'similar_product'), name='unique_similar_product'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:06
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('review', 'Review')
+
+    histograms = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for product_id, rating in Review.objects.values_list('product_id', 'rating'):
+        histograms[product_id][rating - 1] += 1
+
+    products = []
+    for product in Product.objects.filter(pk__in=histograms.keys()).only('pk'):
+        histogram = histograms[product.pk]
+        product.rating_count = sum(histogram)
+        product.rating_avg = sum(
+            rating * votes for rating, votes in enumerate(histogram, start=1)
+        ) / product.rating_count
+        product.rating_1, product.rating_2, product.rating_3, product.rating_4, product.rating_5 = histogram
+        products.append(product)
+
+    Product.objects.bulk_update(
+        products,
+        ['rating_avg', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_similarproduct'),
+        ('review', '0002_alter_review_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۱'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۲'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۳'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۴'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۵'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False, verbose_name='میانگین امتیاز'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیازها'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'rating_avg', 'rating_count'], name='shop_produc_status_50d43f_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
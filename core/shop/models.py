@@ -1,5 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import receiver, Signal
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Cast, Concat, Substr
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from renditions.models import RenditionsMixin
+from tasks.base import enqueue
 
 
 # ===========================
@@ -15,7 +25,7 @@ class ProductStatus(models.IntegerChoices):
 # Category
 # ===========================
 
-class ProductCategory(models.Model):
+class ProductCategory(RenditionsMixin):
     title = models.CharField(
         max_length=200,
         unique=True,
@@ -45,6 +55,22 @@ class ProductCategory(models.Model):
         verbose_name="دسته بندی والد"
     )
 
+    # مسیر شناسه‌ها از ریشه تا خود دسته، مثل "1/5/9/"
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        editable=False,
+        db_index=True,
+        verbose_name="مسیر"
+    )
+
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="عمق"
+    )
+
     created_date = models.DateTimeField(
         auto_now_add=True
     )
@@ -71,6 +97,91 @@ class ProductCategory(models.Model):
     def is_root(self):
         return self.parent_id is None
 
+    @property
+    def ancestor_ids(self):
+        return [
+            int(category_id)
+            for category_id in self.path.split("/")
+            if category_id
+        ]
+
+    def clean(self):
+
+        if self.pk and self.parent_id:
+
+            parent = ProductCategory.objects.get(
+                pk=self.parent_id
+            )
+
+            if self.pk in parent.ancestor_ids:
+                raise ValidationError(
+                    "دسته بندی نمی‌تواند زیرمجموعه خودش باشد."
+                )
+
+    def descendants(self, include_self=True):
+        """
+        همه زیرشاخه‌ها با یک کوئری روی ایندکس مسیر
+        """
+
+        categories = ProductCategory.objects.filter(
+            path__startswith=self.path
+        )
+
+        if not include_self:
+            categories = categories.exclude(pk=self.pk)
+
+        return categories
+
+    def save(self, *args, **kwargs):
+
+        with transaction.atomic():
+            self._save_with_path(*args, **kwargs)
+
+    def _save_with_path(self, *args, **kwargs):
+
+        old_path, old_depth = self.path, self.depth
+
+        super().save(*args, **kwargs)
+
+        parent_path = ""
+
+        if self.parent_id:
+            parent_path = ProductCategory.objects.values_list(
+                "path",
+                flat=True
+            ).get(pk=self.parent_id)
+
+        path = f"{parent_path}{self.pk}/"
+
+        if path == old_path:
+            return
+
+        depth = path.count("/") - 1
+
+        ProductCategory.objects.filter(
+            pk=self.pk
+        ).update(
+            path=path,
+            depth=depth
+        )
+
+        # جابجایی والد: مسیر همه زیرشاخه‌ها با یک کوئری اصلاح می‌شود
+        if old_path:
+
+            ProductCategory.objects.filter(
+                path__startswith=old_path
+            ).exclude(
+                pk=self.pk
+            ).update(
+                path=Concat(
+                    Value(path),
+                    Substr("path", len(old_path) + 1)
+                ),
+                depth=F("depth") + (depth - old_depth)
+            )
+
+        self.path, self.depth = path, depth
+
 
 # ===========================
 # Feature
@@ -106,6 +217,309 @@ class Feature(models.Model):
 # Product
 # ===========================
 
+# فیلدهایی از تنوع که روی بهترین قیمت ذخیره‌شده محصول اثر دارند
+BEST_VARIANT_SOURCE_FIELDS = frozenset({
+    "product",
+    "product_id",
+    "price",
+    "discount_percent",
+    "stock",
+    "is_active",
+})
+
+# بعد از هر بازمحاسبه با شناسه همه محصولاتی که تنوع‌هایشان بررسی شده
+variants_changed = Signal()
+
+# فقط با شناسه محصولاتی که ستون‌های بهترین تنوعشان واقعا عوض شده
+best_variants_refreshed = Signal()
+
+BEST_VARIANT_FIELDS = (
+    "best_variant_price",
+    "best_variant_original_price",
+    "best_variant_discount",
+    "has_stock",
+)
+
+
+RATING_FIELDS = (
+    "rating_avg",
+    "rating_count",
+    "rating_1",
+    "rating_2",
+    "rating_3",
+    "rating_4",
+    "rating_5",
+)
+
+
+def rating_values(histogram):
+    """
+    ستون‌های امتیاز از روی هیستوگرام {امتیاز: تعداد}
+    """
+
+    count = sum(histogram.values())
+
+    total = sum(
+        rating * votes
+        for rating, votes in histogram.items()
+    )
+
+    return {
+        "rating_avg": total / count if count else 0.0,
+        "rating_count": count,
+        **{
+            f"rating_{rating}": histogram.get(rating, 0)
+            for rating in range(1, 6)
+        },
+    }
+
+
+def compute_best_variants(product_ids):
+    """
+    محاسبه بهترین تنوع (کمترین قیمت نهایی) برای هر محصول با یک کوئری
+    """
+
+    best = {
+        product_id: {
+            "best_variant_price": None,
+            "best_variant_original_price": None,
+            "best_variant_discount": None,
+            "has_stock": False,
+        }
+        for product_id in product_ids
+    }
+
+    variants = ProductVariant.objects.filter(
+        product_id__in=best.keys(),
+        is_active=True,
+        stock__gt=0
+    ).order_by(
+        "product_id",
+        "id"
+    ).values_list(
+        "product_id",
+        "price",
+        "discount_percent"
+    )
+
+    for product_id, price, discount in variants:
+
+        final_price = (
+            price *
+            (100 - discount)
+        ) // 100
+
+        current = best[product_id]
+
+        if (
+            current["best_variant_price"] is None
+            or final_price < current["best_variant_price"]
+        ):
+            current["best_variant_price"] = final_price
+            current["best_variant_original_price"] = price
+            current["best_variant_discount"] = discount
+
+        current["has_stock"] = True
+
+    return best
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def refresh_best_variants(self):
+        """
+        بازمحاسبه ستون‌های ذخیره‌شده بهترین تنوع برای محصولات این کوئری‌ست
+        """
+
+        stored = {
+            row[0]: dict(zip(BEST_VARIANT_FIELDS, row[1:]))
+            for row in self.values_list(
+                "pk",
+                *BEST_VARIANT_FIELDS
+            )
+        }
+
+        if not stored:
+            return 0
+
+        # موجودی تنوع دیگری عوض شده باشد هم فیلترها و کش باید بروز شوند
+        variants_changed.send(
+            sender=Product,
+            product_ids=list(stored)
+        )
+
+        now = timezone.now()
+
+        # فقط محصولاتی که ستون‌هایشان عوض شده؛ updated_date آن‌ها را
+        # برای بازمحاسبه محصولات مشابه علامت می‌زند (bulk_update از
+        # auto_now رد می‌شود)
+        products = [
+            Product(pk=product_id, updated_date=now, **values)
+            for product_id, values in compute_best_variants(
+                stored.keys()
+            ).items()
+            if values != stored[product_id]
+        ]
+
+        if not products:
+            return 0
+
+        rows = Product.objects.bulk_update(
+            products,
+            [*BEST_VARIANT_FIELDS, "updated_date"]
+        )
+
+        best_variants_refreshed.send(
+            sender=Product,
+            product_ids=[product.pk for product in products]
+        )
+
+        return rows
+
+    def with_active_variants(self):
+        """
+        پیش‌واکشی تنوع‌های فعال و موجود برای variant_summary و سریالایزرها
+        """
+
+        return self.prefetch_related(
+            models.Prefetch(
+                "variants",
+                queryset=ProductVariant.objects.filter(
+                    is_active=True,
+                    stock__gt=0
+                ).select_related(
+                    "size",
+                    "color"
+                )
+            )
+        )
+
+    def apply_ratings(self, added=(), removed=()):
+        """
+        اعمال افزودن/حذف امتیازها با یک UPDATE اتمیک (F)؛ میانگین از روی
+        هیستوگرام قبلی به‌علاوه تغییرات در همان دستور محاسبه می‌شود
+        """
+
+        changes = {rating: 0 for rating in range(1, 6)}
+
+        for rating in added:
+            changes[rating] += 1
+
+        for rating in removed:
+            changes[rating] -= 1
+
+        count_delta = sum(changes.values())
+
+        total_delta = sum(
+            rating * delta
+            for rating, delta in changes.items()
+        )
+
+        if not any(changes.values()):
+            return 0
+
+        total = sum(
+            (F(f"rating_{rating}") * rating for rating in range(2, 6)),
+            F("rating_1")
+        )
+
+        count = F("rating_count") + count_delta
+
+        return self.update(
+            rating_count=count,
+            rating_avg=Case(
+                When(
+                    rating_count__lte=-count_delta,
+                    then=Value(0.0)
+                ),
+                default=Cast(
+                    total + total_delta,
+                    models.FloatField()
+                ) / count,
+                output_field=models.FloatField()
+            ),
+            **{
+                f"rating_{rating}": F(f"rating_{rating}") + delta
+                for rating, delta in changes.items()
+                if delta
+            }
+        )
+
+    def computed_ratings(self):
+
+        rows = self.annotate(**{
+            f"votes_{rating}": Count(
+                "reviews",
+                filter=Q(reviews__rating=rating)
+            )
+            for rating in range(1, 6)
+        }).values_list(
+            "pk",
+            *[f"votes_{rating}" for rating in range(1, 6)]
+        )
+
+        return {
+            row[0]: rating_values(dict(zip(range(1, 6), row[1:])))
+            for row in rows
+        }
+
+    def refresh_ratings(self):
+        """
+        بازمحاسبه ستون‌های امتیاز از روی نظرات (ترمیم ناهمخوانی)
+        """
+
+        products = [
+            Product(pk=product_id, **values)
+            for product_id, values in self.computed_ratings().items()
+        ]
+
+        return Product.objects.bulk_update(
+            products,
+            RATING_FIELDS,
+            batch_size=500
+        )
+
+    def rating_drift(self):
+
+        stored = {
+            row[0]: dict(zip(RATING_FIELDS, row[1:]))
+            for row in self.values_list(
+                "pk",
+                *RATING_FIELDS
+            )
+        }
+
+        return [
+            product_id
+            for product_id, values in self.computed_ratings().items()
+            if abs(values.pop("rating_avg") - stored[product_id].pop("rating_avg")) > 1e-6
+            or values != stored[product_id]
+        ]
+
+    def best_variant_drift(self):
+        """
+        شناسه محصولاتی که ستون‌های ذخیره‌شده آن‌ها با تنوع‌ها همخوانی ندارد
+        """
+
+        stored = {
+            row[0]: dict(zip(BEST_VARIANT_FIELDS, row[1:]))
+            for row in self.values_list(
+                "pk",
+                *BEST_VARIANT_FIELDS
+            )
+        }
+
+        expected = compute_best_variants(
+            stored.keys()
+        )
+
+        return [
+            product_id
+            for product_id, values in stored.items()
+            if values != expected[product_id]
+        ]
+
+
 class Product(models.Model):
 
     title = models.CharField(
@@ -143,6 +557,79 @@ class Product(models.Model):
         verbose_name="وضعیت"
     )
 
+    # ستون‌های زیر از روی تنوع‌ها نگهداری می‌شوند (ProductVariant signals)
+
+    best_variant_price = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="کمترین قیمت نهایی"
+    )
+
+    best_variant_original_price = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="قیمت اصلی بهترین تنوع"
+    )
+
+    best_variant_discount = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="تخفیف بهترین تنوع"
+    )
+
+    has_stock = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="موجود"
+    )
+
+    # ستون‌های امتیاز از روی نظرات نگهداری می‌شوند (review signals)
+
+    rating_avg = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name="میانگین امتیاز"
+    )
+
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد امتیازها"
+    )
+
+    rating_1 = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد امتیاز ۱"
+    )
+
+    rating_2 = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد امتیاز ۲"
+    )
+
+    rating_3 = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد امتیاز ۳"
+    )
+
+    rating_4 = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد امتیاز ۴"
+    )
+
+    rating_5 = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد امتیاز ۵"
+    )
+
     created_date = models.DateTimeField(
         auto_now_add=True
     )
@@ -151,6 +638,8 @@ class Product(models.Model):
         auto_now=True
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
 
         verbose_name = "محصول"
@@ -163,6 +652,9 @@ class Product(models.Model):
             models.Index(fields=["slug"]),
             models.Index(fields=["status"]),
             models.Index(fields=["created_date"]),
+            models.Index(fields=["status", "best_variant_price"]),
+            models.Index(fields=["status", "best_variant_discount"]),
+            models.Index(fields=["status", "rating_avg", "rating_count"]),
         ]
 
     def __str__(self):
@@ -188,31 +680,42 @@ class Product(models.Model):
             stock__gt=0
         )
 
-    @property
-    def has_stock(self):
-        return self.active_variants.exists()
+    @cached_property
+    def variant_summary(self):
+        """
+        کمترین قیمت نهایی، بیشترین تخفیف و موجودی در یک پیمایش؛
+        با تنوع‌های prefetch شده (with_active_variants) بدون کوئری
+        """
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+
+        if "variants" in prefetched:
+            variants = [
+                variant
+                for variant in prefetched["variants"]
+                if variant.is_available
+            ]
+        else:
+            variants = list(self.active_variants)
+
+        return {
+            "min_price": min(
+                (variant.final_price for variant in variants),
+                default=None
+            ),
+            "max_discount": max(
+                (variant.discount_percent for variant in variants),
+                default=0
+            ),
+            "has_stock": bool(variants),
+        }
 
     @property
     def min_price(self):
-        variant = self.active_variants.order_by(
-            "price"
-        ).first()
-
-        if variant:
-            return variant.final_price
-
-        return None
+        return self.variant_summary["min_price"]
 
     @property
     def max_discount(self):
-        variant = self.active_variants.order_by(
-            "-discount_percent"
-        ).first()
-
-        if variant:
-            return variant.discount_percent
-
-        return 0
+        return self.variant_summary["max_discount"]
     
 # ===========================
 # Product Size
@@ -274,7 +777,7 @@ class ProductColor(models.Model):
 # Product Images
 # ===========================
 
-class ProductImages(models.Model):
+class ProductImages(RenditionsMixin):
 
     product = models.ForeignKey(
         Product,
@@ -334,6 +837,101 @@ class ProductImages(models.Model):
 # Product Variant
 # ===========================
 
+class ProductVariantQuerySet(models.QuerySet):
+
+    """
+    عملیات گروهی سیگنال ارسال نمی‌کنند؛ ستون‌های بهترین تنوع اینجا بروز می‌شوند
+    """
+
+    _refresh_later = False
+
+    def _clone(self):
+
+        clone = super()._clone()
+
+        clone._refresh_later = self._refresh_later
+
+        return clone
+
+    def refresh_later(self):
+        """
+        update() بدون بازمحاسبه همزمان؛ بازمحاسبه بهترین تنوع در صف تسک‌ها انجام می‌شود
+        """
+
+        clone = self._chain()
+
+        clone._refresh_later = True
+
+        return clone
+
+    def update(self, **kwargs):
+
+        if not BEST_VARIANT_SOURCE_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        product_ids = set(
+            self.values_list("product_id", flat=True)
+        )
+
+        rows = super().update(**kwargs)
+
+        new_product = kwargs.get("product", kwargs.get("product_id"))
+
+        if new_product is not None:
+            product_ids.add(
+                getattr(new_product, "pk", new_product)
+            )
+
+        if self._refresh_later:
+
+            enqueue(
+                "shop.refresh_best_variants",
+                [sorted(product_ids)]
+            )
+
+        else:
+
+            Product.objects.filter(
+                pk__in=product_ids
+            ).refresh_best_variants()
+
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+
+        Product.objects.filter(
+            pk__in={obj.product_id for obj in objs}
+        ).refresh_best_variants()
+
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+
+        product_ids = {obj.product_id for obj in objs}
+
+        # جابجایی تنوع‌ها: محصولات قبلی هم
+        if {"product", "product_id"}.intersection(fields):
+            product_ids.update(
+                self.model.objects.filter(
+                    pk__in=[obj.pk for obj in objs]
+                ).values_list("product_id", flat=True)
+            )
+
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+
+        if BEST_VARIANT_SOURCE_FIELDS.intersection(fields):
+
+            Product.objects.filter(
+                pk__in=product_ids
+            ).refresh_best_variants()
+
+        return rows
+
+
 class ProductVariant(models.Model):
 
     product = models.ForeignKey(
@@ -368,11 +966,19 @@ class ProductVariant(models.Model):
         verbose_name="درصد تخفیف"
     )
 
+    # موجودی قابل فروش؛ واحدهای رزرو شده سفارش‌های پرداخت‌نشده از آن کم شده‌اند
     stock = models.PositiveIntegerField(
         default=0,
         verbose_name="موجودی"
     )
 
+    # واحدهایی که سفارش در انتظار پرداخت نگه داشته (order.reservations)
+    reserved = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="رزرو شده"
+    )
+
     is_active = models.BooleanField(
         default=True,
         verbose_name="فعال"
@@ -387,6 +993,8 @@ class ProductVariant(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
+    objects = ProductVariantQuerySet.as_manager()
+
     class Meta:
 
         verbose_name = "تنوع محصول"
@@ -421,6 +1029,38 @@ class ProductVariant(models.Model):
             models.Index(fields=["stock"]),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+
+        instance = super().from_db(db, field_names, values)
+
+        # محصول هنگام خواندن؛ با جابجایی تنوع، ستون‌های محصول قبلی هم بروز می‌شوند
+        instance.loaded_product_id = instance.__dict__.get("product_id")
+
+        return instance
+
+    def save(self, *args, **kwargs):
+
+        super().save(*args, **kwargs)
+
+        # سیگنال‌های post_save محصول قبلی را دیده‌اند
+        self.loaded_product_id = self.product_id
+
+    @property
+    def product_ids(self):
+        """
+        محصول فعلی و (اگر تنوع جابجا شده) محصول قبلی
+        """
+
+        return {
+            product_id
+            for product_id in (
+                self.product_id,
+                getattr(self, "loaded_product_id", None)
+            )
+            if product_id is not None
+        }
+
     @property
     def final_price(self):
 
@@ -497,4 +1137,131 @@ class FeatureValue(models.Model):
 
     def __str__(self):
 
-        return f"{self.product.title} - {self.feature.title}"
\ No newline at end of file
+        return f"{self.product.title} - {self.feature.title}"
+
+
+# ===========================
+# Similar Products
+# ===========================
+
+class SimilarProduct(models.Model):
+
+    """
+    Precomputed by ``refresh_similar_products`` (shop/similarity.py).
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="similar_products",
+        verbose_name="محصول"
+    )
+
+    similar_product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="similar_to",
+        verbose_name="محصول مشابه"
+    )
+
+    score = models.FloatField(
+        verbose_name="امتیاز شباهت"
+    )
+
+    updated_date = models.DateTimeField(
+        auto_now=True
+    )
+
+    class Meta:
+
+        verbose_name = "محصول مشابه"
+
+        verbose_name_plural = "محصولات مشابه"
+
+        ordering = ["-score"]
+
+        constraints = [
+
+            models.UniqueConstraint(
+                fields=[
+                    "product",
+                    "similar_product"
+                ],
+                name="unique_similar_product"
+            )
+
+        ]
+
+        indexes = [
+            models.Index(fields=["product", "-score"]),
+        ]
+
+    def __str__(self):
+
+        return f"{self.product} - {self.similar_product}"
+
+
+# ===========================
+# Signals
+# ===========================
+
+@receiver(post_save, sender=ProductVariant)
+def refresh_product_best_variant_on_save(sender, instance, update_fields=None, **kwargs):
+
+    if (
+        update_fields is not None
+        and not BEST_VARIANT_SOURCE_FIELDS.intersection(update_fields)
+    ):
+        return
+
+    Product.objects.filter(
+        pk__in=instance.product_ids
+    ).refresh_best_variants()
+
+
+@receiver(post_delete, sender=ProductVariant)
+def refresh_product_best_variant_on_delete(sender, instance, **kwargs):
+
+    Product.objects.filter(
+        pk=instance.product_id
+    ).refresh_best_variants()
+
+
+def touch_products(product_ids):
+    """
+    updated_date محصولاتی که داده شباهتشان (مشخصات، دسته‌بندی) عوض شده
+    """
+
+    Product.objects.filter(
+        pk__in=product_ids
+    ).update(
+        updated_date=timezone.now()
+    )
+
+
+@receiver(post_save, sender=FeatureValue)
+@receiver(post_delete, sender=FeatureValue)
+def touch_product_on_feature_value_change(sender, instance, **kwargs):
+
+    touch_products([instance.product_id])
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def touch_products_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+
+    if not reverse:
+
+        if action in ("post_add", "post_remove", "post_clear"):
+            touch_products([instance.pk])
+
+    elif action == "pre_clear":
+
+        # بعد از clear دیگر معلوم نیست کدام محصولات در این دسته بودند
+        touch_products(
+            Product.objects.filter(
+                categories=instance
+            ).values_list("pk", flat=True)
+        )
+
+    elif action in ("post_add", "post_remove") and pk_set:
+        touch_products(pk_set)
@@ -1,5 +1,15 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Product
 
 
 class ProductPagination(PageNumberPagination):
@@ -16,4 +26,187 @@ class ProductPagination(PageNumberPagination):
             "next":self.get_next_link(),
             "previous":self.get_previous_link(),
             "result":data
-        })
\ No newline at end of file
+        })
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination over a stable composite key (sort fields..., id).
+
+    Each page seeks past the last row of the previous one instead of using
+    OFFSET, and no COUNT(*) is run: deep pages cost the same as page one.
+    Nullable sort fields (prices of out-of-stock products) always come last.
+    """
+
+    page_size = 18
+    page_size_query_param = "page_size"
+    max_page_size = 60
+    cursor_query_param = "cursor"
+
+    def __init__(self, ordering):
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        self.keys = [
+            (
+                field.lstrip("-"),
+                field.startswith("-"),
+                Product._meta.get_field(field.lstrip("-")).null,
+            )
+            for field in ordering
+        ]
+        # id breaks ties in the direction of the first sort field
+        self.keys.append(("id", self.keys[0][1], False))
+
+    # ---------------------------------
+    # Cursor encoding
+    # ---------------------------------
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field, descending, nullable in self.keys:
+            value = getattr(obj, field)
+            # full precision: DjangoJSONEncoder would drop microseconds
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+
+        payload = json.dumps(
+            {"v": values, "r": reverse},
+            separators=(",", ":"),
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+
+        if not token:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            values, reverse = payload["v"], bool(payload["r"])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound("cursor نامعتبر است")
+
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound("cursor نامعتبر است")
+
+        return values, reverse
+
+    # ---------------------------------
+    # Seek condition
+    # ---------------------------------
+
+    def beyond(self, keys, values, forward):
+        """
+        Rows that come after ``values`` in the traversal direction.
+        """
+        (field, descending, nullable), rest = keys[0], keys[1:]
+        value = values[0]
+
+        lookup = "lt" if descending == forward else "gt"
+
+        if not rest:
+            return Q(**{f"{field}__{lookup}": value})
+
+        tail = self.beyond(rest, values[1:], forward)
+
+        if value is None:
+            condition = Q(**{f"{field}__isnull": True}) & tail
+            if not forward:
+                condition |= Q(**{f"{field}__isnull": False})
+            return condition
+
+        condition = (
+            Q(**{f"{field}__{lookup}": value})
+            | (Q(**{field: value}) & tail)
+        )
+        if nullable and forward:
+            condition |= Q(**{f"{field}__isnull": True})
+        return condition
+
+    def ordering(self, forward):
+        expressions = []
+
+        for field, descending, nullable in self.keys:
+            nulls = {}
+            if nullable:
+                nulls = {"nulls_last": True} if forward else {"nulls_first": True}
+
+            if descending == forward:
+                expressions.append(F(field).desc(**nulls))
+            else:
+                expressions.append(F(field).asc(**nulls))
+
+        return expressions
+
+    # ---------------------------------
+    # Pagination
+    # ---------------------------------
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request)
+        forward = not reverse
+
+        queryset = queryset.order_by(*self.ordering(forward))
+
+        if values is not None:
+            queryset = queryset.filter(self.beyond(self.keys, values, forward))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1], reverse=False),
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[0], reverse=True),
+        )
+
+    def get_paginated_response(self, data, count=None):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+        if count is not None:
+            response = {"count": count, **response}
+
+        return Response(response)
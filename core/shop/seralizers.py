@@ -1,5 +1,8 @@
+from django.urls import reverse
 from rest_framework import serializers
+from renditions.serializers import RenditionsField
 from review.serializers import ReviewSerializer
+from .categories import category_tree
 from .models import (
     Product,
     ProductCategory,
@@ -29,13 +32,31 @@ class CategorySerializer(serializers.ModelSerializer):
         )
 
     def get_children(self, obj):
+        # فرزندان از درخت کش‌شده خوانده می‌شوند، نه یک کوئری برای هر گره
+        node = category_tree.get().nodes.get(obj.id)
+
         return CategorySerializer(
-            obj.children.all(),
+            node.children if node else [],
             many=True,
             context=self.context
         ).data
 
 
+class CategoryDetailSerializer(CategorySerializer):
+    breadcrumbs = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + (
+            "breadcrumbs",
+        )
+
+    def get_breadcrumbs(self, obj):
+        return CategorySimpleSerializer(
+            category_tree.get().breadcrumbs(obj.id),
+            many=True
+        ).data
+
+
 class CategorySimpleSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -84,11 +105,14 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
     image = serializers.ImageField(read_only=True)
 
+    renditions = RenditionsField()
+
     class Meta:
         model = ProductImages
         fields = (
             "id",
             "image",
+            "renditions",
             "is_main",
         )
 
@@ -189,6 +213,10 @@ class ProductListSerializer(serializers.ModelSerializer):
 
     main_image = serializers.SerializerMethodField()
 
+    main_image_renditions = RenditionsField(
+        source="main_image"
+    )
+
     has_discount = serializers.SerializerMethodField()
 
     class Meta:
@@ -217,6 +245,12 @@ class ProductListSerializer(serializers.ModelSerializer):
 
             "main_image",
 
+            "main_image_renditions",
+
+            "rating_avg",
+
+            "rating_count",
+
             "created_date",
 
         )
@@ -273,12 +307,23 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     )
     
     reviews = ReviewSerializer(
+        source="latest_reviews",
         many=True,
         read_only=True
     )
 
+    review_stats = serializers.SerializerMethodField()
+
+    reviews_url = serializers.SerializerMethodField()
+
     main_image = serializers.SerializerMethodField()
 
+    main_image_renditions = RenditionsField(
+        source="main_image"
+    )
+
+    breadcrumbs = serializers.SerializerMethodField()
+
     min_price = serializers.ReadOnlyField()
 
     max_discount = serializers.ReadOnlyField()
@@ -303,8 +348,12 @@ class ProductDetailSerializer(serializers.ModelSerializer):
 
             "categories",
 
+            "breadcrumbs",
+
             "main_image",
 
+            "main_image_renditions",
+
             "images",
 
             "variants",
@@ -313,6 +362,10 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             
             "reviews",
 
+            "review_stats",
+
+            "reviews_url",
+
             "min_price",
 
             "max_discount",
@@ -339,4 +392,54 @@ class ProductDetailSerializer(serializers.ModelSerializer):
 
             return image.image.url
 
-        return None
\ No newline at end of file
+        return None
+
+    def get_review_stats(self, obj):
+
+        # ستون‌های ذخیره شده روی محصول
+        return {
+            "count": obj.rating_count,
+            "average": round(obj.rating_avg, 1),
+            "ratings": {
+                rating: getattr(obj, f"rating_{rating}")
+                for rating in range(1, 6)
+            },
+        }
+
+    def get_reviews_url(self, obj):
+
+        url = reverse(
+            "review:product-reviews",
+            kwargs={"product_id": obj.pk}
+        )
+
+        request = self.context.get("request")
+
+        if request:
+            return request.build_absolute_uri(url)
+
+        return url
+
+    def get_breadcrumbs(self, obj):
+
+        tree = category_tree.get()
+
+        # عمیق‌ترین دسته محصول مسیر را مشخص می‌کند
+        nodes = [
+            tree.nodes[category.id]
+            for category in obj.categories.all()
+            if category.id in tree.nodes
+        ]
+
+        if not nodes:
+            return []
+
+        deepest = max(
+            nodes,
+            key=lambda node: node.depth
+        )
+
+        return CategorySimpleSerializer(
+            tree.breadcrumbs(deepest.id),
+            many=True
+        ).data
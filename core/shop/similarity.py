@@ -0,0 +1,273 @@
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Q
+
+from order.models import OrderItemsModel, OrderStatusType
+
+from .categories import category_tree
+from .models import (
+    Product,
+    ProductStatus,
+    FeatureValue,
+    SimilarProduct,
+)
+
+
+# تعداد محصولات مشابهی که برای هر محصول ذخیره می‌شود
+SIMILAR_PRODUCTS_LIMIT = 12
+
+WEIGHTS = {
+    "categories": 0.4,
+    "features": 0.25,
+    "price": 0.15,
+    "co_purchase": 0.2,
+}
+
+
+def jaccard(first, second):
+
+    if not first or not second:
+        return 0.0
+
+    return len(first & second) / len(first | second)
+
+
+# ==========================================
+# Similarity data
+# ==========================================
+
+class SimilarityData:
+
+    """
+    Everything the scores need, loaded once per refresh with four queries.
+    """
+
+    def __init__(self):
+
+        self.prices = {}
+
+        # product id -> category ids including ancestors
+        self.categories = defaultdict(set)
+
+        self.direct_categories = defaultdict(set)
+
+        # product id -> {(feature id, value)}
+        self.features = defaultdict(set)
+
+        # candidate lookups: direct category / feature value -> product ids
+        self.by_category = defaultdict(set)
+
+        self.by_feature = defaultdict(set)
+
+        # product id -> Counter(product id -> orders bought together)
+        self.co_purchases = defaultdict(Counter)
+
+    @classmethod
+    def build(cls):
+
+        data = cls()
+
+        data.prices = dict(
+            Product.objects.filter(
+                status=ProductStatus.PUBLISHED
+            ).values_list(
+                "pk",
+                "best_variant_price"
+            )
+        )
+
+        tree = category_tree.get()
+
+        for product_id, category_id in Product.categories.through.objects.filter(
+            product_id__in=data.prices
+        ).values_list(
+            "product_id",
+            "productcategory_id"
+        ):
+
+            data.by_category[category_id].add(product_id)
+
+            data.direct_categories[product_id].add(category_id)
+
+            data.categories[product_id].update(
+                node.id
+                for node in tree.breadcrumbs(category_id)
+            )
+
+        for product_id, feature_id, value in FeatureValue.objects.filter(
+            product_id__in=data.prices
+        ).values_list(
+            "product_id",
+            "feature_id",
+            "value"
+        ):
+
+            key = (feature_id, value.strip().casefold())
+
+            data.features[product_id].add(key)
+
+            data.by_feature[key].add(product_id)
+
+        baskets = defaultdict(set)
+
+        for order_id, product_id in OrderItemsModel.objects.filter(
+            order__status=OrderStatusType.SUCCESS,
+            variant__product_id__in=data.prices
+        ).values_list(
+            "order_id",
+            "variant__product_id"
+        ):
+            baskets[order_id].add(product_id)
+
+        for products in baskets.values():
+
+            for first, second in combinations(products, 2):
+
+                data.co_purchases[first][second] += 1
+
+                data.co_purchases[second][first] += 1
+
+        return data
+
+    # ---------------------------------
+    # Scores
+    # ---------------------------------
+
+    def candidates(self, product_id):
+
+        candidates = set(self.co_purchases[product_id])
+
+        for category_id in self.direct_categories[product_id]:
+            candidates |= self.by_category[category_id]
+
+        for key in self.features[product_id]:
+            candidates |= self.by_feature[key]
+
+        candidates.discard(product_id)
+
+        return candidates
+
+    def price_proximity(self, first, second):
+
+        first = self.prices.get(first)
+
+        second = self.prices.get(second)
+
+        if not first or not second:
+            return 0.0
+
+        return min(first, second) / max(first, second)
+
+    def score(self, product_id, other_id):
+
+        co_purchases = self.co_purchases[product_id]
+
+        most_bought = max(co_purchases.values(), default=0)
+
+        return (
+            WEIGHTS["categories"] * jaccard(
+                self.categories[product_id],
+                self.categories[other_id]
+            )
+            + WEIGHTS["features"] * jaccard(
+                self.features[product_id],
+                self.features[other_id]
+            )
+            + WEIGHTS["price"] * self.price_proximity(
+                product_id,
+                other_id
+            )
+            + WEIGHTS["co_purchase"] * (
+                co_purchases[other_id] / most_bought if most_bought else 0.0
+            )
+        )
+
+    def top(self, product_id, limit=SIMILAR_PRODUCTS_LIMIT):
+
+        scores = sorted(
+            (
+                (self.score(product_id, other_id), other_id)
+                for other_id in self.candidates(product_id)
+            ),
+            key=lambda item: (-item[0], item[1])
+        )
+
+        return scores[:limit]
+
+
+# ==========================================
+# Refresh
+# ==========================================
+
+def stale_product_ids(data):
+    """
+    Products edited since the last refresh or without stored rows, plus
+    their candidates (their own lists may now rank them differently).
+    """
+
+    last_refresh = SimilarProduct.objects.order_by(
+        "-updated_date"
+    ).values_list(
+        "updated_date",
+        flat=True
+    ).first()
+
+    condition = Q(similar_products__isnull=True)
+
+    if last_refresh is not None:
+        condition |= Q(updated_date__gt=last_refresh)
+
+    changed = set(
+        Product.objects.filter(
+            condition,
+            pk__in=data.prices
+        ).values_list(
+            "pk",
+            flat=True
+        )
+    )
+
+    stale = set(changed)
+
+    for product_id in changed:
+        stale |= data.candidates(product_id)
+
+    return stale
+
+
+def refresh_similar_products(product_ids, data):
+
+    product_ids = set(product_ids)
+
+    links = [
+        SimilarProduct(
+            product_id=product_id,
+            similar_product_id=other_id,
+            score=score
+        )
+        for product_id in product_ids
+        if product_id in data.prices
+        for score, other_id in data.top(product_id)
+        if score > 0
+    ]
+
+    with transaction.atomic():
+
+        SimilarProduct.objects.filter(
+            product_id__in=product_ids
+        ).delete()
+
+        # محصولات غیرفعال از لیست‌ها حذف می‌شوند
+        SimilarProduct.objects.exclude(
+            product__status=ProductStatus.PUBLISHED,
+            similar_product__status=ProductStatus.PUBLISHED
+        ).delete()
+
+        SimilarProduct.objects.bulk_create(
+            links,
+            batch_size=1000
+        )
+
+    return len(links)
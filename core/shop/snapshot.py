@@ -0,0 +1,209 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+
+
+class ProcessSnapshot:
+    """
+    An in-process structure that every worker builds for itself.
+
+    A version token kept in the shared cache tells workers when their copy
+    is stale: ``invalidate()`` publishes a new token and every worker
+    rebuilds on its next read.
+
+    Smaller writes go through a change log instead: ``publish(method,
+    *args)`` calls ``method`` on the local copy and appends the call to the
+    log of the current version, and every other worker replays the calls it
+    has not seen on its next read. Calls must be idempotent (a worker that
+    builds while others publish may replay a change it already loaded). A
+    worker that fell behind the log's retention rebuilds.
+    """
+
+    # log entries read per cache round trip
+    log_batch = 16
+
+    log_timeout = 60 * 60
+
+    def __init__(self, name, builder):
+
+        self.name = name
+
+        self.builder = builder
+
+        self._lock = threading.RLock()
+
+        self._value = None
+
+        self._version = None
+
+        # last log entry applied to the local copy
+        self._position = 0
+
+    @property
+    def version_key(self):
+
+        return f"snapshot:{self.name}:version"
+
+    def head_key(self, version):
+
+        return f"snapshot:{self.name}:{version}:head"
+
+    def entry_key(self, version, position):
+
+        return f"snapshot:{self.name}:{version}:log:{position}"
+
+    def current_version(self):
+
+        version = cache.get(self.version_key)
+
+        if version is None:
+
+            cache.add(
+                self.version_key,
+                uuid.uuid4().hex,
+                timeout=None
+            )
+
+            version = cache.get(self.version_key)
+
+        return version
+
+    def head(self, version):
+
+        return cache.get(self.head_key(version)) or 0
+
+    # ---------------------------------
+    # Read
+    # ---------------------------------
+
+    def pending(self):
+        """
+        One cache read: the log entries after the local position, or None
+        when the local copy must be rebuilt.
+        """
+
+        head_key = self.head_key(self._version)
+
+        keys = [
+            self.entry_key(self._version, position)
+            for position in range(
+                self._position + 1,
+                self._position + 1 + self.log_batch
+            )
+        ]
+
+        found = cache.get_many([self.version_key, head_key, *keys])
+
+        if self._value is None or found.get(self.version_key) != self._version:
+            return None
+
+        entries = []
+
+        for key in keys:
+
+            if key not in found:
+                break
+
+            entries.append(found[key])
+
+        # ورودی بعدی نیست ولی head جلوتر است: ورودی‌ها منقضی شده‌اند
+        if len(entries) < self.log_batch and found.get(head_key, 0) > self._position + len(entries):
+            return None
+
+        return entries
+
+    def rebuild(self):
+
+        version = self.current_version()
+
+        position = self.head(version)
+
+        self._value = self.builder()
+
+        self._version, self._position = version, position
+
+    def catch_up(self):
+
+        while True:
+
+            entries = self.pending()
+
+            if entries is None:
+                self.rebuild()
+                continue
+
+            for method, args in entries:
+
+                getattr(self._value, method)(*args)
+
+                self._position += 1
+
+            if len(entries) < self.log_batch:
+                break
+
+    def get(self):
+
+        entries = self.pending()
+
+        if entries == []:
+            return self._value
+
+        with self._lock:
+
+            self.catch_up()
+
+            return self._value
+
+    # ---------------------------------
+    # Write
+    # ---------------------------------
+
+    def publish(self, method, *args):
+        """
+        Call ``method(*args)`` on the local copy and on every other
+        worker's copy.
+        """
+
+        with self._lock:
+
+            self.catch_up()
+
+            getattr(self._value, method)(*args)
+
+            position = max(self.head(self._version), self._position) + 1
+
+            # add جای خالی بعدی را اتمیک می‌گیرد؛ اگر نویسنده دیگری گرفته، بعدی
+            while not cache.add(
+                self.entry_key(self._version, position),
+                (method, args),
+                timeout=self.log_timeout
+            ):
+                position += 1
+
+            # بدون انقضا: شماره‌ها در یک نسخه هرگز از نو شروع نمی‌شوند
+            cache.set(
+                self.head_key(self._version),
+                position,
+                timeout=None
+            )
+
+            # اگر ورودی دیگری در این فاصله نبوده، تغییر خودمان دوباره اجرا نشود
+            if position == self._position + 1:
+                self._position = position
+
+    def invalidate(self):
+
+        with self._lock:
+
+            cache.set(
+                self.version_key,
+                uuid.uuid4().hex,
+                timeout=None
+            )
+
+            self._value = None
+
+            self._version = None
+
+            self._position = 0
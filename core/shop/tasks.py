@@ -0,0 +1,11 @@
+from tasks.base import task
+
+from .models import Product
+
+
+@task()
+def refresh_best_variants(product_ids):
+
+    Product.objects.filter(
+        pk__in=product_ids
+    ).refresh_best_variants()
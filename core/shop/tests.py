@@ -1,3 +1,990 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+
+from .cache import get_response_cache
+from .categories import category_tree
+from .facets import FacetIndex, facet_index
+from .filters import FilterMetadataProvider, filter_metadata
+from .models import (
+    Feature,
+    FeatureValue,
+    Product,
+    ProductCategory,
+    ProductColor,
+    ProductImages,
+    ProductSize,
+    ProductStatus,
+    ProductVariant,
+    best_variants_refreshed,
+)
+from .similarity import SimilarityData, refresh_similar_products, stale_product_ids
+from .snapshot import ProcessSnapshot
+
+
+class CatalogFixtureMixin:
+
+    """
+    Published products with images and variants in one category.
+    """
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.category = ProductCategory.objects.create(
+            title="مانتو",
+            slug="manto",
+            image="shop/categories/manto.jpg",
+        )
+
+        self.size = ProductSize.objects.create(title="L")
+
+        self.color = ProductColor.objects.create(
+            title="مشکی",
+            code="#000000"
+        )
+
+        self.products = []
+
+    def create_products(self, count, discount_percent=0):
+
+        for _ in range(count):
+
+            number = len(self.products) + 1
+
+            product = Product.objects.create(
+                title=f"محصول {number}",
+                slug=f"product-{number}",
+                description="توضیحات",
+                status=ProductStatus.PUBLISHED,
+            )
+
+            product.categories.add(self.category)
+
+            for index in range(2):
+                ProductImages.objects.create(
+                    product=product,
+                    image=f"shop/products/images/{number}-{index}.jpg",
+                    is_main=index == 1,
+                )
+
+            ProductVariant.objects.create(
+                product=product,
+                size=self.size,
+                color=self.color,
+                price=100000 * number,
+                discount_percent=discount_percent,
+                stock=5,
+                sku=f"SKU-{number}",
+            )
+
+            self.products.append(product)
+
+        return self.products
+
+    @contextmanager
+    def assertOnlyCacheQueries(self):
+        """
+        Nothing but shared cache reads (core.cache.DatabaseCache) inside.
+        """
+
+        with CaptureQueriesContext(connection) as context:
+            yield
+
+        self.assertEqual(
+            [
+                query["sql"]
+                for query in context.captured_queries
+                if '"cache_table"' not in query["sql"]
+            ],
+            []
+        )
+
+    def count_queries(self, url, client=None):
+        """
+        Queries of one cold request (response cache and in-memory indexes
+        cleared, so their rebuild is counted too).
+        """
+
+        cache.clear()
+
+        get_response_cache().clear()
+
+        with CaptureQueriesContext(connection) as context:
+            response = (client or self.client).get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        return len(context.captured_queries)
+
+
+class MainImageQueryCountTests(CatalogFixtureMixin, TestCase):
+
+    """
+    main_image is resolved from one prefetch per page, never per product.
+    """
+
+    def test_product_list(self):
+
+        self.create_products(2)
+
+        url = reverse("shop:product-list")
+
+        few = self.count_queries(url)
+
+        self.create_products(8)
+
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_product_list_cursor(self):
+
+        self.create_products(2)
+
+        url = reverse("shop:product-list") + "?pagination=cursor"
+
+        few = self.count_queries(url)
+
+        self.create_products(8)
+
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_product_detail_similar_products(self):
+
+        product, *others = self.create_products(2)
+
+        url = reverse(
+            "shop:product-detail",
+            kwargs={"slug": product.slug}
+        )
+
+        few = self.count_queries(url)
+
+        self.create_products(6)
+
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_main_image_prefers_is_main(self):
+
+        product, = self.create_products(1)
+
+        response = self.client.get(
+            reverse("shop:product-list")
+        )
+
+        self.assertTrue(
+            response.data["results"][0]["main_image"].endswith(
+                f"{product.pk}-1.jpg"
+            )
+        )
+
+    def test_admin_thumbnail(self):
+
+        admin = User.objects.create_superuser(
+            phone_number="09120000000",
+            password="password"
+        )
+
+        self.client.force_login(admin)
+
+        self.create_products(2)
+
+        url = reverse("admin:shop_product_changelist")
+
+        few = self.count_queries(url)
+
+        self.create_products(8)
+
+        self.assertEqual(self.count_queries(url), few)
+
+
+class VariantSummaryTests(CatalogFixtureMixin, TestCase):
+
+    def test_summary_reads_prefetched_variants(self):
+
+        product, = self.create_products(1, discount_percent=10)
+
+        ProductVariant.objects.create(
+            product=product,
+            size=ProductSize.objects.create(title="XL"),
+            color=self.color,
+            price=50000,
+            discount_percent=40,
+            stock=0,
+            sku="SKU-OUT",
+        )
+
+        product = Product.objects.with_active_variants().get(
+            pk=product.pk
+        )
+
+        with self.assertNumQueries(0):
+
+            self.assertEqual(product.min_price, 90000)
+
+            self.assertEqual(product.max_discount, 10)
+
+            self.assertTrue(product.variant_summary["has_stock"])
+
+
+class ResponseCacheTests(CatalogFixtureMixin, TestCase):
+
+    """
+    A cached product detail follows the rows it shows from other tables.
+    """
+
+    def setUp(self):
+
+        super().setUp()
+
+        cache.clear()
+
+        get_response_cache().clear()
+
+        self.product, = self.create_products(1)
+
+        self.feature = Feature.objects.create(title="جنس")
+
+        FeatureValue.objects.create(
+            product=self.product,
+            feature=self.feature,
+            value="نخ"
+        )
+
+        self.url = reverse(
+            "shop:product-detail",
+            kwargs={"slug": self.product.slug}
+        )
+
+    def get_product(self):
+
+        return self.client.get(self.url).data["product"]
+
+    def rename(self, instance):
+
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.title = f"{instance.title} جدید"
+            instance.save()
+
+    def test_category_rename(self):
+
+        child = ProductCategory.objects.create(
+            title="مانتو کوتاه",
+            slug="short-manto",
+            parent=self.category
+        )
+
+        self.product.categories.set([child])
+
+        self.get_product()
+
+        self.rename(self.category)
+
+        product = self.get_product()
+
+        self.assertIn(
+            "مانتو جدید",
+            [crumb["title"] for crumb in product["breadcrumbs"]]
+        )
+
+    def test_color_size_and_feature_rename(self):
+
+        self.get_product()
+
+        self.rename(self.color)
+        self.rename(self.size)
+        self.rename(self.feature)
+
+        product = self.get_product()
+
+        variant, = product["variants"]
+
+        self.assertEqual(variant["color"]["title"], "مشکی جدید")
+
+        self.assertEqual(variant["size"]["title"], "L جدید")
+
+        self.assertEqual(
+            product["feature_values"],
+            [{"feature": "جنس جدید", "value": "نخ"}]
+        )
+
+
+class ConditionalGetTests(CatalogFixtureMixin, TestCase):
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.product, self.other = self.create_products(2)
+
+        self.url = reverse("shop:product-list")
+
+    def get(self, url=None, **headers):
+
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_matching_etag_is_answered_before_any_query(self):
+
+        etag = self.get()["ETag"]
+
+        with self.assertOnlyCacheQueries():
+            response = self.get(if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(
+            self.get(self.url + "?page_size=1", if_none_match=etag).status_code,
+            200
+        )
+
+    def test_no_last_modified(self):
+
+        response = self.get()
+
+        self.assertNotIn("Last-Modified", response)
+
+        self.assertEqual(
+            self.get(if_modified_since="Sun, 18 Oct 2099 00:00:00 GMT").status_code,
+            200
+        )
+
+    def test_writes_without_updated_date_change_the_etag(self):
+
+        etag = self.get()["ETag"]
+
+        # حذف محصول
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+
+        etag, previous = self.get()["ETag"], etag
+        self.assertNotEqual(etag, previous)
+
+        # تغییر دسته‌های محصول (m2m)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.categories.clear()
+
+        etag, previous = self.get()["ETag"], etag
+        self.assertNotEqual(etag, previous)
+
+        # ویژگی محصول
+        with self.captureOnCommitCallbacks(execute=True):
+            FeatureValue.objects.create(
+                product=self.product,
+                feature=Feature.objects.create(title="جنس"),
+                value="نخ"
+            )
+
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_product_detail_and_filters(self):
+
+        for url in (
+            reverse("shop:product-detail", kwargs={"slug": self.product.slug}),
+            reverse("shop:product-filters"),
+        ):
+            etag = self.get(url)["ETag"]
+
+            self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.color.title = "سفید"
+                self.color.save()
+
+            self.assertEqual(self.get(url, if_none_match=etag).status_code, 200)
+
+
+class BestVariantColumnsTests(CatalogFixtureMixin, TestCase):
+
+    def test_moving_a_variant_refreshes_both_products(self):
+
+        first, second = self.create_products(2)
+
+        ProductVariant.objects.filter(product=second).delete()
+
+        variant = ProductVariant.objects.get(product=first)
+        variant.product = second
+        variant.save()
+
+        self.assertEqual(Product.objects.best_variant_drift(), [])
+
+        first.refresh_from_db()
+        self.assertFalse(first.has_stock)
+
+        # جابجایی دوباره با bulk_update
+        variant.product = first
+        ProductVariant.objects.bulk_update([variant], ["product"])
+
+        self.assertEqual(Product.objects.best_variant_drift(), [])
+
+    def test_refreshed_signal_carries_changed_products_only(self):
+
+        first, second = self.create_products(2)
+
+        handler = mock.Mock()
+
+        best_variants_refreshed.connect(handler)
+        self.addCleanup(best_variants_refreshed.disconnect, handler)
+
+        self.assertEqual(Product.objects.refresh_best_variants(), 0)
+
+        handler.assert_not_called()
+
+        ProductVariant.objects.filter(product=second).update(price=50000)
+
+        handler.assert_called_once()
+        self.assertEqual(handler.call_args.kwargs["product_ids"], [second.pk])
+
+
+class StaleSimilarProductsTests(CatalogFixtureMixin, TestCase):
+
+    """
+    Every input of the similarity scores marks its product for the next
+    incremental refresh.
+    """
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.first, self.second, self.third = self.create_products(3)
+
+        self.refresh()
+
+    def refresh(self):
+
+        data = SimilarityData.build()
+
+        refresh_similar_products(data.prices, data)
+
+        self.assertEqual(stale_product_ids(SimilarityData.build()), set())
+
+    def assertStale(self, product):
+
+        stale = stale_product_ids(SimilarityData.build())
+
+        self.assertIn(product.pk, stale)
+
+        self.refresh()
+
+    def test_variant_price_bulk_update(self):
+
+        variant = ProductVariant.objects.get(product=self.first)
+        variant.price = 5000
+        ProductVariant.objects.bulk_update([variant], ["price"])
+
+        self.assertStale(self.first)
+
+    def test_feature_value_changes(self):
+
+        feature = Feature.objects.create(title="جنس")
+
+        value = FeatureValue.objects.create(
+            product=self.second,
+            feature=feature,
+            value="نخ"
+        )
+
+        self.assertStale(self.second)
+
+        value.value = "کتان"
+        value.save()
+
+        self.assertStale(self.second)
+
+        value.delete()
+
+        self.assertStale(self.second)
+
+    def test_category_changes(self):
+
+        other = ProductCategory.objects.create(
+            title="شلوار",
+            slug="shalvar",
+            image="shop/categories/shalvar.jpg",
+        )
+
+        self.third.categories.add(other)
+
+        self.assertStale(self.third)
+
+        other.products.add(self.first)
+
+        self.assertStale(self.first)
+
+        other.products.clear()
+
+        self.assertStale(self.first)
+
+
+class CategoryPathTests(CatalogFixtureMixin, TestCase):
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.clothes = self.create_category("پوشاک", "clothes")
+
+        self.women = self.create_category("زنانه", "women", self.clothes)
+
+        self.coats = self.create_category("پالتو", "coats", self.women)
+
+    def create_category(self, title, slug, parent=None):
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductCategory.objects.create(
+                title=title,
+                slug=slug,
+                parent=parent
+            )
+
+    def test_path_and_depth(self):
+
+        self.coats.refresh_from_db()
+
+        self.assertEqual(
+            self.coats.path,
+            f"{self.clothes.pk}/{self.women.pk}/{self.coats.pk}/"
+        )
+
+        self.assertEqual(self.coats.depth, 2)
+
+        self.assertEqual(self.coats.ancestor_ids, [self.clothes.pk, self.women.pk, self.coats.pk])
+
+    def test_reparent_rewrites_subtree(self):
+
+        self.women.parent = None
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.women.save()
+
+        self.coats.refresh_from_db()
+
+        self.assertEqual(self.coats.path, f"{self.women.pk}/{self.coats.pk}/")
+
+        self.assertEqual(self.coats.depth, 1)
+
+        self.assertEqual(list(self.clothes.descendants(include_self=False)), [])
+
+        self.assertEqual(category_tree.get().descendant_ids(self.clothes.pk), [self.clothes.pk])
+
+    def test_descendants(self):
+
+        self.assertEqual(
+            set(self.clothes.descendants().values_list("pk", flat=True)),
+            {self.clothes.pk, self.women.pk, self.coats.pk}
+        )
+
+        self.assertEqual(
+            sorted(category_tree.get().descendant_ids(self.women.pk, include_self=False)),
+            [self.coats.pk]
+        )
+
+    def test_parent_cycle_is_rejected(self):
+
+        self.clothes.parent = self.coats
+
+        with self.assertRaises(ValidationError):
+            self.clothes.clean()
+
+    def test_category_filter_includes_subcategories(self):
+
+        product, other = self.create_products(2)
+
+        product.categories.add(self.coats)
+
+        response = self.client.get(
+            reverse("shop:product-list"),
+            {"category": "clothes"}
+        )
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [product.pk]
+        )
+
+        response = self.client.get(
+            reverse("shop:product-list"),
+            {"category": "missing"}
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_category_endpoints(self):
+
+        response = self.client.get(reverse("shop:category-list"))
+
+        clothes = next(item for item in response.data if item["slug"] == "clothes")
+
+        self.assertEqual(clothes["children"][0]["slug"], "women")
+
+        self.assertEqual(clothes["children"][0]["children"][0]["slug"], "coats")
+
+        response = self.client.get(
+            reverse("shop:category-detail", args=["coats"])
+        )
+
+        self.assertEqual(
+            [item["slug"] for item in response.data["breadcrumbs"]],
+            ["clothes", "women", "coats"]
+        )
+
+
+class CursorPaginationTests(CatalogFixtureMixin, TestCase):
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.create_products(7)
+
+        # بدون موجودی: قیمت بهترین تنوع NULL است
+        ProductVariant.objects.filter(
+            product__in=self.products[2:4]
+        ).update(stock=0)
+
+        Product.objects.refresh_best_variants()
+
+        # نسخه تازه: ایندکس فیلترها (منبع count) از همین داده‌ها ساخته می‌شود
+        cache.clear()
+
+    def walk(self, url, params):
+
+        pages, response = [], self.client.get(url, params)
+
+        while True:
+
+            self.assertEqual(response.status_code, 200)
+
+            pages.append(response.data)
+
+            if not response.data["next"]:
+                return pages
+
+            response = self.client.get(response.data["next"])
+
+    def ids(self, page):
+
+        return [item["id"] for item in page["results"]]
+
+    def expected(self, *ordering):
+
+        return list(
+            Product.objects.order_by(*ordering).values_list("pk", flat=True)
+        )
+
+    def assertWalks(self, sort, *ordering):
+
+        pages = self.walk(
+            reverse("shop:product-list"),
+            {"pagination": "cursor", "sort": sort, "page_size": 3}
+        )
+
+        self.assertEqual(
+            [product_id for page in pages for product_id in self.ids(page)],
+            self.expected(*ordering)
+        )
+
+        self.assertEqual(pages[0]["count"], 7)
+
+        self.assertIsNone(pages[0]["previous"])
+
+        # بازگشت از صفحه آخر همان صفحه قبلی را می‌دهد
+        previous = self.client.get(pages[-1]["previous"]).data
+
+        self.assertEqual(self.ids(previous), self.ids(pages[-2]))
+
+    def test_newest(self):
+
+        self.assertWalks("newest", "-created_date", "-id")
+
+    def test_price_keeps_nulls_last(self):
+
+        self.assertWalks("price_asc", F("best_variant_price").asc(nulls_last=True), "id")
+
+        self.assertWalks("price_desc", F("best_variant_price").desc(nulls_last=True), "-id")
+
+    def test_invalid_cursor(self):
+
+        response = self.client.get(
+            reverse("shop:product-list"),
+            {"cursor": "not-a-cursor"}
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_count_query(self):
+
+        url = reverse("shop:product-list") + "?pagination=cursor"
+
+        cache.clear()
+
+        get_response_cache().clear()
+
+        self.client.get(url)
+
+        get_response_cache().clear()
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in context.captured_queries)
+        )
+
+
+class FilterMetadataTests(CatalogFixtureMixin, TestCase):
+
+    def setUp(self):
+
+        super().setUp()
+
+        self.create_products(2)
+
+        # رنگ بدون محصول موجود در بلوک فیلترها نمی‌آید
+        self.empty_color = ProductColor.objects.create(
+            title="سفید",
+            code="#ffffff"
+        )
+
+        cache.clear()
+
+    def get_filters(self):
+
+        response = self.client.get(reverse("shop:product-filters"))
+
+        self.assertEqual(response.status_code, 200)
+
+        return response.data
+
+    def test_block_counts(self):
+
+        filters = self.get_filters()
+
+        self.assertEqual(
+            filters["categories"],
+            [{"id": self.category.pk, "title": "مانتو", "slug": "manto", "count": 2}]
+        )
+
+        self.assertEqual(
+            filters["sizes"],
+            [{"id": self.size.pk, "title": "L", "count": 2}]
+        )
+
+        self.assertEqual(
+            filters["colors"],
+            [{
+                "color__id": self.color.pk,
+                "color__title": "مشکی",
+                "color__code": "#000000",
+                "count": 2,
+            }]
+        )
+
+    def test_other_workers_read_the_shared_copy(self):
+
+        filter_metadata.get()
+
+        worker = FilterMetadataProvider()
+
+        with self.assertOnlyCacheQueries():
+            self.assertEqual(worker.get(), filter_metadata.get())
+
+    def test_rename_invalidates(self):
+
+        self.get_filters()
+
+        self.color.title = "مشکی مات"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.color.save()
+
+        self.assertEqual(self.get_filters()["colors"][0]["color__title"], "مشکی مات")
+
+    def test_product_list_uses_the_cached_block(self):
+
+        url = reverse("shop:product-list")
+
+        self.client.get(url)
+
+        get_response_cache().clear()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.data["filters"]["sizes"][0]["count"], 2)
+
+        self.assertFalse(
+            any(
+                table in query["sql"]
+                for query in context.captured_queries
+                for table in ('"shop_productsize"', '"shop_productcolor"')
+            )
+        )
+
+
+class Counter:
+
+    def __init__(self):
+
+        self.values = {}
+
+    def set(self, key, value):
+
+        self.values[key] = value
+
+
+class ProcessSnapshotTests(TestCase):
+
+    """
+    Two snapshots of one name stand for the copies of two workers.
+    """
+
+    def setUp(self):
+
+        cache.clear()
+
+        self.builds = 0
+
+        self.first, self.second = (
+            ProcessSnapshot("tests", self.build)
+            for _ in range(2)
+        )
+
+    def build(self):
+
+        self.builds += 1
+
+        return Counter()
+
+    def test_changes_are_replayed_not_rebuilt(self):
+
+        self.first.get()
+        self.second.get()
+
+        for number in range(ProcessSnapshot.log_batch + 3):
+            self.first.publish("set", number, number)
+
+        self.assertEqual(
+            len(self.second.get().values),
+            ProcessSnapshot.log_batch + 3
+        )
+
+        self.assertEqual(self.builds, 2)
+
+        # تغییر خود worker دوباره اجرا نمی‌شود
+        self.assertEqual(self.first._position, ProcessSnapshot.log_batch + 3)
+
+        self.first.invalidate()
+
+        self.second.get()
+
+        self.assertEqual(self.builds, 3)
+
+    def test_expired_log_rebuilds(self):
+
+        self.second.get()
+
+        self.first.publish("set", "a", 1)
+        self.first.publish("set", "b", 2)
+
+        cache.delete(self.first.entry_key(self.first._version, 1))
+
+        self.assertEqual(self.second.get().values, {})
+
+        self.assertEqual(self.builds, 3)
+
+
+class FacetIndexTests(CatalogFixtureMixin, TestCase):
+
+    def test_other_workers_follow_stock_changes(self):
+
+        cache.clear()
+
+        product, other = self.create_products(2)
+
+        facet_index.get()
+
+        worker = ProcessSnapshot("shop:facets", FacetIndex.build)
+
+        self.assertEqual(worker.get().query().colors[self.color.pk], 2)
+
+        with mock.patch.object(FacetIndex, "build") as build:
+
+            with self.captureOnCommitCallbacks(execute=True):
+                ProductVariant.objects.filter(product=product).update(stock=0)
+
+            self.assertEqual(worker.get().query().colors[self.color.pk], 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                other.delete()
+
+            self.assertEqual(worker.get().query().colors.get(self.color.pk, 0), 0)
+
+            build.assert_not_called()
+
+    def test_stock_of_a_non_best_variant(self):
+
+        cache.clear()
+
+        product, = self.create_products(1)
+
+        red = ProductColor.objects.create(title="قرمز", code="#ff0000")
+
+        # گران‌تر از تنوع فعلی: بهترین تنوع عوض نمی‌شود
+        ProductVariant.objects.create(
+            product=product,
+            size=self.size,
+            color=red,
+            price=900000,
+            stock=0,
+            sku="SKU-red",
+        )
+
+        self.assertNotIn(red.pk, facet_index.get().query().colors)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.filter(color=red).update(stock=3)
+
+        self.assertEqual(facet_index.get().query().colors[red.pk], 1)
+
+    def test_large_results_filter_in_the_query(self):
+
+        self.create_products(4)
+
+        child = ProductCategory.objects.create(title="مانتو بلند", slug="long", parent=self.category)
+
+        red = ProductColor.objects.create(title="قرمز", code="#ff0000")
+
+        self.products[0].categories.set([child])
+
+        ProductVariant.objects.filter(product=self.products[1]).update(color=red)
+
+        ProductVariant.objects.filter(product=self.products[2]).update(stock=0)
+
+        cache.clear()
+
+        url = reverse("shop:product-list")
+
+        for params in ({"category": "manto", "color": "#000000"}, {"category": "long"}, {"size": "L"}):
+
+            bound = self.client.get(url, params).data
+
+            get_response_cache().clear()
+
+            with mock.patch("shop.views.MAX_BOUND_IDS", 0):
+
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url, params)
+
+            self.assertEqual(response.data, bound)
 
-# Create your tests here.
+            self.assertTrue(any("EXISTS" in query["sql"] for query in context.captured_queries))
@@ -5,8 +5,10 @@ app_name = "shop"
 
 urlpatterns = [
     path("products",views.ProductListApiView.as_view(),name="product-list"),
+    path("suggest",views.ProductSuggestApiView.as_view(),name="product-suggest"),
+    path("filters",views.ProductFiltersApiView.as_view(),name="product-filters"),
     re_path(r"^products/(?P<slug>.+)/$", views.ProductDetailApiView.as_view(), name="product-detail"),
     # path("detail/<slug:slug>/",views.ProductDetailApiView.as_view(),name="product-detail"),
-    # path('categories/', CategoryListAPI.as_view()),
-    # path('categories/<slug:slug>/', CategoryDetailAPI.as_view()),
+    path("categories",views.CategoryListApiView.as_view(),name="category-list"),
+    re_path(r"^categories/(?P<slug>.+)/$", views.CategoryDetailApiView.as_view(), name="category-detail"),
 ]
\ No newline at end of file
@@ -1,35 +1,49 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import (
-    Exists,
-    OuterRef,
-    Prefetch,
-    IntegerField,
-    F,
-    Subquery,
-    Q,
-)
+from django.db.models import Prefetch
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 
+from core.conditional import conditional_get
+
 from .models import (
     Product,
     ProductCategory,
-    ProductVariant,
-    ProductImages,
-    ProductSize,
     ProductStatus,
     FeatureValue
 )
+from .cache import (
+    CATALOG_VERSION_KEY,
+    ResponseCacheMixin,
+    get_versions,
+    product_version_key,
+)
+from .categories import category_tree
+from .pagination import ProductCursorPagination
+from .facets import facet_index, filter_products
+from .filters import filter_metadata
 from review.models import Review
+from search.backends import get_search_backend
+from search.suggest import suggest_index
 from .seralizers import (
     ProductListSerializer,
     ProductDetailSerializer,
+    CategorySerializer,
+    CategoryDetailSerializer,
 )
 
 
 
+# تعداد نظراتی که در صفحه جزئیات محصول برگردانده می‌شود
+DETAIL_REVIEWS_COUNT = 5
+
+# بیشترین شناسه نتیجه فیلترها که به صورت pk__in به کوئری داده می‌شود
+# (زیر سقف 999 متغیر SQLite، با جا برای بقیه پارامترها)
+MAX_BOUND_IDS = 500
+
+
 # ==========================================
 # Pagination
 # ==========================================
@@ -43,6 +57,17 @@ class ProductPagination(PageNumberPagination):
     max_page_size = 60
 
 
+# ==========================================
+# Conditional GET sources
+# ==========================================
+
+def catalog_versions(request, *args, **kwargs):
+
+    # بدون کوئری: نسخه کاتالوگ با هر تغییر محصول/تنوع/تصویر/دسته/رنگ/سایز/ویژگی/نظر عوض می‌شود
+    # (جزئیات محصول هم به کل کاتالوگ وابسته است، به خاطر محصولات مشابه)
+    return get_versions(CATALOG_VERSION_KEY)
+
+
 # ==========================================
 # Base Query
 # ==========================================
@@ -51,77 +76,38 @@ class ProductBaseMixin:
 
     def get_queryset(self):
 
-        best_variant = ProductVariant.objects.filter(
-            product=OuterRef("pk"),
-            is_active=True,
-            stock__gt=0,
-        ).annotate(
-            final_price=(
-                F("price") *
-                (100 - F("discount_percent"))
-            ) / 100
-        ).order_by(
-            "final_price"
-        )
-
+        # قیمت و تخفیف بهترین تنوع روی خود محصول ذخیره شده است
+        # تصاویر (به ترتیب is_main) برای main_image یک‌جا خوانده می‌شوند
         return (
             Product.objects.filter(
                 status=ProductStatus.PUBLISHED
             )
-            .annotate(
-
-                best_variant_price=Subquery(
-                    best_variant.values(
-                        "final_price"
-                    )[:1],
-                    output_field=IntegerField()
-                ),
-
-                best_variant_original_price=Subquery(
-                    best_variant.values(
-                        "price"
-                    )[:1]
-                ),
-
-                best_variant_discount=Subquery(
-                    best_variant.values(
-                        "discount_percent"
-                    )[:1]
-                )
-
-            )
             .prefetch_related(
 
                 "categories",
 
-                
+                "images",
 
             )
         )
 
-class ProductListApiView(ProductBaseMixin, APIView):
+class ProductListApiView(ResponseCacheMixin, ProductBaseMixin, APIView):
 
     pagination_class = ProductPagination
 
-    def get_category_children(self, category):
+    cursor_pagination_class = ProductCursorPagination
 
-        ids = [category.id]
+    @conditional_get(catalog_versions)
+    def get(self, request):
 
-        children = list(
-            category.children.all()
+        cache_key, data = self.cached_data(
+            request,
+            "products",
+            CATALOG_VERSION_KEY
         )
 
-        for child in children:
-
-            ids.extend(
-                self.get_category_children(
-                    child
-                )
-            )
-
-        return ids
-
-    def get(self, request):
+        if data is not None:
+            return Response(data)
 
         products = self.get_queryset()
 
@@ -129,111 +115,118 @@ class ProductListApiView(ProductBaseMixin, APIView):
         # Category
         # ---------------------------------
 
+        category_ids = None
+
         category_slug = request.GET.get("category")
 
         if category_slug:
 
-            category = get_object_or_404(
-                ProductCategory,
-                slug=category_slug
+            category = category_tree.get().by_slug.get(
+                category_slug
             )
 
-            ids = self.get_category_children(
-                category
-            )
+            if category is None:
+                raise Http404
 
-            products = products.filter(
-                categories__id__in=ids
-            ).distinct()
+            # زیرشاخه‌ها در ایندکس فیلترها محاسبه می‌شوند
+            category_ids = [category.id]
 
         # ---------------------------------
         # Search
         # ---------------------------------
 
+        narrowed = False
+
         search = request.GET.get("search")
 
         if search:
 
-            products = products.filter(
-
-                Q(title__icontains=search)
-
-                |
-
-                Q(
-                    brief_description__icontains=search
-                )
+            narrowed = True
 
+            # امتیاز در همان کوئری محاسبه می‌شود؛ بدون سقف نتایج
+            products = get_search_backend().filter(
+                products,
+                search
             )
 
         # ---------------------------------
-        # Color
+        # Price
         # ---------------------------------
 
-        colors = request.GET.getlist("color")
+        min_price = request.GET.get("min_price")
+        max_price = request.GET.get("max_price")
 
-        if colors:
+        try:
+            if min_price:
+                min_price = int(min_price)
 
-            products = products.filter(
+                products = products.filter(
+                    best_variant_price__gte=min_price
+                )
 
-                variants__color__code__in=colors,
+                narrowed = True
 
-                variants__is_active=True,
+            if max_price:
+                max_price = int(max_price)
 
-                variants__stock__gt=0
+                products = products.filter(
+                    best_variant_price__lte=max_price
+                )
+
+                narrowed = True
 
-            ).distinct()
+        except (TypeError, ValueError):
+            pass
 
         # ---------------------------------
-        # Size
+        # Facets (category / color / size)
         # ---------------------------------
 
+        colors = request.GET.getlist("color")
+
         sizes = request.GET.getlist("size")
 
-        if sizes:
+        facets = facet_index.get().query(
 
-            products = products.filter(
+            base_ids=(
+                products.values_list("pk", flat=True)
+                if narrowed else None
+            ),
 
-                variants__size__title__in=sizes,
+            category_ids=category_ids,
 
-                variants__is_active=True,
+            color_codes=colors,
 
-                variants__stock__gt=0
+            size_titles=sizes,
 
-            ).distinct()
-            
-         # ---------------------------------
-        # Price
-        # ---------------------------------
+        )
 
-        min_price = request.GET.get("min_price")
-        max_price = request.GET.get("max_price")
+        if category_ids or colors or sizes:
 
-        try:
-            if min_price:
-                min_price = int(min_price)
+            product_ids = facets.product_ids
+
+            if len(product_ids) <= MAX_BOUND_IDS:
 
                 products = products.filter(
-                    best_variant_price__gte=min_price
+                    pk__in=product_ids
                 )
 
-            if max_price:
-                max_price = int(max_price)
+            else:
 
-                products = products.filter(
-                    best_variant_price__lte=max_price
+                products = filter_products(
+                    products,
+                    category_ids=category_ids,
+                    color_codes=colors,
+                    size_titles=sizes,
                 )
 
-        except (TypeError, ValueError):
-            pass
-
         # ---------------------------------
         # Sort
         # ---------------------------------
 
         ordering = request.GET.get(
             "sort",
-            "newest"
+            "relevance" if search else "newest"
         )
 
         ordering_map = {
@@ -248,22 +241,57 @@ class ProductListApiView(ProductBaseMixin, APIView):
 
             "discount": "-best_variant_discount",
 
+            "top_rated": ("-rating_avg", "-rating_count"),
+
         }
 
-        products = products.order_by(
+        by_relevance = ordering == "relevance" and bool(search)
+
+        if by_relevance:
+
+            products = products.order_by(
+
+                "-search_score",
+
+                "pk"
 
-            ordering_map.get(
+            )
+
+        else:
+
+            sort_fields = ordering_map.get(
                 ordering,
                 "-created_date"
             )
 
-        )
+            if isinstance(sort_fields, str):
+                sort_fields = (sort_fields,)
+
+            products = products.order_by(
+
+                *sort_fields
+
+            )
 
         # ---------------------------------
         # Pagination
         # ---------------------------------
 
-        paginator = self.pagination_class()
+        # cursor mode: keyset over (sort field, id), no COUNT / OFFSET
+        cursor_mode = not by_relevance and (
+            "cursor" in request.GET
+            or request.GET.get("pagination") == "cursor"
+        )
+
+        if cursor_mode:
+
+            paginator = self.cursor_pagination_class(
+                sort_fields
+            )
+
+        else:
+
+            paginator = self.pagination_class()
 
         page = paginator.paginate_queryset(
             products,
@@ -282,105 +310,138 @@ class ProductListApiView(ProductBaseMixin, APIView):
 
         )
 
-        # ---------------------------------
-        # Filters
-        # ---------------------------------
+        if cursor_mode:
 
-        categories = ProductCategory.objects.values(
+            # تعداد از ایندکس فیلترها خوانده می‌شود، نه COUNT(*)
+            response = paginator.get_paginated_response(
+                serializer.data,
+                count=facets.count
+            )
 
-            "id",
+        else:
 
-            "title",
+            response = paginator.get_paginated_response(
+                serializer.data
+            )
 
-            "slug"
+        # ساختار ثابت فیلترها کش شده است؛ تعدادها از ایندکس فیلترها
+        response.data["filters"] = filter_metadata.block(
+            facets
+        )
 
+        self.cache_data(
+            cache_key,
+            response.data
         )
 
-        sizes = ProductSize.objects.values(
+        return response
+
+class ProductDetailApiView(ResponseCacheMixin, ProductBaseMixin, APIView):
 
-            "id",
+    @conditional_get(catalog_versions)
+    def get(self, request, slug):
 
-            "title"
+        product_id = self.get_queryset().filter(
 
-        )
+            slug=slug
+
+        ).values_list(
 
-        colors = ProductVariant.objects.filter(
+            "pk",
 
-            is_active=True,
+            flat=True
+
+        ).first()
 
-            stock__gt=0
+        if product_id is None:
+            raise Http404
 
-        ).values(
 
-            "color__id",
+        # ---------------------------------
+        # Product
+        # ---------------------------------
 
-            "color__title",
+        product_key, product_data = self.cached_data(
 
-            "color__code"
+            request,
 
-        ).distinct()
+            "product",
+
+            product_version_key(product_id)
 
-        response = paginator.get_paginated_response(
-            serializer.data
         )
 
-        response.data["filters"] = {
+        if product_data is None:
 
-            "categories": list(categories),
+            product_data = self.get_product_data(
 
-            "sizes": list(sizes),
+                request,
 
-            "colors": list(colors),
+                product_id
 
-        }
+            )
 
-        return response
+            self.cache_data(
 
-class ProductDetailApiView(ProductBaseMixin, APIView):
+                product_key,
 
-    def get(self, request, slug):
+                product_data
+
+            )
 
 
         # ---------------------------------
-        # Product Query
+        # Similar Products
         # ---------------------------------
 
-        product = get_object_or_404(
+        # به محصولات دیگر هم وابسته است؛ با نسخه کل کاتالوگ کش می‌شود
+        similar_key, similar_data = self.cached_data(
 
-            self.get_queryset()
+            request,
 
-            .prefetch_related(
+            "similar",
 
-                "categories",
+            CATALOG_VERSION_KEY
 
-                Prefetch(
-                    "images",
-                    queryset=ProductImages.objects.order_by(
-                        "-is_main"
-                    )
-                ),
+        )
 
+        if similar_data is None:
 
-                Prefetch(
-                    "variants",
+            similar_data = self.get_similar_data(
 
-                    queryset=ProductVariant.objects.filter(
+                request,
 
-                        is_active=True,
+                product_id
 
-                        stock__gt=0
+            )
 
-                    )
-                    .select_related(
+            self.cache_data(
 
-                        "size",
+                similar_key,
 
-                        "color"
+                similar_data
 
-                    )
+            )
 
-                ),
 
+        return Response({
+
+            "product": product_data,
+
+            "similar_products": similar_data
+
+        })
+
+    def get_product_data(self, request, product_id):
+
+        product = get_object_or_404(
+
+            self.get_queryset()
+
+            # min_price / max_discount از همین تنوع‌ها محاسبه می‌شوند
+            .with_active_variants()
+
+            .prefetch_related(
 
                 Prefetch(
 
@@ -393,57 +454,71 @@ class ProductDetailApiView(ProductBaseMixin, APIView):
                     )
 
                 ),
+                # فقط چند نظر آخر؛ بقیه از ReviewListCreateView صفحه‌بندی می‌شوند
                 Prefetch(
                     "reviews",
                     queryset=Review.objects.select_related(
                         "user"
                     ).order_by(
-                        "-created_date"
-                    )
+                        "-created_date",
+                        "-id"
+                    )[:DETAIL_REVIEWS_COUNT],
+                    to_attr="latest_reviews"
                 ),
 
             ),
 
-            slug=slug
+            pk=product_id
 
         )
 
 
-        # ---------------------------------
-        # Similar Products
-        # ---------------------------------
+        serializer = ProductDetailSerializer(
 
-        category_ids = product.categories.values_list(
+            product,
 
-            "id",
+            context={
 
-            flat=True
+                "request":request
+
+            }
 
         )
 
 
-        similar_products = (
+        return serializer.data
+
+    def get_similar_data(self, request, product_id):
+
+        # جدول از پیش محاسبه شده (refresh_similar_products)
+        similar_products = list(
 
             self.get_queryset()
 
             .filter(
 
-                categories__in=category_ids
+                similar_to__product_id=product_id
 
             )
 
-            .exclude(
+            .order_by(
 
-                id=product.id
+                "-similar_to__score"
 
             )
 
-            .distinct()
-
             [:8]
 
         )
 
+        if not similar_products:
+
+            similar_products = self.get_category_similar_products(
+
+                product_id
+
+            )
+
 
         similar_serializer = ProductListSerializer(
 
@@ -460,23 +535,136 @@ class ProductDetailApiView(ProductBaseMixin, APIView):
         )
 
 
-        serializer = ProductDetailSerializer(
+        return similar_serializer.data
 
-            product,
+    def get_category_similar_products(self, product_id):
 
-            context={
+        # محصولی که هنوز محاسبه نشده است
+        category_ids = ProductCategory.objects.filter(
 
-                "request":request
+            products=product_id
 
-            }
+        ).values_list(
+
+            "id",
+
+            flat=True
 
         )
 
 
+        similar_products = (
+
+            self.get_queryset()
+
+            .filter(
+
+                categories__in=category_ids
+
+            )
+
+            .exclude(
+
+                id=product_id
+
+            )
+
+            .distinct()
+
+            [:8]
+
+        )
+
+
+        return similar_products
+
+
+class ProductFiltersApiView(APIView):
+
+    """
+    The filters block of the product list, with catalog-wide counts.
+    """
+
+    @conditional_get(catalog_versions)
+    def get(self, request):
+
+        return Response(
+
+            filter_metadata.block(
+
+                facet_index.get().query()
+
+            )
+
+        )
+
+
+class ProductSuggestApiView(APIView):
+
+    default_limit = 8
+
+    max_limit = 20
+
+    def get(self, request):
+
+        query = request.GET.get("q", "")
+
+        try:
+            limit = min(
+                int(request.GET.get("limit", self.default_limit)),
+                self.max_limit
+            )
+        except (TypeError, ValueError):
+            limit = self.default_limit
+
+        suggestions = suggest_index.get().suggest(
+            query,
+            limit=max(limit, 1)
+        )
+
         return Response({
 
-            "product": serializer.data,
+            "query": query,
+
+            "results": [
+                suggestion.as_dict()
+                for suggestion in suggestions
+            ]
 
-            "similar_products": similar_serializer.data
+        })
+
+
+class CategoryListApiView(APIView):
+
+    def get(self, request):
+
+        tree = category_tree.get()
+
+        serializer = CategorySerializer(
+            tree.roots,
+            many=True,
+            context={
+                "request": request
+            }
+        )
+
+        return Response(serializer.data)
+
+
+class CategoryDetailApiView(APIView):
+
+    def get(self, request, slug):
+
+        category = category_tree.get().by_slug.get(slug)
+
+        if category is None:
+            raise Http404
+
+        serializer = CategoryDetailSerializer(
+            category,
+            context={
+                "request": request
+            }
+        )
 
-        })
\ No newline at end of file
+        return Response(serializer.data)
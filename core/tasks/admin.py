@@ -0,0 +1,58 @@
+from django.contrib import admin
+
+from .models import Task, TaskStatus
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "status",
+        "attempts",
+        "run_at",
+        "duration",
+        "wait",
+        "finished_date",
+    )
+
+    list_filter = (
+        "status",
+        "name",
+    )
+
+    search_fields = (
+        "name",
+        "unique_key",
+    )
+
+    ordering = (
+        "-id",
+    )
+
+    list_per_page = 50
+
+    readonly_fields = (
+        "attempts",
+        "locked_until",
+        "last_error",
+        "started_date",
+        "finished_date",
+        "duration",
+        "wait",
+        "created_date",
+    )
+
+    actions = (
+        "requeue",
+    )
+
+    @admin.action(description="بازگرداندن به صف")
+    def requeue(self, request, queryset):
+        queryset.exclude(
+            status=TaskStatus.RUNNING
+        ).update(
+            status=TaskStatus.QUEUED,
+            attempts=0,
+            locked_until=None,
+        )
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Task, TaskStatus
+
+
+# نام تسک -> TaskDefinition
+registry = {}
+
+MAX_BACKOFF = 60 * 60
+
+
+class TaskDefinition:
+
+    """
+    A registered task function. Calling it runs it inline; ``delay()``
+    queues it for the worker.
+    """
+
+    def __init__(self, func, name, max_attempts, backoff, timeout):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<TaskDefinition {self.name}>"
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self.name, args, kwargs)
+
+    def retry_delay(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def task(name=None, max_attempts=3, backoff=30, timeout=5 * 60):
+    """
+    Register a function as ``<app>.<function>`` (or ``name``). Arguments
+    must be JSON serializable. ``timeout`` is the lease of one attempt: a
+    worker that holds a task longer is assumed dead and the task is retried.
+    """
+    def decorator(func):
+        definition = TaskDefinition(
+            func,
+            name or f"{func.__module__.split('.')[0]}.{func.__name__}",
+            max_attempts,
+            backoff,
+            timeout,
+        )
+
+        registry[definition.name] = definition
+
+        return definition
+
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, delay=0, unique_key=None):
+    """
+    Queue ``name`` in the current transaction, so the worker only sees it
+    once the write that caused it is committed. With ``unique_key`` a task
+    already waiting under the same key absorbs this one (returns None),
+    moved earlier if this one was due sooner.
+    With TASKS_EAGER the task runs in-process after commit instead.
+    """
+    definition = registry[name]
+    args = list(args)
+    kwargs = kwargs or {}
+
+    if getattr(settings, "TASKS_EAGER", False):
+        transaction.on_commit(lambda: definition(*args, **kwargs))
+        return None
+
+    task = Task(
+        name=name,
+        args=args,
+        kwargs=kwargs,
+        unique_key=unique_key,
+        max_attempts=definition.max_attempts,
+    )
+
+    if delay:
+        task.run_at = task.run_at + timedelta(seconds=delay)
+
+    if unique_key is None:
+        task.save()
+        return task
+
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        Task.objects.filter(
+            unique_key=unique_key,
+            status=TaskStatus.QUEUED,
+            run_at__gt=task.run_at
+        ).update(run_at=task.run_at)
+        return None
+
+    return task
+
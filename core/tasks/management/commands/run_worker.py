@@ -0,0 +1,51 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+
+    help = "Run queued tasks in a pool of worker processes"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=2,
+            help="Number of worker processes",
+        )
+
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty",
+        )
+
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no task is due (e.g. from cron)",
+        )
+
+    def handle(self, *args, **options):
+
+        worker = Worker(
+            processes=options["processes"],
+            poll_interval=options["poll_interval"],
+            once=options["once"],
+        )
+
+        signal.signal(signal.SIGTERM, worker.stop)
+
+        self.stdout.write(f"Worker started with {worker.processes} processes")
+
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Worker stopped"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Task, TaskStatus
+
+
+class Command(BaseCommand):
+
+    help = "Print queue depth and per-task timings"
+
+    def handle(self, *args, **options):
+
+        now = timezone.now()
+
+        self.stdout.write(
+            "queued: {} (due {}), running: {}, failed: {}".format(
+                Task.objects.filter(status=TaskStatus.QUEUED).count(),
+                Task.objects.filter(status=TaskStatus.QUEUED, run_at__lte=now).count(),
+                Task.objects.filter(status=TaskStatus.RUNNING).count(),
+                Task.objects.filter(status=TaskStatus.FAILED).count(),
+            )
+        )
+
+        self.stdout.write(
+            f"{'task':40} {'runs':>6} {'failed':>6} {'retried':>7} "
+            f"{'avg s':>8} {'max s':>8} {'wait s':>8} {'max wait':>8}"
+        )
+
+        for row in Task.objects.timings():
+            self.stdout.write(
+                f"{row['name']:40} {row['runs']:>6} {row['failed']:>6} {row['retried']:>7} "
+                f"{row['avg_duration'] or 0:>8.3f} {row['max_duration'] or 0:>8.3f} "
+                f"{row['avg_wait'] or 0:>8.3f} {row['max_wait'] or 0:>8.3f}"
+            )
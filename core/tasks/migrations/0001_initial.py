@@ -0,0 +1,45 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:16
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=200, verbose_name='نام')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='آرگومان\u200cها')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='آرگومان\u200cهای نام\u200cدار')),
+                ('unique_key', models.CharField(blank=True, max_length=200, null=True, verbose_name='کلید یکتا')),
+                ('status', models.IntegerField(choices=[(1, 'در صف'), (2, 'در حال اجرا'), (3, 'انجام شده'), (4, 'ناموفق')], default=1, verbose_name='وضعیت')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='حداکثر تلاش')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان اجرا')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='قفل تا')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخرین خطا')),
+                ('started_date', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ شروع')),
+                ('finished_date', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ پایان')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='مدت اجرا')),
+                ('wait', models.FloatField(blank=True, null=True, verbose_name='انتظار در صف')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+            ],
+            options={
+                'verbose_name': 'تسک',
+                'verbose_name_plural': 'تسک ها',
+                'indexes': [models.Index(fields=['status', 'run_at'], name='tasks_task_status_de4ee3_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 1)), fields=('unique_key',), name='unique_queued_task_key'),
+        ),
+    ]
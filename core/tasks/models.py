@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+
+
+class TaskStatus(models.IntegerChoices):
+    QUEUED = 1, "در صف"
+    RUNNING = 2, "در حال اجرا"
+    SUCCESS = 3, "انجام شده"
+    FAILED = 4, "ناموفق"
+
+
+class TaskQuerySet(models.QuerySet):
+
+    def due(self, now=None):
+        """
+        Queued tasks whose time has come, and running tasks whose worker
+        let the lease expire (crashed or timed out).
+        """
+        now = now or timezone.now()
+
+        return self.filter(
+            Q(status=TaskStatus.QUEUED, run_at__lte=now)
+            | Q(status=TaskStatus.RUNNING, locked_until__lt=now)
+        )
+
+    def timings(self):
+        """
+        Runs, failures, duration and queue wait (seconds) per task name.
+        """
+        return self.exclude(
+            finished_date=None
+        ).values("name").annotate(
+            runs=Count("pk"),
+            failed=Count("pk", filter=Q(status=TaskStatus.FAILED)),
+            retried=Count("pk", filter=Q(attempts__gt=1)),
+            avg_duration=Avg("duration"),
+            max_duration=Max("duration"),
+            avg_wait=Avg("wait"),
+            max_wait=Max("wait"),
+        ).order_by("name")
+
+    def purge(self):
+        days = getattr(settings, "TASKS_KEEP_DAYS", 7)
+
+        return self.filter(
+            status=TaskStatus.SUCCESS,
+            finished_date__lt=timezone.now() - timedelta(days=days)
+        ).delete()
+
+
+class Task(models.Model):
+    name = models.CharField(max_length=200, db_index=True, verbose_name="نام")
+    args = models.JSONField(default=list, blank=True, verbose_name="آرگومان‌ها")
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name="آرگومان‌های نام‌دار")
+
+    # تسک‌های تکراری در صف (مثلا بازسازی یک کش) با این کلید یکی می‌شوند
+    unique_key = models.CharField(max_length=200, null=True, blank=True, verbose_name="کلید یکتا")
+
+    status = models.IntegerField(choices=TaskStatus.choices, default=TaskStatus.QUEUED, verbose_name="وضعیت")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="تعداد تلاش")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="حداکثر تلاش")
+
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="زمان اجرا")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="قفل تا")
+    last_error = models.TextField(blank=True, verbose_name="آخرین خطا")
+
+    started_date = models.DateTimeField(null=True, blank=True, verbose_name="تاریخ شروع")
+    finished_date = models.DateTimeField(null=True, blank=True, verbose_name="تاریخ پایان")
+
+    # ثانیه؛ مدت آخرین اجرا و فاصله زمان اجرا تا شروع آن
+    duration = models.FloatField(null=True, blank=True, verbose_name="مدت اجرا")
+    wait = models.FloatField(null=True, blank=True, verbose_name="انتظار در صف")
+
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد")
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "تسک"
+        verbose_name_plural = "تسک ها"
+
+        indexes = [
+            models.Index(fields=["status", "run_at"]),
+        ]
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["unique_key"],
+                condition=Q(status=TaskStatus.QUEUED),
+                name="unique_queued_task_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
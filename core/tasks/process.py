@@ -0,0 +1,22 @@
+"""
+Entry points of the worker processes. A spawned interpreter imports this
+module before Django is set up, so models are only imported inside.
+"""
+
+import django
+from django.db import close_old_connections
+
+
+def setup():
+    django.setup()
+
+
+def execute(task_id):
+    from .worker import execute
+
+    close_old_connections()
+
+    try:
+        execute(task_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,166 @@
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.cache import DatabaseCache
+
+from .base import enqueue, task
+from .models import Task, TaskStatus
+from .worker import LEASE_GRACE, claim, execute, run_pending
+
+
+calls = []
+
+
+@task(name="tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task(name="tests.fail", max_attempts=2, backoff=10)
+def fail():
+    raise RuntimeError("boom")
+
+
+@task(name="tests.hang", max_attempts=1, timeout=0.1)
+def hang():
+    time.sleep(5)
+
+
+class WorkerTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_records_timings(self):
+        record.delay("a")
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ["a"])
+
+        task = Task.objects.get()
+        self.assertEqual(task.status, TaskStatus.SUCCESS)
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNotNone(task.duration)
+        self.assertIsNotNone(task.wait)
+
+    def test_retry_with_backoff_then_fail(self):
+        fail.delay()
+
+        run_pending()
+
+        task = Task.objects.get()
+        self.assertEqual(task.status, TaskStatus.QUEUED)
+        self.assertIn("boom", task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=5))
+
+        # زمان تلاش بعدی هنوز نرسیده
+        self.assertEqual(run_pending(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        run_pending()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, TaskStatus.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_unique_key_merges_queued_tasks(self):
+        self.assertIsNotNone(enqueue("tests.record", ["a"], unique_key="k"))
+        self.assertIsNone(enqueue("tests.record", ["b"], unique_key="k"))
+
+        # در حال اجرا دیگر جای تسک جدید را نمی‌گیرد
+        claim(1)
+        self.assertIsNotNone(enqueue("tests.record", ["c"], unique_key="k"))
+
+    def test_unique_key_keeps_the_earliest_run(self):
+        enqueue("tests.record", ["a"], delay=600, unique_key="k")
+        enqueue("tests.record", ["b"], unique_key="k")
+
+        self.assertLessEqual(Task.objects.get().run_at, timezone.now())
+
+    def test_expired_lease_is_claimed_again(self):
+        record.delay("a")
+
+        claim(1)
+        self.assertEqual(claim(1), [])
+
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        run_pending()
+
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_retry_yields_to_a_queued_twin(self):
+        enqueue("tests.fail", unique_key="k")
+
+        [task_id] = claim(1)
+
+        twin = enqueue("tests.fail", unique_key="k")
+
+        # تلاش دوباره با twin در صف تداخل دارد؛ twin کار را انجام می‌دهد
+        execute(task_id)
+
+        task = Task.objects.get(pk=task_id)
+        self.assertEqual(task.status, TaskStatus.FAILED)
+        self.assertIn("boom", task.last_error)
+        self.assertIsNone(task.locked_until)
+
+        self.assertEqual(Task.objects.get(pk=twin.pk).status, TaskStatus.QUEUED)
+
+    def test_timeout_interrupts_the_task(self):
+        hang.delay()
+
+        started = time.monotonic()
+        run_pending()
+
+        self.assertLess(time.monotonic() - started, 2)
+
+        task = Task.objects.get()
+        self.assertEqual(task.status, TaskStatus.FAILED)
+        self.assertIn("TaskTimeout", task.last_error)
+
+    def test_lease_outlasts_the_timeout(self):
+        hang.delay()
+
+        claim(1)
+
+        task = Task.objects.get()
+        self.assertGreaterEqual(
+            (task.locked_until - task.started_date).total_seconds(),
+            0.1 + LEASE_GRACE
+        )
+
+
+class SharedCacheTests(TestCase):
+
+    def setUp(self):
+        call_command("createcachetable", "test_shared_cache", verbosity=0)
+        self.cache = DatabaseCache("test_shared_cache", {})
+
+    def test_add_only_once(self):
+        self.assertTrue(self.cache.add("lock", 1, timeout=60))
+        self.assertFalse(self.cache.add("lock", 2, timeout=60))
+        self.assertEqual(self.cache.get("lock"), 1)
+
+        # قفل منقضی شده دوباره گرفته می‌شود
+        self.cache.set("lock", 1, timeout=-1)
+        self.assertTrue(self.cache.add("lock", 3, timeout=60))
+
+    def test_incr_keeps_the_expiry(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr("counter")
+
+        self.cache.add("counter", 0, timeout=None)
+
+        self.assertEqual(self.cache.incr("counter", 5), 5)
+        self.assertEqual(self.cache.decr("counter"), 4)
+        self.assertEqual(self.cache.get("counter"), 4)
+
+        # incr پیش‌فرض جنگو کلید بی‌انقضا را پنج دقیقه‌ای می‌کرد
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT expires FROM test_shared_cache WHERE cache_key = %s", [self.cache.make_key("counter")])
+            self.assertEqual(str(cursor.fetchone()[0])[:4], "9999")
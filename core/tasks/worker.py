@@ -0,0 +1,285 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import process
+from .base import registry
+from .models import Task, TaskStatus
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 5 * 60
+
+PURGE_INTERVAL = 60 * 60
+
+# lease = timeout + این مقدار؛ تسکی که به timeout رسیده قبل از پایان lease ثبت می‌شود
+LEASE_GRACE = 30
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Interrupt the running task with TaskTimeout after ``seconds`` (SIGALRM,
+    so only in the main thread: the worker processes and run_pending).
+    """
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TaskTimeout(f"Task timed out after {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def claim(limit):
+    """
+    Mark up to ``limit`` due tasks as running and return their ids. Each
+    claim is a conditional UPDATE, so concurrent workers never share a task.
+    """
+    now = timezone.now()
+    claimed = []
+
+    candidates = Task.objects.due(now).order_by(
+        "run_at", "pk"
+    ).values_list("pk", "name", "status", "locked_until")[:limit * 2]
+
+    for pk, name, status, locked_until in candidates:
+        definition = registry.get(name)
+        timeout = definition.timeout if definition else DEFAULT_TIMEOUT
+
+        rows = Task.objects.filter(
+            pk=pk,
+            status=status,
+            locked_until=locked_until,
+        ).update(
+            status=TaskStatus.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_until=now + timedelta(seconds=timeout + LEASE_GRACE),
+            started_date=now,
+        )
+
+        if rows:
+            claimed.append(pk)
+
+        if len(claimed) == limit:
+            break
+
+    return claimed
+
+
+def execute(task_id):
+    """
+    Run one claimed task and record its outcome; a failure is retried with
+    exponential backoff until ``max_attempts``.
+    """
+    task = Task.objects.get(pk=task_id)
+    definition = registry.get(task.name)
+
+    started = time.monotonic()
+    error = None
+
+    try:
+        if definition is None:
+            raise LookupError(f"Unknown task {task.name}")
+
+        if task.attempts > task.max_attempts:
+            raise TimeoutError(f"Lease expired after {task.attempts - 1} attempts")
+
+        with time_limit(definition.timeout):
+            definition(*task.args, **task.kwargs)
+
+    except Exception:
+        error = traceback.format_exc()
+
+    now = timezone.now()
+
+    fields = {
+        "locked_until": None,
+        "finished_date": now,
+        "duration": time.monotonic() - started,
+        "wait": (task.started_date - task.run_at).total_seconds(),
+    }
+
+    if error is None:
+        fields.update(status=TaskStatus.SUCCESS, last_error="")
+
+    elif definition is not None and task.attempts < task.max_attempts:
+        fields.update(
+            status=TaskStatus.QUEUED,
+            last_error=error,
+            run_at=now + timedelta(seconds=definition.retry_delay(task.attempts)),
+        )
+
+    else:
+        fields.update(status=TaskStatus.FAILED, last_error=error)
+
+    # اگر قفل منقضی شده و تسک دوباره برداشته شده، نتیجه این اجرا ثبت نمی‌شود
+    current = Task.objects.filter(
+        pk=task.pk,
+        status=TaskStatus.RUNNING,
+        started_date=task.started_date,
+    )
+
+    try:
+        with transaction.atomic():
+            current.update(**fields)
+
+    except IntegrityError:
+        # تسک دیگری با همین unique_key در صف است و تلاش بعدی را انجام می‌دهد
+        # (مثل enqueue)؛ اگر این تلاش زودتر بود، آن جلو می‌افتد
+        run_at = fields.pop("run_at")
+
+        Task.objects.filter(
+            unique_key=task.unique_key,
+            status=TaskStatus.QUEUED,
+            run_at__gt=run_at
+        ).update(run_at=run_at)
+
+        fields["status"] = TaskStatus.FAILED
+
+        current.update(**fields)
+
+    if error is None:
+        logger.info("%s #%s done in %.3fs", task.name, task.pk, fields["duration"])
+    else:
+        logger.warning(
+            "%s #%s failed (attempt %s): %s",
+            task.name, task.pk, task.attempts, error.strip().splitlines()[-1]
+        )
+
+
+def run_pending(limit=100):
+    """
+    Claim and run due tasks in this process; for tests and one-off use.
+    """
+    task_ids = claim(limit)
+
+    for task_id in task_ids:
+        execute(task_id)
+
+    return len(task_ids)
+
+
+class Worker:
+
+    """
+    The main process claims tasks and hands them to a pool of ``processes``
+    spawned interpreters (a fresh process never shares the parent's
+    database connections).
+    """
+
+    def __init__(self, processes=2, poll_interval=1.0, once=False):
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopping = False
+        self.purged = None
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def purge(self):
+        if self.purged is None or time.monotonic() - self.purged > PURGE_INTERVAL:
+            Task.objects.purge()
+            self.purged = time.monotonic()
+
+    def start_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=process.setup,
+        )
+
+    def restart_pool(self, pool, running):
+        """
+        A task outlived its lease: time_limit could not interrupt it (e.g.
+        blocked in C code), and another worker may claim it again. The pool
+        processes are killed; the tasks they were running are due again now,
+        as after a crash.
+        """
+        logger.error("A task outlived its lease; restarting the worker processes")
+
+        for worker_process in list(pool._processes.values()):
+            worker_process.kill()
+
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        Task.objects.filter(
+            pk__in=[task_id for task_id, lease in running.values()],
+            status=TaskStatus.RUNNING,
+        ).update(locked_until=timezone.now())
+
+        running.clear()
+
+        return self.start_pool()
+
+    def run(self):
+        pool = self.start_pool()
+
+        # future -> (task id, پایان lease)
+        running = {}
+
+        try:
+            while not self.stopping:
+                for future in [future for future in running if future.done()]:
+                    del running[future]
+
+                    if future.exception():
+                        logger.error("Worker process failed", exc_info=future.exception())
+
+                now = timezone.now()
+
+                if any(lease < now for task_id, lease in running.values()):
+                    pool = self.restart_pool(pool, running)
+
+                free = self.processes - len(running)
+                task_ids = claim(free) if free else []
+
+                running.update(
+                    (pool.submit(process.execute, task_id), (task_id, lease))
+                    for task_id, lease in Task.objects.filter(
+                        pk__in=task_ids
+                    ).values_list("pk", "locked_until")
+                )
+
+                if task_ids:
+                    continue
+
+                if self.once and not running:
+                    break
+
+                self.purge()
+
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(self.poll_interval)
+
+            # تسک‌های در حال اجرا تمام می‌شوند، تسک جدیدی برداشته نمی‌شود
+            wait(running)
+
+        finally:
+            pool.shutdown()
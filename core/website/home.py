@@ -0,0 +1,252 @@
+import hashlib
+import time
+import uuid
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.renderers import JSONRenderer
+
+from renditions.pipeline import renditions_updated
+from tasks.base import enqueue
+
+from shop.models import (
+    Product,
+    ProductCategory,
+    ProductImages,
+    ProductStatus,
+    best_variants_refreshed,
+)
+from shop.seralizers import ProductListSerializer
+
+from .models import (
+    WebsiteSetting,
+    HomeBanner,
+    SecondaryBanner,
+    HomeCategory,
+)
+from .serializers import (
+    WebsiteSettingSerializer,
+    HomeBannerSerializer,
+    SecondaryBannerSerializer,
+    HomeCategorySerializer,
+)
+
+
+# =========================
+# Home payload
+# =========================
+#
+# The whole home response is stored as one rendered JSON blob. Its image
+# urls are absolute on SITE_URL, not on the request's Host header, so an
+# arbitrary Host can neither trigger a build nor add a blob to rebuild.
+# A write bumps the version; requests keep getting the previous blob while
+# the task worker renders the new one.
+
+VERSION_KEY = "website:home:version"
+
+PAYLOAD_KEY = "website:home:payload"
+
+REBUILD_LOCK_KEY = f"{PAYLOAD_KEY}:rebuilding"
+
+REBUILD_LOCK_TIMEOUT = 60
+
+
+class OriginRequest:
+
+    """
+    Just enough of a request for the serializers' absolute urls.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+
+    def build_absolute_uri(self, location=None):
+        return urljoin(self.origin, location or "/")
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+
+    return version
+
+
+def build_payload():
+    context = {
+        "request": OriginRequest(settings.SITE_URL)
+    }
+
+    setting = WebsiteSetting.objects.first()
+
+    banners = HomeBanner.objects.filter(
+        is_active=True
+    ).order_by("id")
+
+    secondary_banner = SecondaryBanner.objects.filter(
+        is_active=True
+    ).first()
+
+    categories = HomeCategory.objects.filter(
+        is_active=True
+    ).select_related(
+        "category"
+    )
+
+    discount_products = Product.objects.filter(
+        status=ProductStatus.PUBLISHED,
+        best_variant_discount__gt=0
+    ).prefetch_related(
+        "categories",
+        "images",
+    ).order_by(
+        "-best_variant_discount"
+    )[:4]
+
+    return {
+
+        "settings": (
+            WebsiteSettingSerializer(setting, context=context).data
+            if setting else None
+        ),
+
+        "banners": HomeBannerSerializer(
+            banners,
+            many=True,
+            context=context
+        ).data,
+
+        "secondary_banner": (
+            SecondaryBannerSerializer(secondary_banner, context=context).data
+            if secondary_banner else None
+        ),
+
+        "categories": HomeCategorySerializer(
+            categories,
+            many=True,
+            context=context
+        ).data,
+
+        "discount_products": ProductListSerializer(
+            discount_products,
+            many=True,
+            context=context
+        ).data,
+
+    }
+
+
+def rebuild(version=None):
+    """
+    Render and store the blob; returns the stored entry.
+    """
+    version = version or current_version()
+
+    payload = build_payload()
+
+    body = JSONRenderer().render(payload)
+
+    entry = {
+        "version": version,
+        "body": body,
+        "product_ids": [
+            product["id"]
+            for product in payload["discount_products"]
+        ],
+        "etag": '"%s"' % hashlib.md5(body).hexdigest(),
+        "built": time.time(),
+    }
+
+    cache.set(PAYLOAD_KEY, entry, timeout=None)
+
+    return entry
+
+
+def rebuild_in_background():
+    # فقط یک بازسازی در صف؛ قفل را تسک آزاد می‌کند
+    if not cache.add(REBUILD_LOCK_KEY, 1, timeout=REBUILD_LOCK_TIMEOUT):
+        return
+
+    enqueue(
+        "website.rebuild_home",
+        unique_key="website:home"
+    )
+
+
+def get_payload():
+    """
+    The stored entry, possibly stale. Only the very first request (or the
+    first after the cache lost it) builds synchronously.
+    """
+    entry = cache.get(PAYLOAD_KEY)
+
+    if entry is None:
+        return rebuild()
+
+    if entry["version"] != current_version():
+        rebuild_in_background()
+
+    return entry
+
+
+# =========================
+# Signals
+# =========================
+
+def invalidate_home(**kwargs):
+    def bump():
+        # توکن تازه به جای incr؛ دو به‌روزرسانی هم‌زمان هرگز به یک نسخه نمی‌رسند
+        cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+        rebuild_in_background()
+
+    transaction.on_commit(bump)
+
+
+for model in (
+    WebsiteSetting,
+    HomeBanner,
+    SecondaryBanner,
+    HomeCategory,
+    ProductCategory,
+    Product,
+    ProductImages,
+):
+    post_save.connect(invalidate_home, sender=model, dispatch_uid=f"home-{model.__name__}-save")
+    post_delete.connect(invalidate_home, sender=model, dispatch_uid=f"home-{model.__name__}-delete")
+
+
+# نسخه‌های تصویر بعد از ذخیره (یا در build_renditions) ساخته می‌شوند
+for model in (
+    HomeBanner,
+    SecondaryBanner,
+    HomeCategory,
+    ProductImages,
+):
+    renditions_updated.connect(invalidate_home, sender=model, dispatch_uid=f"home-{model.__name__}-renditions")
+
+
+@receiver(best_variants_refreshed)
+def invalidate_home_on_prices(sender, product_ids, **kwargs):
+    # قیمت و تخفیف محصولات تخفیف‌دار صفحه اصلی؛ بقیه محصولات فقط اگر
+    # تازه تخفیف گرفته باشند (ممکن است وارد این فهرست شوند)
+    entry = cache.get(PAYLOAD_KEY)
+
+    if entry is None:
+        return
+
+    shown = set(entry.get("product_ids", ()))
+
+    if shown.intersection(product_ids) or Product.objects.filter(
+        pk__in=product_ids,
+        status=ProductStatus.PUBLISHED,
+        best_variant_discount__gt=0
+    ).exists():
+        invalidate_home()
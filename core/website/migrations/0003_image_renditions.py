@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_contactmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homebanner',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='ارتفاع تصویر'),
+        ),
+        migrations.AddField(
+            model_name='homebanner',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='عرض تصویر'),
+        ),
+        migrations.AddField(
+            model_name='homebanner',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='نسخه\u200cهای تصویر'),
+        ),
+        migrations.AddField(
+            model_name='homecategory',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='ارتفاع تصویر'),
+        ),
+        migrations.AddField(
+            model_name='homecategory',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='عرض تصویر'),
+        ),
+        migrations.AddField(
+            model_name='homecategory',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='نسخه\u200cهای تصویر'),
+        ),
+        migrations.AddField(
+            model_name='secondarybanner',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='ارتفاع تصویر'),
+        ),
+        migrations.AddField(
+            model_name='secondarybanner',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='عرض تصویر'),
+        ),
+        migrations.AddField(
+            model_name='secondarybanner',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='نسخه\u200cهای تصویر'),
+        ),
+    ]
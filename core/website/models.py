@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 
+from renditions.models import RenditionsMixin
 from shop.models import ProductCategory
 
 
@@ -94,7 +95,7 @@ class WebsiteSetting(models.Model):
 # ==========================
 
 
-class HomeBanner(models.Model):
+class HomeBanner(RenditionsMixin):
 
     title = models.CharField(
         max_length=200,
@@ -222,7 +223,7 @@ class HomeBanner(models.Model):
 # ==========================
 
 
-class SecondaryBanner(models.Model):
+class SecondaryBanner(RenditionsMixin):
 
 
     title = models.CharField(
@@ -320,7 +321,7 @@ class SecondaryBanner(models.Model):
 # ==========================
 
 
-class HomeCategory(models.Model):
+class HomeCategory(RenditionsMixin):
 
     category = models.ForeignKey(
         ProductCategory,
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from renditions.serializers import RenditionsField
+
 from .models import (
     WebsiteSetting,
     HomeBanner,
@@ -64,6 +66,8 @@ class HomeBannerSerializer(serializers.ModelSerializer):
 
     image = serializers.SerializerMethodField()
 
+    image_renditions = RenditionsField()
+
 
     class Meta:
 
@@ -73,6 +77,7 @@ class HomeBannerSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "image",
+            "image_renditions",
             "link",
             "is_first",
         ]
@@ -107,6 +112,8 @@ class SecondaryBannerSerializer(serializers.ModelSerializer):
 
     image = serializers.SerializerMethodField()
 
+    image_renditions = RenditionsField()
+
 
     class Meta:
 
@@ -116,6 +123,7 @@ class SecondaryBannerSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "image",
+            "image_renditions",
             "link",
         ]
 
@@ -151,6 +159,8 @@ class HomeCategorySerializer(serializers.ModelSerializer):
 
     image = serializers.SerializerMethodField()
 
+    image_renditions = RenditionsField()
+
     category_slug = serializers.CharField(
         source="category.slug",
         read_only=True
@@ -167,6 +177,7 @@ class HomeCategorySerializer(serializers.ModelSerializer):
             "category_slug",
             "title",
             "image",
+            "image_renditions",
         ]
 
 
@@ -0,0 +1,13 @@
+from django.core.cache import cache
+
+from tasks.base import task
+
+from .home import REBUILD_LOCK_KEY, rebuild
+
+
+@task(max_attempts=2)
+def rebuild_home():
+    try:
+        rebuild()
+    finally:
+        cache.delete(REBUILD_LOCK_KEY)
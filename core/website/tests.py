@@ -1,3 +1,111 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from shop.models import ProductVariant
+from shop.tests import CatalogFixtureMixin
+from tasks.models import Task
+from tasks.worker import run_pending
+
+from .home import build_payload
+
+
+class HomeQueryCountTests(CatalogFixtureMixin, TestCase):
+
+    def test_discount_products(self):
+
+        self.create_products(1, discount_percent=10)
+
+        url = reverse("website:index")
+
+        few = self.count_queries(url)
+
+        self.create_products(3, discount_percent=20)
+
+        self.assertEqual(self.count_queries(url), few)
+
+
+class HomePayloadTests(CatalogFixtureMixin, TestCase):
+
+    def setUp(self):
+
+        super().setUp()
+
+        cache.clear()
+
+    def test_one_payload_for_every_host(self):
+
+        url = reverse("website:index")
+
+        with mock.patch("website.home.build_payload", wraps=build_payload) as build:
+
+            for host in ("testserver", "evil.example", "other.example"):
+                self.assertEqual(
+                    self.client.get(url, HTTP_HOST=host).status_code,
+                    200
+                )
+
+        build.assert_called_once_with()
+
+    def test_write_queues_one_rebuild(self):
+
+        self.client.get(reverse("website:index"), HTTP_HOST="evil.example")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_products(1, discount_percent=10)
+
+        self.assertEqual(
+            list(
+                Task.objects.filter(
+                    name="website.rebuild_home"
+                ).values_list("args", flat=True)
+            ),
+            [[]]
+        )
+
+        # تسک‌های نسخه تصاویر در این تست فایل ندارند
+        Task.objects.exclude(name="website.rebuild_home").delete()
+
+        run_pending()
+
+        response = self.client.get(reverse("website:index"))
+
+        product, = response.json()["discount_products"]
+
+        self.assertTrue(
+            product["main_image"].startswith(settings.SITE_URL)
+        )
+
+    def test_price_changes_outside_the_home_page(self):
+
+        self.create_products(1, discount_percent=10)
+
+        shown, other = self.create_products(1)
+
+        self.client.get(reverse("website:index"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.filter(product=other).update(price=50000)
+
+        self.assertFalse(Task.objects.filter(name="website.rebuild_home").exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.filter(product=shown).update(discount_percent=30)
+
+        self.assertTrue(Task.objects.filter(name="website.rebuild_home").exists())
+
+    def test_new_discount_reaches_the_home_page(self):
+
+        self.create_products(1, discount_percent=10)
+
+        other = self.create_products(1)[-1]
+
+        self.client.get(reverse("website:index"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.filter(product=other).update(discount_percent=50)
 
-# Create your tests here.
+        self.assertTrue(Task.objects.filter(name="website.rebuild_home").exists())
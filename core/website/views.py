@@ -1,151 +1,39 @@
-from django.db.models import (
-    OuterRef,
-    Subquery,
-    IntegerField,
-    F,
-)
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from .models import (
-    WebsiteSetting,
-    HomeBanner,
-    SecondaryBanner,
-    HomeCategory,
-    ContactMessage,
-)
+from .home import get_payload
 
-from .serializers import (
-    WebsiteSettingSerializer,
-    HomeBannerSerializer,
-    SecondaryBannerSerializer,
-    HomeCategorySerializer,
-    ContactMessageSerializer
-)
+from .serializers import ContactMessageSerializer
 
-from shop.models import (
-    Product,
-    ProductStatus,
-    ProductVariant
-)
 
-from shop.seralizers import ProductListSerializer
-from shop.views import ProductBaseMixin
-
-
-class HomeAPIView(ProductBaseMixin, APIView):
+class HomeAPIView(APIView):
 
     def get(self, request):
 
-        # =========================
-        # Website Settings
-        # =========================
-
-        setting = WebsiteSetting.objects.first()
-
-        setting_data = None
-
-        if setting:
-            setting_data = WebsiteSettingSerializer(
-                setting,
-                context={
-                    "request": request
-                }
-            ).data
-
-        # =========================
-        # Main Banners
-        # =========================
-
-        banners = HomeBanner.objects.filter(
-            is_active=True
-        ).order_by("id")
-
-        banners_data = HomeBannerSerializer(
-            banners,
-            many=True,
-            context={
-                "request": request
-            }
-        ).data
-
-        # =========================
-        # Secondary Banner
-        # =========================
-
-        secondary_banner = SecondaryBanner.objects.filter(
-            is_active=True
-        ).first()
-
-        secondary_data = None
-
-        if secondary_banner:
-            secondary_data = SecondaryBannerSerializer(
-                secondary_banner,
-                context={
-                    "request": request
-                }
-            ).data
-
-        # =========================
-        # Home Categories
-        # =========================
-
-        categories = HomeCategory.objects.filter(
-            is_active=True
-        ).select_related(
-            "category"
-        )
+        # JSON از پیش ساخته شده؛ در صورت تغییر، نسخه قبلی تا پایان بازسازی سرو می‌شود
+        entry = get_payload()
 
-        categories_data = HomeCategorySerializer(
-            categories,
-            many=True,
-            context={
-                "request": request
-            }
-        ).data
-
-        # =========================
-        # Discount Products
-        # =========================
-
-        discount_products = (
-            self.get_queryset()
-            .filter(
-                best_variant_discount__gt=0
-            )
-            .order_by(
-                "-best_variant_discount"
-            )[:4]
+        response = get_conditional_response(
+            request,
+            etag=entry["etag"],
+            last_modified=int(entry["built"])
         )
 
-        discount_products_data = ProductListSerializer(
-            discount_products,
-            many=True,
-            context={
-                "request": request
-            }
-        ).data
-
-        # =========================
-        # Response
-        # =========================
-
-        return Response({
-
-            "settings": setting_data,
-
-            "banners": banners_data,
-
-            "secondary_banner": secondary_data,
+        if response is None:
+            response = HttpResponse(
+                entry["body"],
+                content_type="application/json"
+            )
 
-            "categories": categories_data,
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(entry["built"])
 
-            "discount_products": discount_products_data
+        return response
 
-        })
-        
 # ==========================================
 # CONTACT MESSAGE API
 # ==========================================